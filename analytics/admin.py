@@ -0,0 +1,22 @@
+from django.contrib import admin
+from .models import DailyOrderStats, RollupWatermark
+
+
+@admin.register(DailyOrderStats)
+class DailyOrderStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'origin_city', 'destination_city', 'package_size', 'status', 'orders_count', 'price_total')
+    list_filter = ('status', 'origin_city', 'destination_city', 'day')
+    list_select_related = ('origin_city', 'destination_city', 'package_size', 'status')
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False  # Сводки заполняет только команда aggregate_order_stats
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_event_id', 'updated_at')
+    readonly_fields = ('name', 'last_event_id', 'updated_at')
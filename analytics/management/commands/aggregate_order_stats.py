@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from analytics.rollups import ROLLUP_BATCH_SIZE, catch_up, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Учитывает новые события журнала статусов в дневных сводках по заказам. '
+        'Без --loop обрабатывает накопившиеся события и завершается, с --loop '
+        'работает как воркер. Повторный запуск не учитывает события дважды.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Запускать обработку непрерывно')
+        parser.add_argument('--interval', type=float, default=60, help='Пауза между запусками, с')
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE,
+                            help='Сколько событий обрабатывать в одной транзакции')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Удалить сводки и пересчитать их по всему журналу')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            processed = rebuild(options['batch_size'])
+            self.stdout.write(f'Сводки пересчитаны, событий: {processed}')
+        try:
+            while True:
+                # Воркер живет долго: соединение с БД обновляется так же, как между запросами
+                close_old_connections()
+                started = time.perf_counter()
+                processed = catch_up(options['batch_size'])
+                self.stdout.write(f'Учтено событий: {processed} за {time.perf_counter() - started:.3f} с')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено')
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0003_packagesize_price_multiplier'),
+        ('orders', '0007_order_status_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Сводка')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='Последнее обработанное событие')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Позиция обработки журнала',
+                'verbose_name_plural': 'Позиции обработки журнала',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyOrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов перешло в статус')),
+                ('lead_time_seconds', models.BigIntegerField(default=0, verbose_name='Суммарное время от создания заказа, с')),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма цен')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('destination_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.city', verbose_name='Город доставки')),
+                ('origin_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.city', verbose_name='Город отправки')),
+                ('package_size', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.packagesize', verbose_name='Размер заказа')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='orders.orderstatus', verbose_name='Статус')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка по заказам',
+                'verbose_name_plural': 'Дневные сводки по заказам',
+                'ordering': ['day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'origin_city', 'destination_city', 'package_size', 'status'), name='daily_order_stats_key')],
+            },
+        ),
+    ]
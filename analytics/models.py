@@ -0,0 +1,63 @@
+from django.db import models
+
+from core.models import City, PackageSize
+from orders.models import OrderStatus
+
+
+class DailyOrderStats(models.Model):
+    """
+    Дневная сводка по заказам: день x маршрут x размер посылки x статус.
+
+    Строка считает заказы, перешедшие в статус в этот день (по местному
+    времени), суммарное время от создания заказа до перехода и сумму их цен.
+    Заполняется инкрементально из журнала статусов (analytics/rollups.py),
+    поэтому отчеты не группируют таблицу заказов целиком.
+    """
+    day = models.DateField(verbose_name='День')
+    origin_city = models.ForeignKey(
+        City, on_delete=models.CASCADE, related_name='+', verbose_name='Город отправки'
+    )
+    destination_city = models.ForeignKey(
+        City, on_delete=models.CASCADE, related_name='+', verbose_name='Город доставки'
+    )
+    package_size = models.ForeignKey(
+        PackageSize, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        verbose_name='Размер заказа'
+    )
+    status = models.ForeignKey(OrderStatus, on_delete=models.PROTECT, related_name='+', verbose_name='Статус')
+
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='Заказов перешло в статус')
+    lead_time_seconds = models.BigIntegerField(
+        default=0, verbose_name='Суммарное время от создания заказа, с'
+    )
+    price_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма цен')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    def __str__(self):
+        return f"{self.day}: {self.origin_city_id} -> {self.destination_city_id}, {self.status_id}"
+
+    class Meta:
+        verbose_name = 'Дневная сводка по заказам'
+        verbose_name_plural = 'Дневные сводки по заказам'
+        ordering = ['day']
+        constraints = [
+            # Ведущее поле day обслуживает и выборки отчетов по диапазону дат
+            models.UniqueConstraint(
+                fields=['day', 'origin_city', 'destination_city', 'package_size', 'status'],
+                name='daily_order_stats_key',
+            ),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Докуда обработан журнал статусов: id последнего учтенного OrderStatusEvent."""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Сводка')
+    last_event_id = models.BigIntegerField(default=0, verbose_name='Последнее обработанное событие')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    def __str__(self):
+        return f"{self.name}: {self.last_event_id}"
+
+    class Meta:
+        verbose_name = 'Позиция обработки журнала'
+        verbose_name_plural = 'Позиции обработки журнала'
@@ -0,0 +1,119 @@
+"""
+Инкрементальное заполнение дневных сводок по заказам из журнала статусов.
+
+Журнал OrderStatusEvent только пополняется, поэтому его id - надежная
+позиция обработки: каждый запуск берет события после RollupWatermark,
+складывает их вклад в строки DailyOrderStats и сдвигает позицию в той же
+транзакции. Повторный или прерванный запуск не учитывает событие дважды,
+а параллельные запуски выстраиваются в очередь на блокировке позиции.
+
+Id событий выдаются при вставке, а видны они после коммита, поэтому
+событие с меньшим id может появиться позже большего. События моложе
+ROLLUP_SAFETY_LAG не обрабатываются: за это время транзакции, которые
+меняют статусы, успевают завершиться.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import OrderStatusEvent
+from .models import DailyOrderStats, RollupWatermark
+
+ROLLUP_NAME = 'daily_order_stats'
+ROLLUP_BATCH_SIZE = 5000
+ROLLUP_SAFETY_LAG = datetime.timedelta(seconds=60)
+
+
+def stats_key(day, origin_city_id, destination_city_id, package_size_id, status_id):
+    return day, origin_city_id, destination_city_id, package_size_id, status_id
+
+
+def aggregate_events(rows):
+    """Вклад событий в сводки: ключ -> [заказов, секунд от создания, сумма цен]."""
+    deltas = defaultdict(lambda: [0, 0, Decimal('0')])
+    for (_, created_at, status_id, origin_city_id, destination_city_id, package_size_id,
+         order_created_at, price) in rows:
+        key = stats_key(timezone.localdate(created_at), origin_city_id, destination_city_id,
+                        package_size_id, status_id)
+        delta = deltas[key]
+        delta[0] += 1
+        delta[1] += max(0, int((created_at - order_created_at).total_seconds()))
+        delta[2] += price
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Прибавляет вклад к существующим строкам сводки и создает недостающие."""
+    existing = {}
+    candidates = DailyOrderStats.objects.filter(
+        day__in={key[0] for key in deltas}, origin_city_id__in={key[1] for key in deltas})
+    for stats in candidates:
+        existing[stats_key(stats.day, stats.origin_city_id, stats.destination_city_id,
+                           stats.package_size_id, stats.status_id)] = stats
+
+    changed = []
+    created = []
+    for key, (count, seconds, price) in deltas.items():
+        stats = existing.get(key)
+        if stats is None:
+            day, origin_city_id, destination_city_id, package_size_id, status_id = key
+            stats = DailyOrderStats(
+                day=day, origin_city_id=origin_city_id, destination_city_id=destination_city_id,
+                package_size_id=package_size_id, status_id=status_id)
+            created.append(stats)
+        else:
+            changed.append(stats)
+        stats.orders_count += count
+        stats.lead_time_seconds += seconds
+        stats.price_total += price
+
+    now = timezone.now()
+    for stats in changed:
+        stats.updated_at = now  # bulk_update не обновляет auto_now
+    DailyOrderStats.objects.bulk_create(created)
+    DailyOrderStats.objects.bulk_update(changed, ['orders_count', 'lead_time_seconds', 'price_total', 'updated_at'])
+
+
+def process_batch(batch_size=ROLLUP_BATCH_SIZE, now=None):
+    """Учитывает в сводках следующую порцию событий. Возвращает количество обработанных событий."""
+    cutoff = (now or timezone.now()) - ROLLUP_SAFETY_LAG
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(name=ROLLUP_NAME)
+        watermark = RollupWatermark.objects.select_for_update().get(name=ROLLUP_NAME)
+        rows = list(OrderStatusEvent.objects.filter(pk__gt=watermark.last_event_id).order_by('pk').values_list(
+            'pk', 'created_at', 'to_status_id',
+            'order__origin_city_id', 'order__destination_city_id', 'order__package_size_id',
+            'order__created_at', 'order__price',
+        )[:batch_size])
+        # Только непрерывный префикс: позиция не должна перескочить событие, которое еще рано учитывать
+        for index, row in enumerate(rows):
+            if row[1] >= cutoff:
+                rows = rows[:index]
+                break
+        if not rows:
+            return 0
+        apply_deltas(aggregate_events(rows))
+        watermark.last_event_id = rows[-1][0]
+        watermark.save(update_fields=['last_event_id', 'updated_at'])
+    return len(rows)
+
+
+def catch_up(batch_size=ROLLUP_BATCH_SIZE, now=None):
+    """Обрабатывает все накопившиеся события порциями. Возвращает их количество."""
+    total = 0
+    while True:
+        processed = process_batch(batch_size, now)
+        total += processed
+        if processed < batch_size:
+            return total
+
+
+def rebuild(batch_size=ROLLUP_BATCH_SIZE, now=None):
+    """Пересчитывает сводки с нуля по всему журналу статусов."""
+    with transaction.atomic():
+        DailyOrderStats.objects.all().delete()
+        RollupWatermark.objects.filter(name=ROLLUP_NAME).delete()
+    return catch_up(batch_size, now)
@@ -0,0 +1,45 @@
+import datetime
+
+from django.utils import timezone
+from rest_framework import serializers
+
+KPI_GROUPS = ('day', 'city_pair', 'package_size')
+KPI_MAX_DAYS = 366
+KPI_DEFAULT_DAYS = 30
+
+
+class DeliveryKpiQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=KPI_GROUPS, default='day')
+    origin_city_id = serializers.IntegerField(min_value=1, required=False)
+    destination_city_id = serializers.IntegerField(min_value=1, required=False)
+    package_size_id = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        # По умолчанию - последние KPI_DEFAULT_DAYS дней
+        attrs.setdefault('date_to', timezone.localdate())
+        attrs.setdefault('date_from', attrs['date_to'] - datetime.timedelta(days=KPI_DEFAULT_DAYS - 1))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'Дата окончания раньше даты начала.'})
+        if (attrs['date_to'] - attrs['date_from']).days >= KPI_MAX_DAYS:
+            raise serializers.ValidationError({'date_from': f'Период не может быть длиннее {KPI_MAX_DAYS} дней.'})
+        return attrs
+
+
+class DeliveryKpiSerializer(serializers.Serializer):
+    # Ключ группировки: заполнены только поля выбранного group_by
+    day = serializers.DateField(required=False)
+    origin_city_id = serializers.IntegerField(required=False)
+    origin_city = serializers.CharField(source='origin_city__name', required=False)
+    destination_city_id = serializers.IntegerField(required=False)
+    destination_city = serializers.CharField(source='destination_city__name', required=False)
+    package_size_id = serializers.IntegerField(required=False)
+    package_size = serializers.CharField(source='package_size__name', required=False)
+
+    created = serializers.IntegerField()
+    delivered = serializers.IntegerField()
+    cancelled = serializers.IntegerField()
+    cancellation_rate = serializers.FloatField(allow_null=True)
+    avg_delivery_hours = serializers.FloatField(allow_null=True)
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
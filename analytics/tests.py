@@ -0,0 +1,106 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from orders.services import take_order
+from orders.tests import OrderTestMixin
+from orders.transitions import record_status_event
+from users.models import User
+from .models import DailyOrderStats, RollupWatermark
+from .rollups import ROLLUP_SAFETY_LAG, catch_up, rebuild
+
+
+class DailyOrderStatsTestMixin(OrderTestMixin):
+
+    def setUp(self):
+        super().setUp()
+        # Доставленный заказ создан 5 часов назад, второй заказ отменен клиентом
+        self.delivered = self.create_order()
+        self.cancelled = self.create_order()
+        Order.objects.filter(pk=self.delivered.pk).update(created_at=timezone.now() - datetime.timedelta(hours=5))
+        for order in (self.delivered, self.cancelled):
+            record_status_event(order.pk, None, self.status_processing)
+        take_order(self.delivered.pk, self.courier_profile.pk)
+        record_status_event(self.delivered.pk, self.status_in_transit, self.status_delivered)
+        record_status_event(self.cancelled.pk, self.status_processing, self.status_cancelled)
+        self.later = timezone.now() + ROLLUP_SAFETY_LAG * 2
+
+    def stats(self):
+        return {
+            stats.status_id: (stats.orders_count, stats.price_total)
+            for stats in DailyOrderStats.objects.filter(origin_city=self.almaty, destination_city=self.astana)
+        }
+
+
+class DailyOrderStatsRollupTests(DailyOrderStatsTestMixin, TestCase):
+
+    def test_catch_up_is_incremental_and_idempotent(self):
+        self.assertEqual(catch_up(now=self.later), 5)
+        expected = {
+            self.status_processing.pk: (2, 2000),
+            self.status_in_transit.pk: (1, 1000),
+            self.status_delivered.pk: (1, 1000),
+            self.status_cancelled.pk: (1, 1000),
+        }
+        self.assertEqual(self.stats(), expected)
+        delivered = DailyOrderStats.objects.get(status=self.status_delivered)
+        self.assertAlmostEqual(delivered.lead_time_seconds, 5 * 3600, delta=60)
+        self.assertEqual(delivered.day, timezone.localdate())
+
+        self.assertEqual(catch_up(now=self.later), 0)
+        self.assertEqual(self.stats(), expected)
+
+        third = self.create_order()
+        record_status_event(third.pk, None, self.status_processing)
+        self.assertEqual(catch_up(now=self.later), 1)
+        self.assertEqual(self.stats()[self.status_processing.pk], (3, 3000))
+
+    def test_small_batches_and_rebuild_give_same_result(self):
+        catch_up(now=self.later)
+        expected = self.stats()
+        self.assertEqual(rebuild(batch_size=2, now=self.later), 5)
+        self.assertEqual(self.stats(), expected)
+
+    def test_recent_events_wait_for_safety_lag(self):
+        self.assertEqual(catch_up(), 0)
+        self.assertFalse(DailyOrderStats.objects.exists())
+        self.assertEqual(RollupWatermark.objects.get().last_event_id, 0)
+
+
+class DeliveryKpiAPITests(DailyOrderStatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        catch_up(now=self.later)
+        self.staff_user = User.objects.create_user('+77010000099', 'pass', is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff_user)
+        self.url = reverse('analytics_api:delivery_kpis')
+
+    def test_city_pair_kpis_read_only_rollups(self):
+        self.api.get(self.url)  # Роль пользователя и статусы загружаются при первом запросе
+        with self.assertNumQueries(1):
+            response = self.api.get(self.url, {'group_by': 'city_pair'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{
+            'origin_city_id': self.almaty.pk, 'origin_city': 'Алматы',
+            'destination_city_id': self.astana.pk, 'destination_city': 'Астана',
+            'created': 2, 'delivered': 1, 'cancelled': 1,
+            'cancellation_rate': 0.5, 'avg_delivery_hours': 5.0, 'revenue': '1000.00',
+        }])
+
+    def test_daily_kpis_and_filters(self):
+        today = timezone.localdate()
+        body = self.api.get(self.url, {'date_from': today, 'date_to': today}).json()
+        self.assertEqual([(row['day'], row['created']) for row in body], [(today.isoformat(), 2)])
+        self.assertEqual(self.api.get(self.url, {'origin_city_id': self.astana.pk}).json(), [])
+        self.assertEqual(self.api.get(self.url, {'date_from': today, 'date_to': today - datetime.timedelta(days=1)})
+                         .status_code, 400)
+
+    def test_kpis_require_staff(self):
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.get(self.url).status_code, 403)
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import DeliveryKpiAPIView
+
+app_name = 'analytics_api'
+
+urlpatterns = [
+    path('kpis/', DeliveryKpiAPIView.as_view(), name='delivery_kpis'),
+]
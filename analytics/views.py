@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from rest_framework import exceptions, generics, permissions
+from rest_framework.response import Response
+
+from orders.models import OrderStatus
+from orders.statuses import status_registry
+from users.actor import get_actor
+from .models import DailyOrderStats
+from .serializers import DeliveryKpiQuerySerializer, DeliveryKpiSerializer
+
+# Поля ключа группировки (имена в ответе задает DeliveryKpiSerializer)
+KPI_GROUP_FIELDS = {
+    'day': ('day',),
+    'city_pair': ('origin_city_id', 'origin_city__name', 'destination_city_id', 'destination_city__name'),
+    'package_size': ('package_size_id', 'package_size__name'),
+}
+
+
+def status_id(code):
+    try:
+        return status_registry.get(code).pk
+    except OrderStatus.DoesNotExist:
+        return None  # Фильтр status_id=None не совпадет ни с одной строкой
+
+
+class DeliveryKpiAPIView(generics.GenericAPIView):
+    """
+        KPI доставки для сотрудников по дневным сводкам (analytics.DailyOrderStats):
+        ?date_from=&date_to=&group_by=day|city_pair|package_size
+        &origin_city_id=&destination_city_id=&package_size_id=
+
+        created - заказы, созданные за период; delivered и cancelled -
+        доставленные и отмененные за период; cancellation_rate = cancelled / created;
+        avg_delivery_hours - среднее время от создания до доставки;
+        revenue - сумма цен доставленных заказов. Запрос группирует только
+        строки сводки за период, таблица заказов не читается.
+    """
+    serializer_class = DeliveryKpiSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not get_actor(request.user).is_staff:
+            raise exceptions.PermissionDenied("Аналитика доступна только сотрудникам.")
+        query = DeliveryKpiQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        queryset = DailyOrderStats.objects.filter(day__gte=params['date_from'], day__lte=params['date_to'])
+        for field in ('origin_city_id', 'destination_city_id', 'package_size_id'):
+            if field in params:
+                queryset = queryset.filter(**{field: params[field]})
+
+        created = Q(status_id=status_id(OrderStatus.CODE_PROCESSING))
+        delivered = Q(status_id=status_id(OrderStatus.CODE_DELIVERED))
+        cancelled = Q(status_id=status_id(OrderStatus.CODE_CANCELLED))
+        group_fields = KPI_GROUP_FIELDS[params['group_by']]
+        rows = queryset.values(*group_fields).annotate(
+            created=Sum('orders_count', filter=created, default=0),
+            delivered=Sum('orders_count', filter=delivered, default=0),
+            cancelled=Sum('orders_count', filter=cancelled, default=0),
+            delivery_seconds=Sum('lead_time_seconds', filter=delivered, default=0),
+            revenue=Sum('price_total', filter=delivered, default=Decimal('0')),
+        ).order_by(*group_fields)
+
+        for row in rows:
+            row['cancellation_rate'] = round(row['cancelled'] / row['created'], 4) if row['created'] else None
+            row['avg_delivery_hours'] = (
+                round(row['delivery_seconds'] / row['delivered'] / 3600, 2) if row['delivered'] else None)
+        return Response(self.get_serializer(rows, many=True).data)
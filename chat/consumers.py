@@ -0,0 +1,55 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .events import chat_group_name
+from .models import ChatSession
+from .permissions import is_chat_participant
+from .services import mark_messages_read
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket-канал чат-сессии: /ws/chats/<session_id>/.
+
+    Сервер отправляет события {"type": "message", "message": {...}} о новых
+    сообщениях и {"type": "read", "reader_id": ..., "up_to_id": ...} о прочтении.
+    Клиент может отправить {"type": "read", "up_to_id": <id>}, чтобы отметить
+    сообщения прочитанными. Доступ - по тому же правилу, что и IsChatParticipant.
+    """
+    group_name = None
+
+    async def connect(self):
+        self.chat_session_id = self.scope['url_route']['kwargs']['session_id']
+        if not await self.has_access(self.scope.get('user')):
+            await self.close()
+            return
+        self.group_name = chat_group_name(self.chat_session_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') != 'read':
+            return
+        try:
+            up_to_id = int(content.get('up_to_id'))
+        except (TypeError, ValueError):
+            return
+        await database_sync_to_async(mark_messages_read)(self.chat_session_id, self.scope['user'], up_to_id)
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_read(self, event):
+        await self.send_json({'type': 'read', 'reader_id': event['reader_id'], 'up_to_id': event['up_to_id']})
+
+    @database_sync_to_async
+    def has_access(self, user):
+        try:
+            chat_session = ChatSession.objects.select_related('order').get(pk=self.chat_session_id)
+        except ChatSession.DoesNotExist:
+            return False
+        return is_chat_participant(user, chat_session)
@@ -0,0 +1,27 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def chat_group_name(chat_session_id):
+    return f'chat_{chat_session_id}'
+
+
+def _group_send(chat_session_id, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(chat_group_name(chat_session_id), event)
+
+
+def publish_message(message):
+    """Рассылает новое сообщение участникам чата после фиксации транзакции."""
+    from .serializers import ChatMessageSerializer
+
+    event = {'type': 'chat.message', 'message': dict(ChatMessageSerializer(message).data)}
+    transaction.on_commit(lambda: _group_send(message.chat_session_id, event))
+
+
+def publish_read_receipt(chat_session_id, reader_id, up_to_id):
+    """Сообщает участникам чата, что reader_id прочитал сообщения до up_to_id включительно."""
+    event = {'type': 'chat.read', 'reader_id': reader_id, 'up_to_id': up_to_id}
+    transaction.on_commit(lambda: _group_send(chat_session_id, event))
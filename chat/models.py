@@ -1,8 +1,36 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings  # Для ссылки на User модель
 from orders.models import Order  # Для связи чата с заказом
 
 
+class ChatSessionQuerySet(models.QuerySet):
+
+    def with_summary(self, user):
+        """
+        Добавляет к каждой сессии превью последнего сообщения (last_message_*)
+        и количество непрочитанных пользователем сообщений (unread_count)
+        коррелированными подзапросами - без отдельных запросов на каждую сессию.
+        """
+        last_message = ChatMessage.objects.filter(chat_session=OuterRef('pk')).order_by('-timestamp', '-id')
+        unread = (
+            ChatMessage.objects.filter(chat_session=OuterRef('pk'), is_read=False)
+            .exclude(sender=user)
+            .order_by()
+            .values('chat_session')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return self.annotate(
+            last_message_id=Subquery(last_message.values('id')[:1]),
+            last_message_text=Subquery(last_message.values('text_content')[:1]),
+            last_message_timestamp=Subquery(last_message.values('timestamp')[:1]),
+            last_message_sender_id=Subquery(last_message.values('sender_id')[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        )
+
+
 class ChatSession(models.Model):
     """
     Представляет сессию чата, связанную с конкретным заказом,
@@ -23,6 +51,8 @@ class ChatSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Время создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Время последнего сообщения')
 
+    objects = ChatSessionQuerySet.as_manager()
+
     def __str__(self):
         return f"Чат для заказа {self.order.unique_order_id}"
 
@@ -60,4 +90,8 @@ class ChatMessage(models.Model):
     class Meta:
         verbose_name = 'Сообщение в чате'
         verbose_name_plural = 'Сообщения в чатах'
-        ordering = ['timestamp']  # Сообщения обычно отображаются в хронологическом порядке
\ No newline at end of file
+        ordering = ['timestamp']  # Сообщения обычно отображаются в хронологическом порядке
+        indexes = [
+            # Сообщения сессии в порядке ключа пагинации (timestamp, id)
+            models.Index(fields=['chat_session', 'timestamp', 'id'], name='chatmsg_session_ts_idx'),
+        ]
\ No newline at end of file
@@ -2,6 +2,20 @@ from rest_framework import permissions
 from .models import ChatSession
 
 
+def is_chat_participant(user, chat_session):
+    """
+    Общее правило доступа к чату для REST API и WebSocket.
+    Участники - это клиент заказа и назначенный курьер; администраторы имеют доступ ко всему.
+    """
+    if not (user and user.is_authenticated):
+        return False
+    if user.is_staff:
+        return True
+    # Первичный ключ профиля совпадает с id пользователя, поэтому профили и пользователей не загружаем
+    order = chat_session.order
+    return user.pk in (order.client_id, order.courier_id)
+
+
 class IsChatParticipant(permissions.BasePermission):
     """
     Разрешение, которое проверяет, является ли пользователь участником чата.
@@ -10,19 +24,11 @@ class IsChatParticipant(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # obj здесь - это экземпляр ChatSession
-        if request.user and request.user.is_authenticated:
-            if isinstance(obj, ChatSession):
-                chat_session = obj
-            elif hasattr(obj, 'chat_session'):  # Для ChatMessage
-                chat_session = obj.chat_session
-            else:
-                return False
-
-            if request.user.is_staff:
-                return True  # Администраторы имеют доступ ко всему
-
-            # Проверяем, является ли пользователь клиентом или курьером этого заказа
-            return (chat_session.order.client.user == request.user or
-                    (chat_session.order.courier and chat_session.order.courier.user == request.user))
+        if isinstance(obj, ChatSession):
+            chat_session = obj
+        elif hasattr(obj, 'chat_session'):  # Для ChatMessage
+            chat_session = obj.chat_session
+        else:
+            return False
 
-        return False
\ No newline at end of file
+        return is_chat_participant(request.user, chat_session)
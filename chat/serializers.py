@@ -32,7 +32,27 @@ class ChatSessionSerializer(serializers.ModelSerializer):
     """
 
     # messages = ChatMessageSerializer(many=True, read_only=True) # Можно включить, если нужно получать сообщения вместе с сессией
+    # Поля ниже заполняются аннотациями ChatSession.objects.with_summary(user)
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True, default=0)
+
+    LAST_MESSAGE_PREVIEW_LENGTH = 100
 
     class Meta:
         model = ChatSession
-        fields = ['id', 'order', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'order', 'created_at', 'updated_at', 'last_message', 'unread_count']
+
+    def get_last_message(self, obj):
+        if getattr(obj, 'last_message_id', None) is None:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'text_content': obj.last_message_text[:self.LAST_MESSAGE_PREVIEW_LENGTH],
+            'timestamp': serializers.DateTimeField().to_representation(obj.last_message_timestamp),
+            'sender_id': obj.last_message_sender_id,
+        }
+
+
+class ChatMarkReadSerializer(serializers.Serializer):
+    """Параметры массовой отметки сообщений прочитанными."""
+    up_to_id = serializers.IntegerField(min_value=1)
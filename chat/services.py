@@ -0,0 +1,15 @@
+from .events import publish_read_receipt
+from .models import ChatMessage
+
+
+def mark_messages_read(chat_session_id, reader, up_to_id):
+    """
+    Отмечает прочитанными все чужие сообщения чата с id <= up_to_id одним UPDATE
+    и рассылает уведомление о прочтении. Возвращает количество обновленных сообщений.
+    """
+    updated = ChatMessage.objects.filter(
+        chat_session_id=chat_session_id, id__lte=up_to_id, is_read=False
+    ).exclude(sender=reader).update(is_read=True)
+    if updated:
+        publish_read_receipt(chat_session_id, reader.pk, up_to_id)
+    return updated
@@ -1,3 +1,206 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from orders.tests import OrderTestMixin
+from users.middleware import TokenAuthMiddleware
+from users.models import User
+from .models import ChatSession, ChatMessage
+from .routing import websocket_urlpatterns
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class ChatTestMixin(OrderTestMixin):
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        self.chat_session = ChatSession.objects.create(order=self.order)
+
+
+class ChatMessageIndexPlanTests(ChatTestMixin, TestCase):
+
+    def test_session_messages_use_session_timestamp_index(self):
+        for text in ('a', 'b', 'c'):
+            ChatMessage.objects.create(chat_session=self.chat_session, sender=self.client_user, text_content=text)
+        queryset = ChatMessage.objects.filter(chat_session=self.chat_session).order_by('timestamp', 'id')[:51]
+        self.assertUsesIndex(queryset, 'chatmsg_session_ts_idx')
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatWebSocketTests(ChatTestMixin, TestCase):
+    application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def communicator_for(self, user=None):
+        path = f'/ws/chats/{self.chat_session.pk}/'
+        if user is not None:
+            path += f'?token={Token.objects.get_or_create(user=user)[0].key}'
+        return WebsocketCommunicator(self.application, path)
+
+    def post_message(self, user, text):
+        api = APIClient()
+        api.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return api.post(
+                reverse('chat_api:chat_message_list_create', args=[self.chat_session.pk]),
+                {'text_content': text}, format='json',
+            )
+
+    def test_participant_receives_new_messages(self):
+        communicator = self.communicator_for(self.courier_user)
+
+        # Все шаги выполняются в одном event loop, синхронный код - в основном потоке теста
+        async def scenario():
+            connected, _ = await communicator.connect()
+            response = await sync_to_async(self.post_message)(self.client_user, 'Здравствуйте')
+            event = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return connected, response.status_code, event
+
+        connected, status_code, event = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual(status_code, 201)
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['message']['text_content'], 'Здравствуйте')
+        self.assertEqual(event['message']['sender_id'], self.client_user.pk)
+
+    def test_read_receipt_is_broadcast(self):
+        message = ChatMessage.objects.create(
+            chat_session=self.chat_session, sender=self.client_user, text_content='Привет')
+        communicator = self.communicator_for(self.courier_user)
+
+        async def scenario():
+            await communicator.connect()
+            # on_commit-колбэки регистрируются в основном потоке, где работает ORM
+            capture = self.captureOnCommitCallbacks(execute=True)
+            await sync_to_async(capture.__enter__)()
+            await communicator.send_json_to({'type': 'read', 'up_to_id': message.pk})
+            await communicator.receive_nothing(timeout=0.2)
+            await sync_to_async(capture.__exit__)(None, None, None)
+            event = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return event
+
+        event = async_to_sync(scenario)()
+        self.assertEqual(event, {'type': 'read', 'reader_id': self.courier_user.pk, 'up_to_id': message.pk})
+        message.refresh_from_db()
+        self.assertTrue(message.is_read)
+
+    def test_outsider_and_anonymous_are_rejected(self):
+        outsider = User.objects.create_user('+77010000005', role=User.ROLE_COURIER)
+        self.create_courier(outsider, '000000000005')
+
+        for communicator in (self.communicator_for(outsider), self.communicator_for()):
+            connected, _ = async_to_sync(communicator.connect)()
+            self.assertFalse(connected)
+
+
+class ChatSyncTests(ChatTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.courier_user)
+        self.messages = [
+            ChatMessage.objects.create(chat_session=self.chat_session, sender=self.client_user, text_content=text)
+            for text in ('первое', 'второе', 'третье')
+        ]
+
+    def test_after_id_returns_only_newer_messages(self):
+        response = self.api.get(
+            reverse('chat_api:chat_message_list_create', args=[self.chat_session.pk]),
+            {'after_id': self.messages[0].pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.json()['results']], [m.pk for m in self.messages[1:]])
+
+    def test_since_rejects_invalid_value(self):
+        url = reverse('chat_api:chat_message_list_create', args=[self.chat_session.pk])
+        for since in ('вчера', '2024-13-45T00:00:00'):
+            response = self.api.get(url, {'since': since})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('since', response.json())
+
+    def test_session_list_has_preview_and_unread_count_in_constant_queries(self):
+        url = reverse('chat_api:chat_session_list')
+        self.api.get(url)
+        with CaptureQueriesContext(connection) as single:
+            self.api.get(url)
+
+        for _ in range(3):
+            order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+            session = ChatSession.objects.create(order=order)
+            ChatMessage.objects.create(chat_session=session, sender=self.client_user, text_content='x')
+        with CaptureQueriesContext(connection) as many:
+            response = self.api.get(url)
+        self.assertEqual(len(single.captured_queries), len(many.captured_queries))
+
+        summary = next(item for item in response.json() if item['id'] == self.chat_session.pk)
+        self.assertEqual(summary['unread_count'], 3)
+        self.assertEqual(summary['last_message']['id'], self.messages[-1].pk)
+        self.assertEqual(summary['last_message']['text_content'], 'третье')
+
+    def test_mark_read_updates_up_to_message(self):
+        response = self.api.post(
+            reverse('chat_api:chat_mark_read', args=[self.chat_session.pk]),
+            {'up_to_id': self.messages[1].pk}, format='json',
+        )
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertEqual(
+            list(ChatMessage.objects.order_by('id').values_list('is_read', flat=True)), [True, True, False])
+
+    def test_mark_read_ignores_own_messages(self):
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post(
+            reverse('chat_api:chat_mark_read', args=[self.chat_session.pk]),
+            {'up_to_id': self.messages[-1].pk}, format='json',
+        )
+        self.assertEqual(response.json(), {'updated': 0})
+
+
+class ChatMessageWriteTests(ChatTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.url = reverse('chat_api:chat_message_list_create', args=[self.chat_session.pk])
+
+    def test_send_message_uses_constant_number_of_queries(self):
+        self.api.force_authenticate(self.client_user)
+        previous_updated_at = self.chat_session.updated_at
+        # Транзакция (SAVEPOINT/RELEASE в тесте): UPDATE chat_session.updated_at с проверкой участия,
+        # INSERT сообщения и INSERT события push-уведомления
+        with self.assertNumQueries(5):
+            response = self.api.post(self.url, {'text_content': 'Где курьер?'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['chat_session'], self.chat_session.pk)
+        self.chat_session.refresh_from_db()
+        self.assertGreater(self.chat_session.updated_at, previous_updated_at)
+
+    def test_list_messages_uses_constant_number_of_queries(self):
+        for text in ('a', 'b', 'c'):
+            ChatMessage.objects.create(chat_session=self.chat_session, sender=self.client_user, text_content=text)
+        self.api.force_authenticate(self.courier_user)
+        # Проверка участия + страница сообщений с отправителями
+        with self.assertNumQueries(2):
+            response = self.api.get(self.url)
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_outsider_cannot_send_or_read(self):
+        outsider = User.objects.create_user('+77010000006', role=User.ROLE_CLIENT)
+        self.api.force_authenticate(outsider)
+        self.assertEqual(self.api.post(self.url, {'text_content': 'x'}, format='json').status_code, 403)
+        self.assertEqual(self.api.get(self.url).status_code, 403)
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_missing_session_returns_400(self):
+        self.api.force_authenticate(self.client_user)
+        url = reverse('chat_api:chat_message_list_create', args=[999999])
+        self.assertEqual(self.api.post(url, {'text_content': 'x'}, format='json').status_code, 400)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ChatSessionListAPIView, ChatMessageListCreateAPIView
+from .views import ChatSessionListAPIView, ChatMessageListCreateAPIView, ChatMarkReadAPIView
 
 app_name = 'chat_api'
 
@@ -9,4 +9,7 @@ urlpatterns = [
 
     # Список сообщений и создание нового сообщения для конкретного чата
     path('<int:session_id>/messages/', ChatMessageListCreateAPIView.as_view(), name='chat_message_list_create'),
+
+    # Отметить прочитанными все сообщения до указанного включительно
+    path('<int:session_id>/read/', ChatMarkReadAPIView.as_view(), name='chat_mark_read'),
 ]
\ No newline at end of file
@@ -1,8 +1,45 @@
-from rest_framework import generics, permissions
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions, generics, permissions, serializers
+from rest_framework.response import Response
 from .models import ChatSession, ChatMessage
-from .serializers import ChatSessionSerializer, ChatMessageSerializer
+from .serializers import ChatSessionSerializer, ChatMessageSerializer, ChatMarkReadSerializer
+from .events import publish_message
 from .permissions import IsChatParticipant  # Импортируем наше разрешение
-from users.models import User
+from .services import mark_messages_read
+from users.actor import get_actor
+from notifications.outbox import enqueue_chat_message
+from core.pagination import KeysetPagination
+
+
+class ChatMessageCursorPagination(KeysetPagination):
+    # Сообщения листаются в хронологическом порядке
+    ordering = ('timestamp', 'id')
+
+
+class ChatParticipantMixin:
+    """
+    Проверка участия в чате одним запросом: id клиента и курьера заказа
+    (они совпадают с id их пользователей) берутся через JOIN, без загрузки
+    сессии, заказа, профилей и пользователей по отдельности.
+    """
+    permission_denied_message = "У вас нет доступа к этому чату."
+
+    def get_chat_participants(self, session_id):
+        return (ChatSession.objects.filter(pk=session_id)
+                .values_list('order__client_id', 'order__courier_id').first())
+
+    def check_chat_participant(self, session_id):
+        """Возвращает False, если сессии нет; бросает PermissionDenied, если пользователь не участник."""
+        participants = self.get_chat_participants(session_id)
+        if participants is None:
+            return False
+        user = self.request.user
+        if not (user.is_staff or user.pk in participants):
+            raise exceptions.PermissionDenied(self.permission_denied_message)
+        return True
 
 
 class ChatSessionListAPIView(generics.ListAPIView):
@@ -14,47 +51,93 @@ class ChatSessionListAPIView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        if user.role == User.ROLE_CLIENT and hasattr(user, 'client_profile'):
-            return ChatSession.objects.filter(order__client=user.client_profile)
-        elif user.role == User.ROLE_COURIER and hasattr(user, 'courier_profile'):
-            return ChatSession.objects.filter(order__courier=user.courier_profile)
+        actor = get_actor(user)
+        if actor.is_client:
+            return ChatSession.objects.filter(order__client_id=actor.client_id).with_summary(user)
+        elif actor.is_courier:
+            return ChatSession.objects.filter(order__courier_id=actor.courier_id).with_summary(user)
         return ChatSession.objects.none()
 
 
-class ChatMessageListCreateAPIView(generics.ListCreateAPIView):
+class ChatMessageListCreateAPIView(ChatParticipantMixin, generics.ListCreateAPIView):
     """
     Возвращает список сообщений в чате или создает новое сообщение.
     Доступно только участникам чата.
+
+    Для инкрементальной синхронизации можно передать ?after_id=<id последнего
+    полученного сообщения> или ?since=<ISO-время>: вернутся только более новые сообщения.
     """
     serializer_class = ChatMessageSerializer
     permission_classes = [permissions.IsAuthenticated, IsChatParticipant]
+    pagination_class = ChatMessageCursorPagination
 
     def get_queryset(self):
         """
         Возвращает сообщения только для указанной в URL сессии чата.
         """
         session_id = self.kwargs.get('session_id')
-        try:
-            chat_session = ChatSession.objects.get(id=session_id)
-            # Проверяем права доступа к объекту chat_session
-            self.check_object_permissions(self.request, chat_session)
-            return chat_session.messages.all()
-        except ChatSession.DoesNotExist:
+        if not self.check_chat_participant(session_id):
             return ChatMessage.objects.none()
+        messages = ChatMessage.objects.filter(chat_session_id=session_id).select_related('sender')
+        return self.filter_by_watermark(messages)
+
+    def filter_by_watermark(self, queryset):
+        after_id = self.request.query_params.get('after_id')
+        if after_id is not None:
+            try:
+                queryset = queryset.filter(id__gt=int(after_id))
+            except ValueError:
+                raise serializers.ValidationError({'after_id': 'Ожидается целое число.'})
+
+        since = self.request.query_params.get('since')
+        if since is not None:
+            try:
+                since_dt = parse_datetime(since.replace(' ', '+'))
+            except ValueError:  # Формат верный, но даты нет, например 2024-13-45
+                since_dt = None
+            if since_dt is None:
+                raise serializers.ValidationError({'since': 'Ожидается дата и время в формате ISO 8601.'})
+            queryset = queryset.filter(timestamp__gt=since_dt)
+        return queryset
 
     def perform_create(self, serializer):
         """
         При создании нового сообщения, устанавливаем отправителя и сессию чата.
+
+        Успешная отправка - в одной транзакции UPDATE updated_at, совмещенный
+        с проверкой участия, INSERT сообщения и INSERT события push-уведомления.
         """
         session_id = self.kwargs.get('session_id')
-        try:
-            chat_session = ChatSession.objects.get(id=session_id)
-            # Проверяем права доступа к объекту chat_session
-            self.check_object_permissions(self.request, chat_session)
+        user = self.request.user
+
+        sessions = ChatSession.objects.filter(pk=session_id)
+        if not user.is_staff:
+            sessions = sessions.filter(Q(order__client_id=user.pk) | Q(order__courier_id=user.pk))
+        with transaction.atomic():
+            # Обновляем только `updated_at` у чат сессии при новом сообщении
+            if not sessions.update(updated_at=timezone.now()):
+                if ChatSession.objects.filter(pk=session_id).exists():
+                    raise exceptions.PermissionDenied(self.permission_denied_message)
+                raise serializers.ValidationError("Чат сессия с указанным ID не найдена.")
+
+            message = serializer.save(sender=user, chat_session_id=session_id)
+            enqueue_chat_message(message)
+        publish_message(message)
+
+
+class ChatMarkReadAPIView(ChatParticipantMixin, generics.GenericAPIView):
+    """
+    Отмечает прочитанными все чужие сообщения чата до up_to_id включительно
+    одним UPDATE и рассылает уведомление о прочтении участникам чата.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsChatParticipant]
+    serializer_class = ChatMarkReadSerializer
 
-            # Обновляем `updated_at` у чат сессии при новом сообщении
-            chat_session.save()  # Просто вызываем save, чтобы `auto_now=True` сработало
+    def post(self, request, session_id):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not self.check_chat_participant(session_id):
+            raise exceptions.NotFound("Чат сессия с указанным ID не найдена.")
 
-            serializer.save(sender=self.request.user, chat_session=chat_session)
-        except ChatSession.DoesNotExist:
-            raise serializers.ValidationError("Чат сессия с указанным ID не найдена.")
\ No newline at end of file
+        updated = mark_messages_read(session_id, request.user, serializer.validated_data['up_to_id'])
+        return Response({'updated': updated})
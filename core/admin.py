@@ -10,7 +10,7 @@ class CityAdmin(admin.ModelAdmin):
 @admin.register(PackageSize)
 class PackageSizeAdmin(admin.ModelAdmin):
     # --- ИЗМЕНЕНИЕ ЗДЕСЬ ---
-    list_display = ('name', 'photo', 'is_active') # Заменили 'photo_url' на 'photo'
+    list_display = ('name', 'photo', 'capacity_units', 'price_multiplier', 'is_active') # Заменили 'photo_url' на 'photo'
     # ----------------------
     list_filter = ('is_active',)
     search_fields = ('name',)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(name):
+    return f'reference:{name}:version'
+
+
+def invalidate_reference_cache(name):
+    """Сбрасывает все закэшированные варианты справочника (для всех хостов)."""
+    cache.set(_version_key(name), time.time_ns(), None)
+
+
+class CachedReferenceListMixin:
+    """
+    Кэширует сериализованный список справочника и отвечает 304 Not Modified
+    на условные запросы (If-None-Match / If-Modified-Since).
+
+    Закэшированный ответ не требует запросов к БД; ключ включает версию
+    справочника, которую сбрасывает invalidate_reference_cache из сигналов.
+    Хост входит в ключ, потому что сериализаторы строят абсолютные URL (фото).
+    """
+    reference_cache_name = None
+    reference_cache_timeout = REFERENCE_CACHE_TIMEOUT
+
+    def get_reference_cache_key(self, request):
+        version = cache.get_or_set(_version_key(self.reference_cache_name), time.time_ns, None)
+        return f'reference:{self.reference_cache_name}:{version}:{request.scheme}://{request.get_host()}'
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_reference_cache_key(request)
+        entry = cache.get(cache_key)
+        if entry is None:
+            entry = make_cache_entry(super().list(request, *args, **kwargs).data)
+            cache.set(cache_key, entry, self.reference_cache_timeout)
+        return conditional_response(request, entry)
+
+
+def make_cache_entry(data):
+    """Запись кэша для ответа с валидаторами: данные, ETag (md5 JSON) и время изменения."""
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode('utf-8')
+    return {
+        'data': data,
+        'etag': f'"{hashlib.md5(content).hexdigest()}"',
+        'last_modified': int(time.time()),
+    }
+
+
+def conditional_response(request, entry):
+    """Ответ из записи make_cache_entry: 304 Not Modified, если у клиента актуальная версия."""
+    not_modified = get_conditional_response(
+        request._request, etag=entry['etag'], last_modified=entry['last_modified']
+    )
+    response = not_modified if not_modified is not None else Response(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = 'no-cache'
+    return response
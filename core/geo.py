@@ -0,0 +1,82 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Точность 5 - ячейка примерно 4.9 x 4.9 км на экваторе (уже по долготе ближе к полюсам)
+GEOHASH_PRECISION = 5
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние по большому кругу между двумя точками в километрах."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Кодирует координаты в geohash заданной длины."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # Биты чередуются: сначала долгота, затем широта
+    while len(chars) < precision:
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision=GEOHASH_PRECISION):
+    """Размер ячейки geohash в градусах: (широта, долгота)."""
+    total_bits = precision * 5
+    lat_bits = total_bits // 2
+    lon_bits = total_bits - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _axis_samples(start, stop, step):
+    # Точки с шагом в размер ячейки плюс правая граница попадают в каждую ячейку отрезка
+    count = int((stop - start) / step) + 1
+    return [start + i * step for i in range(count)] + [stop]
+
+
+def geohash_cells_within(latitude, longitude, radius_km, precision=GEOHASH_PRECISION):
+    """
+    Возвращает множество ячеек geohash, покрывающих круг радиуса radius_km.
+
+    Покрывается описанный вокруг круга прямоугольник, поэтому в ячейки могут
+    попасть точки чуть дальше радиуса - их отсекает точная проверка haversine_km.
+    Число ячеек зависит только от радиуса и точности, а не от объема данных.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    lat_step, lon_step = geohash_cell_size(precision)
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    # У полюсов градус долготы стремится к нулю, ограничиваем охват всей окружностью
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    delta_lon = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+
+    min_lat, max_lat = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    cells = set()
+    for lat in _axis_samples(min_lat, max_lat, lat_step):
+        for lon in _axis_samples(longitude - delta_lon, longitude + delta_lon, lon_step):
+            # Переход через антимеридиан
+            lon = (lon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(min(lat, 90.0 - 1e-9), lon, precision))
+    return cells
@@ -0,0 +1,89 @@
+import functools
+import hashlib
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .geo import KM_PER_DEGREE_LAT
+
+logger = logging.getLogger(__name__)
+
+COORDINATE_QUANT = Decimal('0.000001')  # Как у DecimalField(max_digits=9, decimal_places=6)
+
+
+class GeocodingError(Exception):
+    """Геокодер недоступен или вернул ошибку."""
+
+
+class BaseGeocoder:
+    """
+    Интерфейс геокодера: адрес в пределах города -> (широта, долгота).
+
+    Реализация выбирается настройкой GEOCODER_BACKEND (путь к классу).
+    geocode возвращает пару Decimal или None, если адрес не найден;
+    при сбое сервиса бросает GeocodingError.
+    """
+
+    def geocode(self, address, city):
+        raise NotImplementedError
+
+    def geocode_many(self, requests):
+        """
+        Пакетное геокодирование списка пар (адрес, город).
+
+        По умолчанию вызывает geocode по одному; сервисы с пакетным API
+        могут переопределить метод и отправлять запросы пачками.
+        """
+        return [self.geocode(address, city) for address, city in requests]
+
+
+class OfflineGeocoder(BaseGeocoder):
+    """
+    Геокодер без внешних сервисов для разработки и тестов.
+
+    Возвращает детерминированную точку в пределах spread_km от центра города,
+    вычисленную по хэшу адреса: один и тот же адрес всегда дает одну точку,
+    разные адреса разнесены по городу.
+    """
+    spread_km = 5
+
+    def geocode(self, address, city):
+        if city is None or city.center_latitude is None or city.center_longitude is None:
+            return None
+        digest = hashlib.sha256(address.strip().lower().encode('utf-8')).digest()
+        # Два смещения в диапазоне [-1, 1] из первых байтов хэша
+        offset_lat = int.from_bytes(digest[:4], 'big') / 0xFFFFFFFF * 2 - 1
+        offset_lon = int.from_bytes(digest[4:8], 'big') / 0xFFFFFFFF * 2 - 1
+        delta = Decimal(self.spread_km / KM_PER_DEGREE_LAT)
+        latitude = city.center_latitude + delta * Decimal(offset_lat)
+        longitude = city.center_longitude + delta * Decimal(offset_lon)
+        return latitude.quantize(COORDINATE_QUANT), longitude.quantize(COORDINATE_QUANT)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_geocoder(path):
+    return import_string(path)()
+
+
+def get_geocoder():
+    return _load_geocoder(settings.GEOCODER_BACKEND)
+
+
+def geocode_or_none(address, city):
+    """Геокодирует адрес; ошибки сервиса не должны мешать созданию заказа."""
+    try:
+        return get_geocoder().geocode(address, city)
+    except GeocodingError:
+        logger.warning('Не удалось геокодировать адрес %r', address, exc_info=True)
+        return None
+
+
+def geocode_many_or_none(requests):
+    """Пакетный вариант geocode_or_none: при сбое сервиса все точки пачки - None."""
+    try:
+        return get_geocoder().geocode_many(requests)
+    except GeocodingError:
+        logger.warning('Не удалось геокодировать пачку из %d адресов', len(requests), exc_info=True)
+        return [None] * len(requests)
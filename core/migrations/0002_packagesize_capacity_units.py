@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packagesize',
+            name='capacity_units',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Сколько места посылка занимает в машине при объединении заказов в рейс', verbose_name='Объем, условных единиц'),
+        ),
+    ]
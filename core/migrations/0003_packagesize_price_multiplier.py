@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_packagesize_capacity_units'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packagesize',
+            name='price_multiplier',
+            field=models.DecimalField(decimal_places=2, default=1, help_text='Множитель тарифа доставки для посылок этого размера', max_digits=5, verbose_name='Коэффициент цены'),
+        ),
+    ]
@@ -39,6 +39,14 @@ class PackageSize(models.Model):
         upload_to=get_package_size_upload_path, 
         blank=True, null=True, verbose_name='Фото размера'
     )
+    capacity_units = models.PositiveSmallIntegerField(
+        default=1, verbose_name='Объем, условных единиц',
+        help_text='Сколько места посылка занимает в машине при объединении заказов в рейс'
+    )
+    price_multiplier = models.DecimalField(
+        max_digits=5, decimal_places=2, default=1, verbose_name='Коэффициент цены',
+        help_text='Множитель тарифа доставки для посылок этого размера'
+    )
     is_active = models.BooleanField(default=True, verbose_name='Активен')
 
     def __str__(self):
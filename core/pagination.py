@@ -0,0 +1,144 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по составному ключу, например (created_at, id).
+
+    Каждая страница выбирается условием "строго после последней записи
+    предыдущей страницы" вместо OFFSET, поэтому стоимость запроса не зависит
+    от глубины прокрутки, а вставка новых записей во время листания
+    не приводит к дублям и пропускам. Последнее поле ordering должно быть
+    уникальным (обычно id), чтобы порядок был строгим.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Берем одну лишнюю запись, чтобы узнать, есть ли следующая страница
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, instance):
+        return [getattr(instance, field.attname) for field in self.fields]
+
+    def get_position_filter(self, position):
+        """
+        Строит лексикографическое условие (a, b) > (x, y) в виде
+        (a > x) OR (a = x AND b > y) с учетом направления сортировки.
+        """
+        condition = Q()
+        equal_prefix = {}
+        for name, field, value in zip(self.ordering, self.fields, position):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal_prefix, **{f'{field.attname}__{lookup}': value})
+            equal_prefix[field.attname] = value
+        return condition
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        encoded = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def load_cursor(self, request):
+        """Значения курсора из запроса списком (еще не приведенные к типам полей) или None."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        return values
+
+    def decode_cursor(self, request):
+        values = self.load_cursor(request)
+        if values is None:
+            return None
+        try:
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        if any(value is None for value in position):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор следующей страницы (из поля next).',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Размер страницы (не более {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
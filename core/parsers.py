@@ -0,0 +1,38 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Разбирает text/csv с заголовком в список словарей (как JSON-массив объектов).
+
+    Тело читается из потока построчно; пустые ячейки опускаются, чтобы
+    необязательные поля сериализатора считались непереданными. Если задан
+    max_rows, чтение прекращается на первой строке сверх лимита: файл
+    целиком в память не загружается.
+    """
+    media_type = 'text/csv'
+    max_rows = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return []
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name == 'utf-8':
+            encoding = 'utf-8-sig'  # Excel сохраняет CSV с BOM
+        rows = []
+        try:
+            reader = csv.DictReader(codecs.getreader(encoding)(stream))
+            for row in reader:
+                if self.max_rows is not None and len(rows) == self.max_rows:
+                    raise ParseError(f'В файле больше {self.max_rows} строк.')
+                if None in row:
+                    raise ParseError(f'Строка {reader.line_num}: значений больше, чем колонок в заголовке.')
+                rows.append({name.strip(): value for name, value in row.items() if value not in (None, '')})
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f'Некорректный CSV: {exc}')
+        return rows
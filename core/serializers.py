@@ -9,5 +9,5 @@ class CitySerializer(serializers.ModelSerializer):
 class PackageSizeSerializer(serializers.ModelSerializer):
     class Meta:
         model = PackageSize
-        fields = ['id', 'name', 'description', 'photo', 'is_active']
+        fields = ['id', 'name', 'description', 'photo', 'capacity_units', 'price_multiplier', 'is_active']
         # 'photo' поле ImageField при сериализации вернет URL к изображению, если настроен MEDIA_URL
\ No newline at end of file
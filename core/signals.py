@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_reference_cache
+from .models import City, PackageSize
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_cache(sender, **kwargs):
+    invalidate_reference_cache('cities')
+
+
+@receiver(post_save, sender=PackageSize)
+@receiver(post_delete, sender=PackageSize)
+def invalidate_package_size_cache(sender, **kwargs):
+    invalidate_reference_cache('package_sizes')
@@ -1,3 +1,70 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .geo import geohash_cells_within, geohash_encode, haversine_km
+from .models import City
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReferenceListCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.city = City.objects.create(name='Алматы')
+
+    def setUp(self):
+        cache.clear()
+        self.api = APIClient()
+        self.url = reverse('core_api:city_list')
+
+    def test_cached_list_is_served_without_queries(self):
+        first = self.api.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.api.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_requests_return_304(self):
+        response = self.api.get(self.url)
+        not_modified = self.api.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.api.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_admin_save_invalidates_cache(self):
+        response = self.api.get(self.url)
+        self.city.name = 'Алма-Ата'
+        self.city.save()
+
+        fresh = self.api.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+        self.assertEqual(fresh.json()[0]['name'], 'Алма-Ата')
+
+
+class GeoTests(SimpleTestCase):
+
+    def test_geohash_matches_reference_value(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_haversine_distance(self):
+        # Алматы - Астана, около 970 км по прямой
+        self.assertAlmostEqual(haversine_km(43.238949, 76.889709, 51.128207, 71.430411), 968.8, delta=1)
+
+    def test_cells_cover_every_point_in_radius(self):
+        cells = geohash_cells_within(43.24, 76.89, 10)
+        for d_lat, d_lon in [(0.089, 0), (-0.089, 0), (0, 0.123), (0, -0.123), (0.06, 0.08)]:
+            point = (43.24 + d_lat, 76.89 + d_lon)
+            self.assertLessEqual(haversine_km(43.24, 76.89, *point), 10)
+            self.assertIn(geohash_encode(*point), cells)
+        self.assertNotIn(geohash_encode(43.5, 76.89), cells)
+
+    def test_cells_wrap_around_antimeridian(self):
+        cells = geohash_cells_within(0, 179.99, 5)
+        self.assertIn(geohash_encode(0, -179.99), cells)
@@ -1,13 +1,16 @@
 from rest_framework import generics, permissions
+from .caching import CachedReferenceListMixin
 from .models import City, PackageSize
 from .serializers import CitySerializer, PackageSizeSerializer
 
-class CityListAPIView(generics.ListAPIView):
+class CityListAPIView(CachedReferenceListMixin, generics.ListAPIView):
     queryset = City.objects.filter(is_active=True) # Показываем только активные города
     serializer_class = CitySerializer
     permission_classes = [permissions.AllowAny] # Список городов доступен всем
+    reference_cache_name = 'cities'
 
-class PackageSizeListAPIView(generics.ListAPIView):
+class PackageSizeListAPIView(CachedReferenceListMixin, generics.ListAPIView):
     queryset = PackageSize.objects.filter(is_active=True) # Только активные размеры
     serializer_class = PackageSizeSerializer
-    permission_classes = [permissions.AllowAny] # Список размеров доступен всем
\ No newline at end of file
+    permission_classes = [permissions.AllowAny] # Список размеров доступен всем
+    reference_cache_name = 'package_sizes'
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import CourierLocation
+
+
+@admin.register(CourierLocation)
+class CourierLocationAdmin(admin.ModelAdmin):
+    list_display = ('courier', 'recorded_at', 'latitude', 'longitude', 'accuracy_m')
+    list_select_related = ('courier',)
+    raw_id_fields = ('courier',)
+    # Таблица большая: без COUNT(*) по всей таблице и только фильтр по курьеру через URL
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
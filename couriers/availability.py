@@ -0,0 +1,112 @@
+"""
+Смены курьеров и их доступность для назначения заказов.
+
+Смена (CourierProfile.shift_status) - долговременное состояние в БД, его
+меняют только начало и конец смены. Присутствие на связи - короткоживущая
+запись в индексе (couriers/online_index.py), которую продлевает heartbeat
+приложения: курьер, переставший его присылать, выпадает из индекса через
+AVAILABILITY_TTL секунд, а профиль при этом не обновляется.
+
+Занятость не хранится отдельно: индекс знает число свободных мест курьера
+(COURIER_CAPACITY минус заказы в пути) и пересчитывает его после коммита
+каждой смены статуса, затрагивающей заказы в пути.
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from orders.models import Order, OrderStatus
+from orders.statuses import status_registry
+from orders.trips import TRIP_MAX_ORDERS
+from users.models import CourierProfile
+from .online_index import get_online_index
+
+AVAILABILITY_TTL = 90  # секунд; приложение присылает heartbeat раз в 30 секунд
+# Курьер везет не больше одного рейса
+COURIER_CAPACITY = TRIP_MAX_ORDERS
+
+
+class ShiftError(Exception):
+    """Смену нельзя начать или продолжить."""
+
+
+def active_order_counts(courier_ids):
+    """Число заказов в пути у курьеров одним запросом: {id курьера: количество}."""
+    in_transit = status_registry.get(OrderStatus.CODE_IN_TRANSIT)
+    rows = (Order.objects.filter(courier_id__in=courier_ids, status=in_transit)
+            .values('courier_id').annotate(count=Count('pk')).values_list('courier_id', 'count'))
+    return dict(rows)
+
+
+def free_slots(active_count):
+    return max(0, COURIER_CAPACITY - active_count)
+
+
+def go_online(courier_id):
+    """Начинает смену курьера и ставит его в индекс. Возвращает число свободных мест."""
+    profile = (CourierProfile.objects.filter(pk=courier_id, user__is_active=True)
+               .values_list('city_id', 'shift_status').first())
+    if profile is None or profile[0] is None:
+        raise ShiftError("Для выхода на смену укажите город в профиле.")
+    city_id, shift_status = profile
+    if shift_status != CourierProfile.SHIFT_ONLINE:
+        # update() без save(): сигналы профиля и auto_now для смены не нужны
+        CourierProfile.objects.filter(pk=courier_id).update(
+            shift_status=CourierProfile.SHIFT_ONLINE, shift_started_at=timezone.now())
+    slots = free_slots(active_order_counts([courier_id]).get(courier_id, 0))
+    get_online_index().set_online(courier_id, city_id, slots, AVAILABILITY_TTL)
+    return slots
+
+
+def go_offline(courier_id):
+    """Завершает смену курьера и убирает его из индекса."""
+    CourierProfile.objects.filter(pk=courier_id).update(
+        shift_status=CourierProfile.SHIFT_OFFLINE, shift_started_at=None)
+    get_online_index().remove(courier_id)
+
+
+def heartbeat(courier_id):
+    """
+    Продлевает присутствие курьера на связи. Обычно это одна операция
+    с индексом без запросов к БД; если запись истекла или индекс потерян
+    (перезапуск процесса), она восстанавливается по смене в БД.
+    """
+    if get_online_index().touch(courier_id, AVAILABILITY_TTL):
+        return True
+    on_shift = CourierProfile.objects.filter(
+        pk=courier_id, shift_status=CourierProfile.SHIFT_ONLINE).exists()
+    if not on_shift:
+        return False
+    go_online(courier_id)
+    return True
+
+
+def refresh_courier_capacity(courier_ids):
+    """Пересчитывает свободные места курьеров в индексе по заказам в пути."""
+    courier_ids = list(courier_ids)
+    if not courier_ids:
+        return
+    counts = active_order_counts(courier_ids)
+    index = get_online_index()
+    for courier_id in courier_ids:
+        index.set_free_slots(courier_id, free_slots(counts.get(courier_id, 0)))
+
+
+def refresh_capacity_for_orders(order_ids):
+    """
+    Пересчитывает свободные места курьеров заказов после фиксации текущей
+    транзакции: до коммита подсчет не увидит новых статусов.
+    """
+    order_ids = list(order_ids)
+
+    def refresh():
+        courier_ids = set(Order.objects.filter(pk__in=order_ids, courier__isnull=False)
+                          .values_list('courier_id', flat=True))
+        refresh_courier_capacity(courier_ids)
+
+    transaction.on_commit(refresh)
+
+
+def online_couriers(city_id, min_free_slots=0, limit=None):
+    """Курьеры на связи в городе: список (id курьера, свободных мест); без запросов к БД."""
+    return get_online_index().online_couriers(city_id, min_free_slots, limit)
@@ -0,0 +1,127 @@
+"""
+Прием координат курьеров: буфер в памяти процесса и кэш последней позиции.
+
+Точки не пишутся в БД по одной: запрос только добавляет их в буфер, а буфер
+сбрасывается одним bulk_create, когда в нем набралось LOCATION_FLUSH_SIZE
+точек или прошло LOCATION_FLUSH_INTERVAL секунд с первой точки. Последняя
+позиция курьера сразу кладется в общий кэш (Redis в docker-compose) одной
+записью на запрос: ее читают диспетчер и другие узлы.
+
+Буфер живет в памяти процесса, поэтому при аварийном завершении теряется
+не больше LOCATION_FLUSH_INTERVAL секунд трека; последняя позиция при этом
+уже в кэше. При штатной остановке буфер сбрасывается через atexit.
+"""
+import atexit
+import datetime
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from .models import CourierLocation
+
+logger = logging.getLogger(__name__)
+
+LOCATION_FLUSH_SIZE = 1000
+LOCATION_FLUSH_INTERVAL = 2.0  # секунд
+LOCATION_CACHE_TIMEOUT = 60 * 10
+# Позиция старше этого возраста считается устаревшей (курьер мог выключить приложение)
+LOCATION_FRESH_SECONDS = 60 * 5
+
+
+def location_cache_key(courier_id):
+    return f'courier_location:{courier_id}'
+
+
+class LocationBuffer:
+    """Накопитель точек трека с записью пачками; потокобезопасен."""
+
+    def __init__(self, flush_size=LOCATION_FLUSH_SIZE, flush_interval=LOCATION_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, locations):
+        with self._lock:
+            self._pending.extend(locations)
+            due = len(self._pending) >= self.flush_size
+            if not due and self._timer is None:
+                # Редкие точки не должны ждать, пока буфер наполнится
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def take(self):
+        """Забирает накопленные точки из буфера, отменяя отложенный сброс."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return batch
+
+    def flush(self):
+        """Записывает накопленные точки одним bulk_create. Возвращает их количество."""
+        batch = self.take()
+        if batch:
+            try:
+                CourierLocation.objects.bulk_create(batch, batch_size=self.flush_size)
+            except Exception:
+                # Трек - вспомогательные данные: при сбое БД пачка теряется, а не копится в памяти
+                logger.exception('Не удалось записать %d точек трека', len(batch))
+                return 0
+        return len(batch)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # Поток таймера одноразовый: его соединение с БД не должно остаться открытым
+            connections.close_all()
+
+
+location_buffer = LocationBuffer()
+atexit.register(location_buffer.flush)
+
+
+def ingest_locations(courier_id, pings):
+    """
+    Принимает точки одного курьера: pings - список словарей с latitude,
+    longitude, recorded_at и необязательным accuracy_m. Точки уходят в буфер,
+    самая свежая из них - в кэш последней позиции, если там нет более
+    свежей (пачка, отправленная с задержкой, не откатывает позицию назад).
+    Запросов к БД нет.
+    """
+    if not pings:
+        return 0
+    location_buffer.add([CourierLocation(courier_id=courier_id, **ping) for ping in pings])
+    latest = max(pings, key=lambda ping: ping['recorded_at'])
+    key = location_cache_key(courier_id)
+    cached = cache.get(key)
+    if cached is None or cached[2] < latest['recorded_at']:
+        cache.set(key, (latest['latitude'], latest['longitude'], latest['recorded_at']), LOCATION_CACHE_TIMEOUT)
+    return len(pings)
+
+
+def latest_locations(courier_ids, max_age_seconds=LOCATION_FRESH_SECONDS):
+    """Свежие последние позиции курьеров одним запросом к кэшу: {id: (широта, долгота, время)}."""
+    courier_ids = list(courier_ids)
+    if not courier_ids:
+        return {}
+    cached = cache.get_many([location_cache_key(courier_id) for courier_id in courier_ids])
+    threshold = timezone.now() - datetime.timedelta(seconds=max_age_seconds)
+    result = {}
+    for courier_id in courier_ids:
+        value = cached.get(location_cache_key(courier_id))
+        if value is not None and value[2] >= threshold:
+            result[courier_id] = value
+    return result
@@ -0,0 +1,88 @@
+import datetime
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from couriers.locations import ingest_locations, location_buffer, location_cache_key
+from couriers.models import CourierLocation
+from core.models import City
+from users.models import CourierProfile, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает прием координат курьеров: запись каждой точки отдельным '
+        'INSERT и буферизованная запись пачками (couriers/locations.py). '
+        'Все созданные данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--couriers', type=int, default=500, help='Количество курьеров')
+        parser.add_argument('--pings', type=int, default=20000, help='Количество точек в каждом прогоне')
+        parser.add_argument('--batch', type=int, default=10, help='Точек в одном запросе курьера')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        with transaction.atomic():
+            courier_ids = self.create_couriers(options['couriers'])
+            requests = self.generate_requests(rng, courier_ids, options['pings'], options['batch'])
+            for mode in ('single', 'buffered'):
+                elapsed, queries = self.run(mode, requests)
+                pings = options['pings']
+                self.stdout.write(
+                    f'{mode:>8}: {pings} точек за {elapsed:.3f} с '
+                    f'({pings / elapsed:.0f} точек/с, {queries / pings:.3f} запросов на точку)'
+                )
+            transaction.set_rollback(True)
+        cache.delete_many([location_cache_key(courier_id) for courier_id in courier_ids])
+
+    def create_couriers(self, count):
+        city = City.objects.create(name='Benchmark City')
+        users = User.objects.bulk_create([
+            User(phone_number=f'+7000{index:07d}', role=User.ROLE_COURIER) for index in range(count)])
+        CourierProfile.objects.bulk_create([
+            CourierProfile(user=user, full_name='Benchmark', iin=f'9{index:011d}', city=city,
+                           date_of_birth=datetime.date(1990, 1, 1))
+            for index, user in enumerate(users)
+        ])
+        return [user.pk for user in users]
+
+    def generate_requests(self, rng, courier_ids, pings, batch):
+        now = timezone.now()
+        points = np.column_stack([rng.uniform(43.1, 43.4, pings), rng.uniform(76.7, 77.1, pings)]).tolist()
+        requests = []
+        for start in range(0, pings, batch):
+            courier_id = courier_ids[(start // batch) % len(courier_ids)]
+            requests.append((courier_id, [
+                {'latitude': lat, 'longitude': lon, 'recorded_at': now, 'accuracy_m': 5.0}
+                for lat, lon in points[start:start + batch]
+            ]))
+        return requests
+
+    def run(self, mode, requests):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            # Счетчик вместо CaptureQueriesContext: тот хранит не больше 9000 запросов
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            if mode == 'single':
+                for courier_id, pings in requests:
+                    for ping in pings:
+                        CourierLocation.objects.create(courier_id=courier_id, **ping)
+                    cache.set(location_cache_key(courier_id), pings[-1])
+            else:
+                for courier_id, pings in requests:
+                    ingest_locations(courier_id, pings)
+                location_buffer.flush()
+            elapsed = time.perf_counter() - started
+        return elapsed, queries
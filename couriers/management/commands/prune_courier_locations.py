@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from couriers.models import CourierLocation
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет точки треков курьеров старше --days дней порциями по индексу '
+        'recorded_at, не блокируя таблицу одним большим DELETE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Сколько дней хранить треки')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Точек в одном DELETE')
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('--days и --chunk-size должны быть положительными.')
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        stale = CourierLocation.objects.filter(recorded_at__lt=cutoff).order_by('recorded_at')
+        deleted = 0
+        while True:
+            ids = list(stale.values_list('pk', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            deleted += CourierLocation.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Удалено точек: {deleted}'))
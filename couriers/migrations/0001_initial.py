@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourierLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(verbose_name='Время на устройстве')),
+                ('latitude', models.FloatField(verbose_name='Широта')),
+                ('longitude', models.FloatField(verbose_name='Долгота')),
+                ('accuracy_m', models.FloatField(blank=True, null=True, verbose_name='Точность, м')),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='users.courierprofile', verbose_name='Курьер')),
+            ],
+            options={
+                'verbose_name': 'Точка трека курьера',
+                'verbose_name_plural': 'Треки курьеров',
+                'indexes': [models.Index(fields=['courier', '-recorded_at'], name='courier_location_track_idx'), models.Index(fields=['recorded_at'], name='courier_location_time_idx')],
+            },
+        ),
+    ]
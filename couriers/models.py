@@ -0,0 +1,30 @@
+from django.db import models
+
+from users.models import CourierProfile
+
+
+class CourierLocation(models.Model):
+    """
+    Точка трека курьера. Таблица растет на тысячи строк в секунду, поэтому
+    строка минимальна: без временных меток Django и с float-координатами
+    (8 байт против numeric). Пишется пачками через буфер couriers/locations.py,
+    старые точки удаляет команда prune_courier_locations.
+    """
+    courier = models.ForeignKey(
+        CourierProfile, on_delete=models.CASCADE, related_name='locations', verbose_name='Курьер'
+    )
+    recorded_at = models.DateTimeField(verbose_name='Время на устройстве')
+    latitude = models.FloatField(verbose_name='Широта')
+    longitude = models.FloatField(verbose_name='Долгота')
+    accuracy_m = models.FloatField(null=True, blank=True, verbose_name='Точность, м')
+
+    def __str__(self):
+        return f"{self.courier_id} @ {self.recorded_at}: {self.latitude}, {self.longitude}"
+
+    class Meta:
+        verbose_name = 'Точка трека курьера'
+        verbose_name_plural = 'Треки курьеров'
+        indexes = [
+            models.Index(fields=['courier', '-recorded_at'], name='courier_location_track_idx'),
+            models.Index(fields=['recorded_at'], name='courier_location_time_idx'),
+        ]
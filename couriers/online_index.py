@@ -0,0 +1,218 @@
+"""
+Индекс курьеров на связи по городам.
+
+Для каждого города хранятся два множества курьеров с временем истечения
+heartbeat: все на связи и только те, у кого есть свободные места. Запрос
+"курьеры на связи в городе X со свободными местами" читает только второе
+множество, поэтому его стоимость пропорциональна ответу, а не числу
+курьеров в системе. Курьер, переставший присылать heartbeat, выпадает из
+индекса по истечении TTL без отдельного процесса очистки.
+
+В docker-compose индекс хранится в Redis (sorted set на город, общий для
+всех узлов); без REDIS_URL используется реализация в памяти процесса.
+"""
+import functools
+import threading
+import time
+
+from django.conf import settings
+
+
+class LocalOnlineIndex:
+    """Индекс в памяти процесса: для разработки, тестов и одиночного узла."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._online = {}  # id города -> {id курьера: истекает}
+        self._free = {}  # то же, только курьеры со свободными местами
+        self._cities = {}  # id курьера -> id города
+        self._slots = {}  # id курьера -> свободных мест
+
+    def _drop(self, courier_id):
+        city_id = self._cities.pop(courier_id, None)
+        self._slots.pop(courier_id, None)
+        if city_id is not None:
+            self._online.get(city_id, {}).pop(courier_id, None)
+            self._free.get(city_id, {}).pop(courier_id, None)
+
+    def _place(self, courier_id, city_id, free_slots, expires_at):
+        self._cities[courier_id] = city_id
+        self._slots[courier_id] = free_slots
+        self._online.setdefault(city_id, {})[courier_id] = expires_at
+        if free_slots > 0:
+            self._free.setdefault(city_id, {})[courier_id] = expires_at
+        else:
+            self._free.get(city_id, {}).pop(courier_id, None)
+
+    def set_online(self, courier_id, city_id, free_slots, ttl):
+        with self._lock:
+            if self._cities.get(courier_id) != city_id:
+                self._drop(courier_id)
+            self._place(courier_id, city_id, free_slots, time.time() + ttl)
+
+    def touch(self, courier_id, ttl):
+        """
+        Продлевает присутствие курьера; False, если курьера нет в индексе
+        или его запись уже истекла: тогда смена и свободные места
+        проверяются заново по БД (см. availability.heartbeat).
+        """
+        now = time.time()
+        with self._lock:
+            city_id = self._cities.get(courier_id)
+            expires_at = self._online.get(city_id, {}).get(courier_id)
+            if expires_at is None or expires_at <= now:
+                self._drop(courier_id)
+                return False
+            self._place(courier_id, city_id, self._slots[courier_id], now + ttl)
+            return True
+
+    def set_free_slots(self, courier_id, free_slots):
+        with self._lock:
+            city_id = self._cities.get(courier_id)
+            expires_at = self._online.get(city_id, {}).get(courier_id)
+            if expires_at is not None:
+                self._place(courier_id, city_id, free_slots, expires_at)
+
+    def remove(self, courier_id):
+        with self._lock:
+            self._drop(courier_id)
+
+    def online_couriers(self, city_id, min_free_slots=0, limit=None):
+        """Курьеры на связи в городе: список (id курьера, свободных мест)."""
+        now = time.time()
+        result = []
+        with self._lock:
+            members = (self._free if min_free_slots > 0 else self._online).get(city_id, {})
+            for courier_id, expires_at in list(members.items()):
+                if expires_at <= now:
+                    # Истекшие записи удаляются при чтении, как ZREMRANGEBYSCORE в Redis
+                    self._online.get(city_id, {}).pop(courier_id, None)
+                    self._free.get(city_id, {}).pop(courier_id, None)
+                    continue
+                free_slots = self._slots[courier_id]
+                if free_slots >= min_free_slots:
+                    result.append((courier_id, free_slots))
+                    if limit is not None and len(result) == limit:
+                        break
+        return sorted(result)
+
+
+class RedisOnlineIndex:
+    """
+    Индекс в Redis. Ключи:
+    availability:online:<город> и availability:free:<город> - sorted set
+    id курьера -> время истечения; availability:city и availability:slots -
+    hash id курьера -> город и свободные места.
+    """
+    prefix = 'availability'
+
+    def __init__(self, url):
+        import redis  # Нужен только при заданном REDIS_URL
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def _online_key(self, city_id):
+        return f'{self.prefix}:online:{city_id}'
+
+    def _free_key(self, city_id):
+        return f'{self.prefix}:free:{city_id}'
+
+    @property
+    def _cities_key(self):
+        return f'{self.prefix}:city'
+
+    @property
+    def _slots_key(self):
+        return f'{self.prefix}:slots'
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(match=f'{self.prefix}:*'))
+        if keys:
+            self._redis.delete(*keys)
+
+    def _place(self, pipe, courier_id, city_id, free_slots, expires_at):
+        pipe.hset(self._cities_key, courier_id, city_id)
+        pipe.hset(self._slots_key, courier_id, free_slots)
+        pipe.zadd(self._online_key(city_id), {courier_id: expires_at})
+        if free_slots > 0:
+            pipe.zadd(self._free_key(city_id), {courier_id: expires_at})
+        else:
+            pipe.zrem(self._free_key(city_id), courier_id)
+
+    def set_online(self, courier_id, city_id, free_slots, ttl):
+        previous_city = self._redis.hget(self._cities_key, courier_id)
+        with self._redis.pipeline() as pipe:
+            if previous_city is not None and int(previous_city) != city_id:
+                pipe.zrem(self._online_key(previous_city), courier_id)
+                pipe.zrem(self._free_key(previous_city), courier_id)
+            self._place(pipe, courier_id, city_id, free_slots, time.time() + ttl)
+            pipe.execute()
+
+    def touch(self, courier_id, ttl):
+        now = time.time()
+        city_id = self._redis.hget(self._cities_key, courier_id)
+        if city_id is None:
+            return False
+        expires_at = self._redis.zscore(self._online_key(city_id), courier_id)
+        if expires_at is None or expires_at <= now:
+            # Как и в LocalOnlineIndex: истекшая запись восстанавливается через go_online
+            return False
+        free_slots = int(self._redis.hget(self._slots_key, courier_id) or 0)
+        with self._redis.pipeline() as pipe:
+            self._place(pipe, courier_id, int(city_id), free_slots, now + ttl)
+            pipe.execute()
+        return True
+
+    def set_free_slots(self, courier_id, free_slots):
+        city_id = self._redis.hget(self._cities_key, courier_id)
+        if city_id is None:
+            return
+        expires_at = self._redis.zscore(self._online_key(city_id), courier_id)
+        if expires_at is None:
+            return
+        with self._redis.pipeline() as pipe:
+            self._place(pipe, courier_id, int(city_id), free_slots, expires_at)
+            pipe.execute()
+
+    def remove(self, courier_id):
+        city_id = self._redis.hget(self._cities_key, courier_id)
+        with self._redis.pipeline() as pipe:
+            if city_id is not None:
+                pipe.zrem(self._online_key(city_id), courier_id)
+                pipe.zrem(self._free_key(city_id), courier_id)
+            pipe.hdel(self._cities_key, courier_id)
+            pipe.hdel(self._slots_key, courier_id)
+            pipe.execute()
+
+    def online_couriers(self, city_id, min_free_slots=0, limit=None):
+        """Курьеры на связи в городе: список (id курьера, свободных мест)."""
+        now = time.time()
+        key = self._free_key(city_id) if min_free_slots > 0 else self._online_key(city_id)
+        with self._redis.pipeline() as pipe:
+            pipe.zremrangebyscore(self._online_key(city_id), '-inf', now)
+            pipe.zremrangebyscore(self._free_key(city_id), '-inf', now)
+            if limit is None:
+                pipe.zrangebyscore(key, now, '+inf')
+            else:
+                pipe.zrangebyscore(key, now, '+inf', start=0, num=limit)
+            courier_ids = pipe.execute()[-1]
+        if not courier_ids:
+            return []
+        slots = self._redis.hmget(self._slots_key, courier_ids)
+        return sorted(
+            (int(courier_id), int(free_slots))
+            for courier_id, free_slots in zip(courier_ids, slots)
+            if free_slots is not None and int(free_slots) >= min_free_slots
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _load_index(redis_url):
+    return RedisOnlineIndex(redis_url) if redis_url else LocalOnlineIndex()
+
+
+def get_online_index():
+    return _load_index(settings.COURIER_AVAILABILITY_REDIS_URL)
@@ -0,0 +1,44 @@
+import datetime
+
+from django.utils import timezone
+from rest_framework import serializers
+
+LOCATION_MAX_BATCH = 100
+# Приложение может накопить точки без связи, но не старше суток; часы устройства могут немного спешить
+LOCATION_MAX_DELAY = datetime.timedelta(days=1)
+LOCATION_CLOCK_SKEW = datetime.timedelta(minutes=1)
+ONLINE_MAX_LIMIT = 1000
+
+
+class LocationPingSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    recorded_at = serializers.DateTimeField(required=False)
+    accuracy_m = serializers.FloatField(min_value=0, required=False, allow_null=True)
+
+    def validate_recorded_at(self, value):
+        now = timezone.now()
+        if value > now + LOCATION_CLOCK_SKEW:
+            raise serializers.ValidationError('Время точки в будущем.')
+        if value < now - LOCATION_MAX_DELAY:
+            raise serializers.ValidationError('Точка старше суток.')
+        return value
+
+    def validate(self, attrs):
+        attrs.setdefault('recorded_at', timezone.now())
+        return attrs
+
+
+class LocationBatchSerializer(serializers.Serializer):
+    pings = LocationPingSerializer(many=True, max_length=LOCATION_MAX_BATCH, allow_empty=False)
+
+
+class OnlineCouriersQuerySerializer(serializers.Serializer):
+    city_id = serializers.IntegerField(min_value=1)
+    min_free_slots = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=ONLINE_MAX_LIMIT, default=ONLINE_MAX_LIMIT)
+
+
+class OnlineCourierSerializer(serializers.Serializer):
+    courier_id = serializers.IntegerField()
+    free_slots = serializers.IntegerField()
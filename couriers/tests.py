@@ -0,0 +1,254 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.dispatch import dispatch_open_orders
+from orders.services import take_order
+from orders.tests import OrderTestMixin
+from users.models import CourierProfile, User
+from .availability import (
+    AVAILABILITY_TTL, COURIER_CAPACITY, go_offline, go_online, heartbeat, online_couriers, refresh_courier_capacity,
+)
+from .locations import LocationBuffer, latest_locations, location_buffer
+from .models import CourierLocation
+from .online_index import LocalOnlineIndex, get_online_index
+
+
+class CourierLocationTestMixin(OrderTestMixin):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(location_buffer.take)  # Отложенный сброс не должен писать в БД после теста
+        self.api = APIClient()
+        self.api.force_authenticate(self.courier_user)
+        self.url = reverse('couriers_api:courier_locations')
+
+    def ping(self, latitude, longitude, **extra):
+        return {'latitude': latitude, 'longitude': longitude, **extra}
+
+
+class CourierLocationIngestTests(CourierLocationTestMixin, TestCase):
+
+    def test_pings_are_buffered_and_flushed_in_one_insert(self):
+        self.api.post(self.url, {'pings': [self.ping(43.2, 76.9)]}, format='json')  # Роль пользователя
+        pings = [self.ping(43.2 + index / 1000, 76.9, accuracy_m=5) for index in range(50)]
+        with self.assertNumQueries(0):
+            response = self.api.post(self.url, {'pings': pings}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'accepted': 50})
+        self.assertFalse(CourierLocation.objects.exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(location_buffer.flush(), 51)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(CourierLocation.objects.filter(courier=self.courier_profile).count(), 51)
+
+    def test_full_buffer_flushes_immediately(self):
+        buffer = LocationBuffer(flush_size=3)
+        now = timezone.now()
+        buffer.add([CourierLocation(courier=self.courier_profile, recorded_at=now, latitude=1, longitude=1)] * 2)
+        self.assertEqual(len(buffer), 2)
+        buffer.add([CourierLocation(courier=self.courier_profile, recorded_at=now, latitude=1, longitude=1)])
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(CourierLocation.objects.count(), 3)
+
+    def test_latest_position_is_cached(self):
+        earlier = timezone.now() - datetime.timedelta(seconds=30)
+        self.api.post(self.url, {'pings': [
+            self.ping(43.3, 76.95), self.ping(43.1, 76.8, recorded_at=earlier.isoformat()),
+        ]}, format='json')
+        latitude, longitude, _ = latest_locations([self.courier_profile.pk])[self.courier_profile.pk]
+        self.assertEqual((latitude, longitude), (43.3, 76.95))
+        self.assertEqual(latest_locations([self.courier_profile.pk], max_age_seconds=-60), {})
+
+    def test_delayed_batch_does_not_overwrite_fresher_position(self):
+        self.api.post(self.url, {'pings': [self.ping(43.3, 76.95)]}, format='json')
+        earlier = timezone.now() - datetime.timedelta(seconds=30)
+        self.api.post(self.url, {'pings': [self.ping(43.1, 76.8, recorded_at=earlier.isoformat())]}, format='json')
+        latitude, longitude, _ = latest_locations([self.courier_profile.pk])[self.courier_profile.pk]
+        self.assertEqual((latitude, longitude), (43.3, 76.95))
+        # Точки задержанной пачки все равно попадают в трек
+        self.assertEqual(location_buffer.flush(), 2)
+
+    def test_invalid_pings_are_rejected(self):
+        stale = (timezone.now() - datetime.timedelta(days=2)).isoformat()
+        for pings in ([], [self.ping(91, 0)], [self.ping(43, 76, recorded_at=stale)], [self.ping(43, 76)] * 101):
+            self.assertEqual(self.api.post(self.url, {'pings': pings}, format='json').status_code, 400)
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.post(self.url, {'pings': [self.ping(43, 76)]}, format='json').status_code, 403)
+
+    def test_prune_deletes_old_points(self):
+        now = timezone.now()
+        CourierLocation.objects.bulk_create([
+            CourierLocation(courier=self.courier_profile, recorded_at=now - datetime.timedelta(days=days),
+                            latitude=1, longitude=1)
+            for days in (0, 40, 50)
+        ])
+        call_command('prune_courier_locations', '--days', '30', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(CourierLocation.objects.count(), 1)
+
+
+class DispatchLiveLocationTests(CourierLocationTestMixin, TestCase):
+
+    def test_dispatch_prefers_live_courier_position(self):
+        second_courier = self.create_courier(
+            User.objects.create_user('+77010000003', 'pass', role=User.ROLE_COURIER), '000000000003')
+        # Заказ на окраине; второй курьер сообщил, что находится рядом с ним
+        order = self.create_order(pickup_latitude=Decimal('43.350000'), pickup_longitude=Decimal('77.000000'))
+        go_online(self.courier_profile.pk)
+        go_online(second_courier.pk)
+        self.api.force_authenticate(second_courier.user)
+        self.api.post(self.url, {'pings': [self.ping(43.349, 77.001)]}, format='json')
+
+        applied = dispatch_open_orders()
+        self.assertEqual([(order_id, courier_id) for order_id, courier_id, _ in applied],
+                         [(order.pk, second_courier.pk)])
+
+
+class OnlineIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = LocalOnlineIndex()
+
+    def test_query_returns_only_city_couriers_with_capacity(self):
+        self.index.set_online(1, 10, free_slots=8, ttl=60)
+        self.index.set_online(2, 10, free_slots=0, ttl=60)
+        self.index.set_online(3, 20, free_slots=8, ttl=60)
+        self.assertEqual(self.index.online_couriers(10), [(1, 8), (2, 0)])
+        self.assertEqual(self.index.online_couriers(10, min_free_slots=1), [(1, 8)])
+        self.assertEqual(self.index.online_couriers(30), [])
+
+        # Смена города и свободных мест переносит курьера между множествами
+        self.index.set_online(1, 20, free_slots=8, ttl=60)
+        self.index.set_free_slots(2, 3)
+        self.assertEqual(self.index.online_couriers(10, min_free_slots=1), [(2, 3)])
+        self.assertEqual(self.index.online_couriers(20, min_free_slots=1), [(1, 8), (3, 8)])
+        self.assertEqual(len(self.index.online_couriers(20, limit=1)), 1)
+
+    def test_couriers_expire_without_heartbeat(self):
+        with mock.patch('couriers.online_index.time.time', return_value=1000.0):
+            self.index.set_online(1, 10, free_slots=8, ttl=60)
+            self.index.set_online(2, 10, free_slots=8, ttl=60)
+        with mock.patch('couriers.online_index.time.time', return_value=1050.0):
+            self.assertTrue(self.index.touch(2, ttl=60))
+        with mock.patch('couriers.online_index.time.time', return_value=1070.0):
+            self.assertEqual(self.index.online_couriers(10), [(2, 8)])
+            self.assertEqual(self.index.online_couriers(10, min_free_slots=1), [(2, 8)])
+            # Истекшую запись heartbeat не продлевает, даже если ее еще не удалило чтение
+            self.index.set_online(3, 20, free_slots=8, ttl=-1)
+            self.assertFalse(self.index.touch(3, ttl=60))
+            self.assertFalse(self.index.touch(1, ttl=60))
+        self.index.remove(2)
+        self.assertFalse(self.index.touch(2, ttl=60))
+
+
+class CourierShiftTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.courier_user)
+
+    def test_shift_start_heartbeat_and_end(self):
+        response = self.api.post(reverse('couriers_api:shift_start'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'shift_status': 'online', 'free_slots': COURIER_CAPACITY,
+                                           'ttl': AVAILABILITY_TTL})
+        profile = CourierProfile.objects.get(pk=self.courier_profile.pk)
+        self.assertEqual(profile.shift_status, CourierProfile.SHIFT_ONLINE)
+        self.assertIsNotNone(profile.shift_started_at)
+        self.assertEqual(online_couriers(self.almaty.pk), [(self.courier_profile.pk, COURIER_CAPACITY)])
+
+        # Heartbeat курьера на связи не обращается к БД
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.post(reverse('couriers_api:shift_heartbeat')).status_code, 200)
+
+        self.assertEqual(self.api.post(reverse('couriers_api:shift_end')).status_code, 204)
+        self.assertEqual(online_couriers(self.almaty.pk), [])
+        self.assertEqual(CourierProfile.objects.get(pk=self.courier_profile.pk).shift_status,
+                         CourierProfile.SHIFT_OFFLINE)
+        self.assertEqual(self.api.post(reverse('couriers_api:shift_heartbeat')).status_code, 409)
+
+    def test_heartbeat_restores_expired_courier_on_shift(self):
+        go_online(self.courier_profile.pk)
+        get_online_index().clear()  # Запись истекла или индекс потерян при перезапуске
+        self.assertTrue(heartbeat(self.courier_profile.pk))
+        self.assertEqual(online_couriers(self.almaty.pk), [(self.courier_profile.pk, COURIER_CAPACITY)])
+
+        go_offline(self.courier_profile.pk)
+        self.assertFalse(heartbeat(self.courier_profile.pk))
+
+    def test_heartbeat_after_expiry_recounts_slots(self):
+        with mock.patch('couriers.online_index.time.time', return_value=1000.0):
+            go_online(self.courier_profile.pk)
+        # Пока курьер был вне связи, ему назначили заказ, а индекс этого не узнал
+        self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        self.assertTrue(heartbeat(self.courier_profile.pk))
+        self.assertEqual(online_couriers(self.almaty.pk), [(self.courier_profile.pk, COURIER_CAPACITY - 1)])
+
+        # Смена закрыта в БД в обход индекса: истекшая запись не возвращает курьера
+        with mock.patch('couriers.online_index.time.time', return_value=1000.0):
+            go_online(self.courier_profile.pk)
+        CourierProfile.objects.filter(pk=self.courier_profile.pk).update(shift_status=CourierProfile.SHIFT_OFFLINE)
+        self.assertFalse(heartbeat(self.courier_profile.pk))
+        self.assertEqual(online_couriers(self.almaty.pk), [])
+
+    def test_shift_requires_courier_with_city(self):
+        CourierProfile.objects.filter(pk=self.courier_profile.pk).update(city=None)
+        self.assertEqual(self.api.post(reverse('couriers_api:shift_start')).status_code, 400)
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.post(reverse('couriers_api:shift_start')).status_code, 403)
+
+    def test_free_slots_follow_orders_in_transit(self):
+        go_online(self.courier_profile.pk)
+        order = self.create_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            take_order(order.pk, self.courier_profile.pk)
+        self.assertEqual(online_couriers(self.almaty.pk), [(self.courier_profile.pk, COURIER_CAPACITY - 1)])
+        self.assertEqual(online_couriers(self.almaty.pk, min_free_slots=COURIER_CAPACITY), [])
+
+        order.status = self.status_delivered
+        order.save(update_fields=['status'])
+        refresh_courier_capacity([self.courier_profile.pk])
+        self.assertEqual(online_couriers(self.almaty.pk, min_free_slots=COURIER_CAPACITY),
+                         [(self.courier_profile.pk, COURIER_CAPACITY)])
+
+    def test_staff_lists_online_couriers_from_index(self):
+        second_courier = self.create_courier(
+            User.objects.create_user('+77010000003', 'pass', role=User.ROLE_COURIER), '000000000003')
+        go_online(self.courier_profile.pk)
+        go_online(second_courier.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            take_order(self.create_order().pk, second_courier.pk)
+
+        staff = User.objects.create_user('+77010000009', 'pass', is_staff=True)
+        self.api.force_authenticate(staff)
+        url = reverse('couriers_api:online_couriers')
+        self.api.get(url, {'city_id': self.almaty.pk})  # Роль пользователя
+        with self.assertNumQueries(0):
+            response = self.api.get(url, {'city_id': self.almaty.pk, 'min_free_slots': COURIER_CAPACITY})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'courier_id': self.courier_profile.pk, 'free_slots': COURIER_CAPACITY}])
+        self.assertEqual(len(self.api.get(url, {'city_id': self.almaty.pk}).json()), 2)
+        self.assertEqual(self.api.get(url).status_code, 400)
+
+        self.api.force_authenticate(self.courier_user)
+        self.assertEqual(self.api.get(url, {'city_id': self.almaty.pk}).status_code, 403)
+
+    def test_dispatch_ignores_couriers_off_shift(self):
+        order = self.create_order()
+        self.assertEqual(dispatch_open_orders(), [])
+        go_online(self.courier_profile.pk)
+        self.assertEqual([(order_id, courier_id) for order_id, courier_id, _ in dispatch_open_orders()],
+                         [(order.pk, self.courier_profile.pk)])
@@ -0,0 +1,14 @@
+from django.urls import path
+from .views import (
+    CourierLocationAPIView, OnlineCouriersAPIView, ShiftEndAPIView, ShiftHeartbeatAPIView, ShiftStartAPIView,
+)
+
+app_name = 'couriers_api'
+
+urlpatterns = [
+    path('locations/', CourierLocationAPIView.as_view(), name='courier_locations'),
+    path('shift/start/', ShiftStartAPIView.as_view(), name='shift_start'),
+    path('shift/end/', ShiftEndAPIView.as_view(), name='shift_end'),
+    path('shift/heartbeat/', ShiftHeartbeatAPIView.as_view(), name='shift_heartbeat'),
+    path('online/', OnlineCouriersAPIView.as_view(), name='online_couriers'),
+]
@@ -0,0 +1,92 @@
+from rest_framework import exceptions, generics, permissions, status
+from rest_framework.response import Response
+
+from users.actor import get_actor
+from .availability import AVAILABILITY_TTL, ShiftError, go_offline, go_online, heartbeat, online_couriers
+from .locations import ingest_locations
+from .serializers import LocationBatchSerializer, OnlineCourierSerializer, OnlineCouriersQuerySerializer
+
+
+def courier_actor(request):
+    actor = get_actor(request.user)
+    if not actor.is_courier:
+        raise exceptions.PermissionDenied("Действие доступно только курьерам.")
+    return actor
+
+
+class CourierLocationAPIView(generics.GenericAPIView):
+    """
+        Прием координат курьера пачкой: {"pings": [{"latitude", "longitude",
+        "recorded_at", "accuracy_m"}, ...]}.
+
+        Точки буферизуются и записываются в БД пачками (см. couriers/locations.py),
+        поэтому ответ 202 не ждет записи; последняя позиция сразу доступна в кэше.
+    """
+    serializer_class = LocationBatchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        actor = get_actor(request.user)
+        if not actor.is_courier:
+            raise exceptions.PermissionDenied("Координаты передают только курьеры.")
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accepted = ingest_locations(actor.courier_id, serializer.validated_data['pings'])
+        return Response({"accepted": accepted}, status=status.HTTP_202_ACCEPTED)
+
+
+class ShiftStartAPIView(generics.GenericAPIView):
+    """
+        Начало смены: курьер появляется в индексе доступных курьеров своего
+        города. Дальше приложение раз в несколько секунд вызывает heartbeat,
+        иначе курьер выпадет из индекса через ttl секунд.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        actor = courier_actor(request)
+        try:
+            free_slots = go_online(actor.courier_id)
+        except ShiftError as exc:
+            raise exceptions.ValidationError({"detail": str(exc)})
+        return Response({"shift_status": "online", "free_slots": free_slots, "ttl": AVAILABILITY_TTL})
+
+
+class ShiftEndAPIView(generics.GenericAPIView):
+    """Конец смены: курьер сразу убирается из индекса доступных курьеров."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        actor = courier_actor(request)
+        go_offline(actor.courier_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ShiftHeartbeatAPIView(generics.GenericAPIView):
+    """Продление присутствия на связи; 409, если смена не начата."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        actor = courier_actor(request)
+        if not heartbeat(actor.courier_id):
+            return Response({"detail": "Смена не начата."}, status=status.HTTP_409_CONFLICT)
+        return Response({"ttl": AVAILABILITY_TTL})
+
+
+class OnlineCouriersAPIView(generics.GenericAPIView):
+    """
+        Курьеры на связи в городе для сотрудников: ?city_id=&min_free_slots=&limit=.
+        Ответ строится по индексу доступности, профили курьеров не читаются.
+    """
+    serializer_class = OnlineCourierSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not get_actor(request.user).is_staff:
+            raise exceptions.PermissionDenied("Список курьеров на связи доступен только сотрудникам.")
+        query = OnlineCouriersQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        couriers = online_couriers(params['city_id'], params['min_free_slots'], params['limit'])
+        data = [{"courier_id": courier_id, "free_slots": free_slots} for courier_id, free_slots in couriers]
+        return Response(self.get_serializer(data, many=True).data)
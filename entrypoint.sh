@@ -11,6 +11,8 @@ echo "PostgreSQL started"
 # Выполняем миграции, собираем статику и запускаем Gunicorn
 python manage.py migrate
 python manage.py collectstatic --noinput --clear
+# Daphne обслуживает WebSocket-соединения чатов (/ws/), Gunicorn - HTTP API
+daphne -b 0.0.0.0 -p 8001 jibekjoly_backend.asgi:application &
 gunicorn jibekjoly_backend.wsgi:application --bind 0.0.0.0:8000
 
 exec "$@"
\ No newline at end of file
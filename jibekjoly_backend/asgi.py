@@ -2,6 +2,7 @@
 ASGI config for jibekjoly_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django, WebSocket connections go to the chat consumers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -11,6 +12,17 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jibekjoly_backend.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jibekjoly_backend.settings.production')
 
-application = get_asgi_application()
+# Django должен быть инициализирован до импорта consumers, которые используют модели
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from chat.routing import websocket_urlpatterns  # noqa: E402
+from users.middleware import TokenAuthMiddleware  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': TokenAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -30,12 +30,16 @@ INSTALLED_APPS = [
     # Сторонние приложения
     'rest_framework',
     'rest_framework.authtoken',
+    'channels',
 
     # Ваши приложения
     'users',
     'core',
     'orders',
     'chat',
+    'analytics',
+    'couriers',
+    'notifications',
     'drf_spectacular',
 ]
 
@@ -68,6 +72,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'jibekjoly_backend.wsgi.application'
+ASGI_APPLICATION = 'jibekjoly_backend.asgi.application'
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -99,6 +104,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') # Папка для сбор
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш: Redis (сервис redis из docker-compose), если задан REDIS_URL, иначе память процесса
+CACHES = {
+    'default': env.cache('REDIS_URL', default='locmemcache://'),
+}
+
+# Слой каналов для WebSocket-рассылки чатов: Redis в docker-compose, иначе память процесса
+if env('REDIS_URL', default=None):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [env('REDIS_URL')]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+
+# Индекс курьеров на связи (см. couriers/online_index.py): Redis, если задан REDIS_URL, иначе память процесса
+COURIER_AVAILABILITY_REDIS_URL = env('REDIS_URL', default=None)
+
+# Провайдер push-уведомлений (см. notifications/providers.py); по умолчанию локальная заглушка
+PUSH_PROVIDER = env('PUSH_PROVIDER', default='notifications.providers.FakePushProvider')
+
+# Геокодер адресов заказов (см. core/geocoding.py); по умолчанию офлайн-заглушка
+GEOCODER_BACKEND = env('GEOCODER_BACKEND', default='core.geocoding.OfflineGeocoder')
+
+# Тариф доставки (см. orders/pricing.py): цена = max(MIN_FARE, BASE_FARE + PER_KM * км) * коэффициент размера,
+# где км - расстояние между центрами городов по прямой, умноженное на ROAD_FACTOR
+ORDER_PRICING = {
+    'BASE_FARE': env('PRICING_BASE_FARE', default='1000'),
+    'PER_KM': env('PRICING_PER_KM', default='25'),
+    'MIN_FARE': env('PRICING_MIN_FARE', default='1000'),
+    'ROAD_FACTOR': env('PRICING_ROAD_FACTOR', default='1.25'),
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -108,7 +149,8 @@ AUTH_USER_MODEL = 'users.User'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication с кэшем токен -> пользователь (см. users/authentication.py)
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -16,6 +16,9 @@ urlpatterns = [
     path('api/v1/core/', include('core.urls', namespace='core_api')),
     path('api/v1/orders/', include('orders.urls', namespace='orders_api')),
     path('api/v1/chats/', include('chat.urls', namespace='chat_api')),
+    path('api/v1/couriers/', include('couriers.urls', namespace='couriers_api')),
+    path('api/v1/analytics/', include('analytics.urls', namespace='analytics_api')),
+    path('api/v1/notifications/', include('notifications.urls', namespace='notifications_api')),
 
     # --- ДОБАВЬТЕ ЭТИ ПУТИ ДЛЯ ДОКУМЕНТАЦИИ ---
     # Путь для скачивания файла схемы OpenAPI (schema.yml)
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import DeviceToken, NotificationEvent
+
+
+@admin.register(DeviceToken)
+class DeviceTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'platform', 'is_active', 'updated_at')
+    list_filter = ('platform', 'is_active')
+    search_fields = ('user__phone_number', 'token')
+    raw_id_fields = ('user',)
+
+
+@admin.register(NotificationEvent)
+class NotificationEventAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'order', 'status', 'attempts', 'next_attempt_at', 'created_at', 'processed_at')
+    list_filter = ('kind', 'status')
+    list_select_related = ('order',)
+    raw_id_fields = ('order', 'actor')
+    readonly_fields = ('kind', 'order', 'actor', 'payload', 'dedup_key', 'created_at')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False  # События пишутся только вместе с изменениями заказов и чатов
@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notifications.models import NotificationEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет обработанные события уведомлений старше --days дней порциями, '
+        'не блокируя таблицу одним большим DELETE. Ожидающие события не удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Сколько дней хранить события')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Событий в одном DELETE')
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('--days и --chunk-size должны быть положительными.')
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        stale = (NotificationEvent.objects.filter(created_at__lt=cutoff)
+                 .exclude(status=NotificationEvent.STATUS_PENDING).order_by('created_at'))
+        deleted = 0
+        while True:
+            ids = list(stale.values_list('pk', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            deleted += NotificationEvent.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Удалено событий: {deleted}'))
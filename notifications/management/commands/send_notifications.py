@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.outbox import NOTIFY_BATCH_SIZE, catch_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылает push-уведомления по накопившимся событиям outbox. Без --loop '
+        'обрабатывает очередь и завершается, с --loop работает как воркер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Запускать рассылку непрерывно')
+        parser.add_argument('--interval', type=float, default=1, help='Пауза между запусками, с')
+        parser.add_argument('--batch-size', type=int, default=NOTIFY_BATCH_SIZE,
+                            help='Сколько событий забирать за раз')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                # Воркер живет долго: соединение с БД обновляется так же, как между запросами
+                close_old_connections()
+                started = time.perf_counter()
+                stats = catch_up(options['batch_size'])
+                if stats['events'] or not options['loop']:
+                    self.stdout.write(
+                        f"Событий: {stats['events']}, отправлено: {stats['messages']}, "
+                        f"пропущено по лимиту: {stats['throttled']}, к повтору: {stats['retried']}, "
+                        f"не доставлено: {stats['failed']} за {time.perf_counter() - started:.3f} с"
+                    )
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено')
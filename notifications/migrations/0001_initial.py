@@ -0,0 +1,59 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0007_order_status_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=255, unique=True, verbose_name='Токен')),
+                ('platform', models.CharField(choices=[('android', 'Android'), ('ios', 'iOS'), ('web', 'Web')], max_length=10, verbose_name='Платформа')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_tokens', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Токен устройства',
+                'verbose_name_plural': 'Токены устройств',
+                'indexes': [models.Index(fields=['user', 'is_active'], name='device_token_user_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order_created', 'Новый заказ'), ('order_taken', 'Заказ взят курьером'), ('order_delivered', 'Заказ доставлен'), ('order_cancelled', 'Заказ отменен'), ('chat_message', 'Сообщение в чате')], max_length=20, verbose_name='Тип')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Данные')),
+                ('dedup_key', models.CharField(max_length=100, unique=True, verbose_name='Ключ дедупликации')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Отправлено'), ('failed', 'Не доставлено')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('retry_tokens', models.JSONField(blank=True, null=True, verbose_name='Токены для повтора')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Создано')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Инициатор')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Событие уведомлений',
+                'verbose_name_plural': 'События уведомлений',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='notification_queue_idx'), models.Index(fields=['created_at'], name='notification_time_idx')],
+            },
+        ),
+    ]
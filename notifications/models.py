@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from orders.models import Order
+
+
+class DeviceToken(models.Model):
+    """Токен push-уведомлений устройства пользователя; один токен - одно устройство."""
+    PLATFORM_ANDROID = 'android'
+    PLATFORM_IOS = 'ios'
+    PLATFORM_WEB = 'web'
+    PLATFORM_CHOICES = (
+        (PLATFORM_ANDROID, 'Android'),
+        (PLATFORM_IOS, 'iOS'),
+        (PLATFORM_WEB, 'Web'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='device_tokens', verbose_name='Пользователь'
+    )
+    token = models.CharField(max_length=255, unique=True, verbose_name='Токен')
+    platform = models.CharField(max_length=10, choices=PLATFORM_CHOICES, verbose_name='Платформа')
+    # Провайдер сообщил, что токен больше недействителен (приложение удалено)
+    is_active = models.BooleanField(default=True, verbose_name='Активен')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} ({self.platform}): {self.token[:16]}…"
+
+    class Meta:
+        verbose_name = 'Токен устройства'
+        verbose_name_plural = 'Токены устройств'
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='device_token_user_idx'),
+        ]
+
+
+class NotificationEvent(models.Model):
+    """
+    Событие для рассылки push-уведомлений (outbox).
+
+    Пишется в той же транзакции, что и смена статуса заказа или сообщение
+    чата, поэтому уведомление уходит тогда и только тогда, когда изменение
+    зафиксировано. Рассылает события воркер send_notifications
+    (см. notifications/outbox.py); dedup_key не дает записать одно событие дважды.
+    """
+    KIND_ORDER_CREATED = 'order_created'
+    KIND_ORDER_TAKEN = 'order_taken'
+    KIND_ORDER_DELIVERED = 'order_delivered'
+    KIND_ORDER_CANCELLED = 'order_cancelled'
+    KIND_CHAT_MESSAGE = 'chat_message'
+    KIND_CHOICES = (
+        (KIND_ORDER_CREATED, 'Новый заказ'),
+        (KIND_ORDER_TAKEN, 'Заказ взят курьером'),
+        (KIND_ORDER_DELIVERED, 'Заказ доставлен'),
+        (KIND_ORDER_CANCELLED, 'Заказ отменен'),
+        (KIND_CHAT_MESSAGE, 'Сообщение в чате'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Не доставлено'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Тип')
+    # У сообщений чата заказ определяет воркер по payload['chat_session_id']
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='Заказ'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        verbose_name='Инициатор'
+    )
+    payload = models.JSONField(default=dict, blank=True, verbose_name='Данные')
+    dedup_key = models.CharField(max_length=100, unique=True, verbose_name='Ключ дедупликации')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    # Токены, на которые не удалось отправить; null - получатели еще не определялись
+    retry_tokens = models.JSONField(null=True, blank=True, verbose_name='Токены для повтора')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Создано')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='Обработано')
+
+    def __str__(self):
+        return f"{self.kind} #{self.order_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'Событие уведомлений'
+        verbose_name_plural = 'События уведомлений'
+        indexes = [
+            # Очередь воркера: ожидающие события по времени следующей попытки
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_queue_idx'),
+            models.Index(fields=['created_at'], name='notification_time_idx'),
+        ]
@@ -0,0 +1,294 @@
+"""
+Outbox push-уведомлений: запись событий и их рассылка воркером.
+
+События пишутся одним INSERT в транзакции изменения (смена статуса заказа,
+сообщение чата), поэтому откат изменения откатывает и уведомление. Воркер
+send_notifications забирает пачку ожидающих событий, определяет получателей
+сразу для всей пачки (заказы и токены - по одному запросу, курьеры на
+смене - из индекса couriers/availability.py) и отправляет сообщения
+провайдеру пачками по max_batch_size.
+
+Гарантии:
+- одно событие записывается один раз: dedup_key уникален, вставка
+  с ON CONFLICT DO NOTHING;
+- при временной ошибке повторяется отправка только на неудавшиеся токены,
+  с экспоненциальной паузой, не больше NOTIFY_MAX_ATTEMPTS попыток;
+- пользователь получает не больше NOTIFY_RATE_LIMIT уведомлений за
+  NOTIFY_RATE_WINDOW секунд, остальные пропускаются: приложение догружает
+  актуальное состояние при открытии;
+- событие забирается на NOTIFY_LEASE: если воркер упал после отправки,
+  событие уйдет повторно, поэтому в данных сообщения есть event_id для
+  дедупликации на устройстве.
+"""
+import datetime
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from chat.models import ChatSession
+from couriers.availability import online_couriers
+from orders.models import Order, OrderStatus
+from .models import DeviceToken, NotificationEvent
+from .providers import PushError, PushMessage, get_push_provider
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_BATCH_SIZE = 200
+NOTIFY_LEASE = datetime.timedelta(seconds=60)
+NOTIFY_MAX_ATTEMPTS = 5
+NOTIFY_RETRY_BASE = 10  # секунд; пауза удваивается с каждой попыткой
+NOTIFY_RETRY_MAX = 60 * 30
+NOTIFY_RATE_LIMIT = 20
+NOTIFY_RATE_WINDOW = 60  # секунд
+CHAT_PREVIEW_LENGTH = 100
+
+# Статус, в который перешел заказ -> тип события
+ORDER_EVENT_KINDS = {
+    OrderStatus.CODE_PROCESSING: NotificationEvent.KIND_ORDER_CREATED,
+    OrderStatus.CODE_IN_TRANSIT: NotificationEvent.KIND_ORDER_TAKEN,
+    OrderStatus.CODE_DELIVERED: NotificationEvent.KIND_ORDER_DELIVERED,
+    OrderStatus.CODE_CANCELLED: NotificationEvent.KIND_ORDER_CANCELLED,
+}
+
+
+def enqueue_order_events(order_ids, to_status, actor_id=None):
+    """Записывает события о переходе заказов в статус to_status. Вызывается внутри транзакции смены статуса."""
+    kind = ORDER_EVENT_KINDS.get(to_status.code)
+    if kind is None:
+        return
+    NotificationEvent.objects.bulk_create([
+        NotificationEvent(kind=kind, order_id=order_id, actor_id=actor_id, dedup_key=f'{kind}:{order_id}')
+        for order_id in order_ids
+    ], ignore_conflicts=True)
+
+
+def enqueue_chat_message(message):
+    """Записывает событие о новом сообщении чата; вызывается в транзакции, которая его создает."""
+    kind = NotificationEvent.KIND_CHAT_MESSAGE
+    NotificationEvent.objects.bulk_create([NotificationEvent(
+        kind=kind, actor_id=message.sender_id, dedup_key=f'{kind}:{message.pk}',
+        payload={'chat_session_id': message.chat_session_id, 'message_id': message.pk,
+                 'text': message.text_content[:CHAT_PREVIEW_LENGTH]},
+    )], ignore_conflicts=True)
+
+
+def claim_events(batch_size=NOTIFY_BATCH_SIZE, now=None):
+    """
+    Забирает пачку ожидающих событий: переносит их next_attempt_at на
+    NOTIFY_LEASE вперед, чтобы параллельный воркер их не взял.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationEvent.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if events:
+            NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                next_attempt_at=now + NOTIFY_LEASE)
+    return events
+
+
+def rate_limit_key(user_id, window):
+    return f'notify_rate:{user_id}:{window}'
+
+
+class RateLimiter:
+    """
+    Счетчики уведомлений пользователей в текущем окне NOTIFY_RATE_WINDOW.
+
+    Счетчики читаются и записываются в кэш один раз на пачку. Параллельные
+    воркеры могут вместе немного превысить лимит: это допустимо, точного
+    учета не требуется.
+    """
+
+    def __init__(self, now, limit, window):
+        self.limit = limit
+        self.window_seconds = window
+        self.window = int(now.timestamp()) // window
+        self.counts = {}
+        self.changed = set()
+
+    def load(self, user_ids):
+        keys = {user_id: rate_limit_key(user_id, self.window) for user_id in user_ids}
+        cached = cache.get_many(keys.values())
+        self.counts = {user_id: cached.get(key, 0) for user_id, key in keys.items()}
+
+    def allow(self, user_id):
+        count = self.counts.get(user_id, 0)
+        if count >= self.limit:
+            return False
+        self.counts[user_id] = count + 1
+        self.changed.add(user_id)
+        return True
+
+    def save(self):
+        if self.changed:
+            cache.set_many({rate_limit_key(user_id, self.window): self.counts[user_id] for user_id in self.changed},
+                           self.window_seconds)
+
+
+def build_content(event, order):
+    """Заголовок и текст уведомления."""
+    uid = order['unique_order_id']
+    if event.kind == NotificationEvent.KIND_ORDER_CREATED:
+        return 'Новый заказ', f"{order['origin_city_name']} → {order['destination_city_name']}"
+    if event.kind == NotificationEvent.KIND_ORDER_TAKEN:
+        return 'Заказ в пути', f'Заказ {uid} взят в доставку'
+    if event.kind == NotificationEvent.KIND_ORDER_DELIVERED:
+        return 'Заказ доставлен', f'Заказ {uid} доставлен'
+    if event.kind == NotificationEvent.KIND_ORDER_CANCELLED:
+        return 'Заказ отменен', f'Заказ {uid} отменен'
+    return f'Сообщение по заказу {uid}', event.payload.get('text', '')
+
+
+def load_orders(events):
+    """Данные заказов пачки для получателей и текстов: {id заказа: dict}; чат-события получают order_id."""
+    session_ids = {event.payload['chat_session_id'] for event in events
+                   if event.kind == NotificationEvent.KIND_CHAT_MESSAGE}
+    if session_ids:
+        sessions = dict(ChatSession.objects.filter(pk__in=session_ids).values_list('pk', 'order_id'))
+        for event in events:
+            if event.kind == NotificationEvent.KIND_CHAT_MESSAGE:
+                event.order_id = sessions.get(event.payload['chat_session_id'])
+    rows = Order.objects.filter(pk__in={event.order_id for event in events if event.order_id}).values(
+        'pk', 'unique_order_id', 'client_id', 'courier_id', 'origin_city_id',
+        origin_city_name=F('origin_city__name'), destination_city_name=F('destination_city__name'),
+    )
+    return {row['pk']: row for row in rows}
+
+
+def resolve_recipients(event, order, city_couriers):
+    """Пользователи, которым адресовано событие (id профилей совпадают с id пользователей)."""
+    if event.kind == NotificationEvent.KIND_ORDER_CREATED:
+        city_id = order['origin_city_id']
+        if city_id not in city_couriers:
+            # Новый заказ видят курьеры города на смене со свободными местами
+            city_couriers[city_id] = [courier_id for courier_id, _ in online_couriers(city_id, min_free_slots=1)]
+        return city_couriers[city_id]
+    participants = {order['client_id'], order['courier_id']} - {None, event.actor_id}
+    return sorted(participants)
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=min(NOTIFY_RETRY_BASE * 2 ** (attempts - 1), NOTIFY_RETRY_MAX))
+
+
+def deliver_events(events, now=None):
+    """
+    Рассылает уведомления по пачке событий и сохраняет результат.
+    Возвращает счетчики: events, messages, throttled, retried, failed.
+    """
+    now = now or timezone.now()
+    stats = {'events': len(events), 'messages': 0, 'throttled': 0, 'retried': 0, 'failed': 0}
+    if not events:
+        return stats
+    orders = load_orders(events)
+
+    # Получатели новых событий с учетом лимита; повторы идут на сохраненные токены без лимита
+    limiter = RateLimiter(now, NOTIFY_RATE_LIMIT, NOTIFY_RATE_WINDOW)
+    city_couriers = {}
+    recipients = {}
+    for event in events:
+        order = orders.get(event.order_id)
+        if event.retry_tokens is None and order is not None:
+            recipients[event.pk] = resolve_recipients(event, order, city_couriers)
+    limiter.load({user_id for user_ids in recipients.values() for user_id in user_ids})
+    for event_id, user_ids in recipients.items():
+        allowed = [user_id for user_id in user_ids if limiter.allow(user_id)]
+        stats['throttled'] += len(user_ids) - len(allowed)
+        recipients[event_id] = allowed
+    limiter.save()
+
+    user_ids = {user_id for user_ids in recipients.values() for user_id in user_ids}
+    retry_tokens = {token for event in events for token in (event.retry_tokens or ())}
+    tokens_by_user = defaultdict(list)
+    platforms = {}
+    for user_id, token, platform in DeviceToken.objects.filter(
+            is_active=True, user_id__in=user_ids).values_list('user_id', 'token', 'platform'):
+        tokens_by_user[user_id].append(token)
+        platforms[token] = platform
+    if retry_tokens:
+        platforms.update(DeviceToken.objects.filter(is_active=True, token__in=retry_tokens)
+                         .values_list('token', 'platform'))
+
+    messages = []  # (событие, сообщение)
+    for event in events:
+        order = orders.get(event.order_id)
+        if order is None:
+            continue  # Заказ или чат удалены - уведомлять не о чем
+        if event.retry_tokens is None:
+            tokens = [token for user_id in recipients[event.pk] for token in tokens_by_user[user_id]]
+        else:
+            tokens = [token for token in event.retry_tokens if token in platforms]
+        title, body = build_content(event, order)
+        data = {'event_id': str(event.pk), 'kind': event.kind, 'order_id': str(order['pk']),
+                'unique_order_id': order['unique_order_id']}
+        if event.kind == NotificationEvent.KIND_CHAT_MESSAGE:
+            data['chat_session_id'] = str(event.payload['chat_session_id'])
+        for token in tokens:
+            messages.append((event, PushMessage(token, platforms[token], title, body, data)))
+
+    provider = get_push_provider()
+    failed_tokens = defaultdict(list)
+    errors = {}
+    invalid_tokens = set()
+    for start in range(0, len(messages), provider.max_batch_size):
+        chunk = messages[start:start + provider.max_batch_size]
+        try:
+            results = provider.send([message for _, message in chunk])
+        except PushError as exc:
+            logger.warning('Провайдер уведомлений недоступен: %s', exc)
+            results = None
+        for index, (event, message) in enumerate(chunk):
+            result = results[index] if results is not None else None
+            if result is not None and result.ok:
+                stats['messages'] += 1
+            elif result is not None and result.invalid_token:
+                invalid_tokens.add(message.token)
+            else:
+                failed_tokens[event.pk].append(message.token)
+                errors[event.pk] = result.error if result is not None else 'Провайдер недоступен'
+
+    for event in events:
+        if event.pk in failed_tokens:
+            event.attempts += 1
+            event.retry_tokens = failed_tokens[event.pk]
+            event.last_error = errors[event.pk]
+            if event.attempts >= NOTIFY_MAX_ATTEMPTS:
+                event.status = NotificationEvent.STATUS_FAILED
+                event.processed_at = now
+                stats['failed'] += 1
+            else:
+                event.next_attempt_at = now + retry_delay(event.attempts)
+                stats['retried'] += 1
+        else:
+            event.status = NotificationEvent.STATUS_SENT
+            event.retry_tokens = []
+            event.processed_at = now
+    NotificationEvent.objects.bulk_update(
+        events, ['order', 'status', 'attempts', 'next_attempt_at', 'retry_tokens', 'last_error', 'processed_at'])
+    if invalid_tokens:
+        DeviceToken.objects.filter(token__in=invalid_tokens).update(is_active=False, updated_at=now)
+    return stats
+
+
+def process_batch(batch_size=NOTIFY_BATCH_SIZE, now=None):
+    """Забирает и рассылает одну пачку событий. Возвращает счетчики deliver_events."""
+    return deliver_events(claim_events(batch_size, now), now)
+
+
+def catch_up(batch_size=NOTIFY_BATCH_SIZE, now=None):
+    """Рассылает все ожидающие события пачками. Возвращает суммарные счетчики."""
+    totals = defaultdict(int)
+    while True:
+        stats = process_batch(batch_size, now)
+        for key, value in stats.items():
+            totals[key] += value
+        if stats['events'] < batch_size:
+            return dict(totals)
@@ -0,0 +1,92 @@
+"""
+Провайдеры push-уведомлений.
+
+Провайдер получает пачку сообщений и возвращает результат по каждому
+токену: доставлено, токен недействителен (устройство больше не получает
+уведомления) или временная ошибка (отправку стоит повторить). Класс задает
+настройка PUSH_PROVIDER; по умолчанию - FakePushProvider, который ничего
+не отправляет и запоминает сообщения для разработки и тестов.
+"""
+import functools
+import logging
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class PushError(Exception):
+    """Провайдер недоступен: ни одно сообщение пачки не отправлено."""
+
+
+@dataclass(frozen=True)
+class PushMessage:
+    token: str
+    platform: str
+    title: str
+    body: str
+    data: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class PushResult:
+    token: str
+    ok: bool
+    # Токен больше не действителен: повторять бессмысленно, токен отключается
+    invalid_token: bool = False
+    error: str = ''
+
+
+class PushProvider:
+    """Базовый провайдер; подклассы реализуют send."""
+    # Сколько сообщений провайдер принимает одним запросом
+    max_batch_size = 500
+
+    def send(self, messages):
+        """Отправляет пачку сообщений; список PushResult в том же порядке. Бросает PushError."""
+        raise NotImplementedError
+
+
+class FakePushProvider(PushProvider):
+    """
+    Локальный провайдер: сообщения складываются в sent. Ответы для
+    отдельных токенов задаются в failures: token -> 'invalid' или текст
+    временной ошибки; unavailable=True имитирует недоступность сервиса.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.failures = {}
+        self.unavailable = False
+
+    def reset(self):
+        self.sent.clear()
+        self.failures.clear()
+        self.unavailable = False
+
+    def send(self, messages):
+        if self.unavailable:
+            raise PushError('Сервис уведомлений недоступен')
+        results = []
+        for message in messages:
+            failure = self.failures.get(message.token)
+            if failure is None:
+                self.sent.append(message)
+                logger.debug('push %s: %s', message.token, message.title)
+                results.append(PushResult(message.token, ok=True))
+            elif failure == 'invalid':
+                results.append(PushResult(message.token, ok=False, invalid_token=True, error='Токен недействителен'))
+            else:
+                results.append(PushResult(message.token, ok=False, error=failure))
+        return results
+
+
+@functools.lru_cache(maxsize=None)
+def _load_provider(path):
+    return import_string(path)()
+
+
+def get_push_provider():
+    return _load_provider(settings.PUSH_PROVIDER)
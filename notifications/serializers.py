@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from .models import DeviceToken
+
+
+class DeviceTokenSerializer(serializers.ModelSerializer):
+    # Уникальность токена проверяет не сериализатор: повторная регистрация переносит токен
+    token = serializers.CharField(max_length=255)
+
+    class Meta:
+        model = DeviceToken
+        fields = ('token', 'platform')
@@ -0,0 +1,181 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.models import ChatSession
+from couriers.availability import go_online
+from orders.services import take_order
+from orders.tests import OrderTestMixin
+from orders.transitions import record_status_events
+from users.models import User
+from .models import DeviceToken, NotificationEvent
+from .outbox import NOTIFY_MAX_ATTEMPTS, catch_up, enqueue_order_events, process_batch
+from .providers import get_push_provider
+
+
+class NotificationTestMixin(OrderTestMixin):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # Счетчики лимита уведомлений
+        self.provider = get_push_provider()
+        self.provider.reset()
+        self.addCleanup(self.provider.reset)
+        self.api = APIClient()
+        DeviceToken.objects.create(user=self.client_user, token='client-phone', platform=DeviceToken.PLATFORM_IOS)
+        DeviceToken.objects.create(user=self.courier_user, token='courier-phone',
+                                   platform=DeviceToken.PLATFORM_ANDROID)
+
+    def sent(self):
+        return [(message.token, message.data['kind']) for message in self.provider.sent]
+
+
+class OutboxTests(NotificationTestMixin, TestCase):
+
+    def test_order_lifecycle_notifies_participants(self):
+        go_online(self.courier_profile.pk)
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post(reverse('orders_api:order_list_create'), {
+            'origin_city_id': self.almaty.pk, 'destination_city_id': self.astana.pk,
+            'package_size_id': self.size.pk, 'pickup_address': 'ул. Абая 1', 'delivery_address': 'пр. Республики 2',
+            'pickup_date': '2025-01-01', 'pickup_time_slot': '10:00-12:00',
+            'recipient_name': 'Получатель', 'recipient_phone': '+77010000009',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        order_id = response.json()['id']
+        self.assertEqual(NotificationEvent.objects.get().kind, NotificationEvent.KIND_ORDER_CREATED)
+
+        # Новый заказ получают курьеры города на смене
+        self.assertEqual(catch_up()['messages'], 1)
+        self.assertEqual(self.sent(), [('courier-phone', NotificationEvent.KIND_ORDER_CREATED)])
+        self.assertEqual(self.provider.sent[0].body, 'Алматы → Астана')
+
+        # Взятие заказа видит клиент, но не сам курьер
+        self.provider.reset()
+        take_order(order_id, self.courier_profile.pk, actor_id=self.courier_user.pk)
+        catch_up()
+        self.assertEqual(self.sent(), [('client-phone', NotificationEvent.KIND_ORDER_TAKEN)])
+        self.assertFalse(NotificationEvent.objects.filter(status=NotificationEvent.STATUS_PENDING).exists())
+
+    def test_events_are_transactional_and_deduplicated(self):
+        order = self.create_order()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            record_status_events([order.pk], None, self.status_processing)
+            raise RuntimeError
+        self.assertFalse(NotificationEvent.objects.exists())
+
+        enqueue_order_events([order.pk], self.status_processing)
+        enqueue_order_events([order.pk], self.status_processing)
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+
+    def test_chat_message_notifies_other_participant(self):
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        chat_session = ChatSession.objects.create(order=order)
+        self.api.force_authenticate(self.courier_user)
+        self.api.post(reverse('chat_api:chat_message_list_create', args=[chat_session.pk]),
+                      {'text_content': 'Буду через 10 минут'}, format='json')
+
+        catch_up()
+        [message] = self.provider.sent
+        self.assertEqual((message.token, message.body), ('client-phone', 'Буду через 10 минут'))
+        self.assertEqual(message.data['chat_session_id'], str(chat_session.pk))
+        self.assertEqual(NotificationEvent.objects.get().order_id, order.pk)
+
+    def test_failed_tokens_are_retried_with_backoff(self):
+        DeviceToken.objects.create(user=self.client_user, token='client-tablet', platform=DeviceToken.PLATFORM_WEB)
+        DeviceToken.objects.create(user=self.client_user, token='client-old', platform=DeviceToken.PLATFORM_IOS)
+        self.provider.failures.update({'client-tablet': 'Таймаут', 'client-old': 'invalid'})
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        enqueue_order_events([order.pk], self.status_delivered)
+
+        now = timezone.now()
+        stats = process_batch(now=now)
+        # Доставку без инициатора (системную) получают и клиент, и курьер
+        self.assertEqual((stats['messages'], stats['retried']), (2, 1))
+        event = NotificationEvent.objects.get()
+        self.assertEqual((event.status, event.attempts, event.retry_tokens),
+                         (NotificationEvent.STATUS_PENDING, 1, ['client-tablet']))
+        self.assertFalse(DeviceToken.objects.get(token='client-old').is_active)
+        # До истечения паузы событие не берется повторно
+        self.assertEqual(process_batch(now=now)['events'], 0)
+
+        # Повтор уходит только на неудавшийся токен
+        self.provider.reset()
+        process_batch(now=now + datetime.timedelta(minutes=1))
+        self.assertEqual(self.sent(), [('client-tablet', NotificationEvent.KIND_ORDER_DELIVERED)])
+        self.assertEqual(NotificationEvent.objects.get().status, NotificationEvent.STATUS_SENT)
+
+    def test_event_fails_after_max_attempts(self):
+        self.provider.unavailable = True
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        enqueue_order_events([order.pk], self.status_delivered)
+        now = timezone.now()
+        with self.assertLogs('notifications.outbox', 'WARNING'):
+            for attempt in range(NOTIFY_MAX_ATTEMPTS):
+                process_batch(now=now + datetime.timedelta(days=attempt))
+        event = NotificationEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (NotificationEvent.STATUS_FAILED, NOTIFY_MAX_ATTEMPTS))
+        self.assertEqual(event.last_error, 'Провайдер недоступен')
+
+    def test_recipients_are_rate_limited(self):
+        go_online(self.courier_profile.pk)
+        enqueue_order_events([self.create_order().pk for _ in range(3)], self.status_processing)
+        with mock.patch('notifications.outbox.NOTIFY_RATE_LIMIT', 2):
+            stats = catch_up()
+        self.assertEqual((stats['messages'], stats['throttled']), (2, 1))
+        self.assertEqual(NotificationEvent.objects.filter(status=NotificationEvent.STATUS_SENT).count(), 3)
+
+    def test_batch_uses_constant_number_of_queries(self):
+        couriers = [self.courier_profile] + [
+            self.create_courier(User.objects.create_user(f'+7701000010{index}', 'pass', role=User.ROLE_COURIER),
+                                f'00000000010{index}')
+            for index in range(5)
+        ]
+        for courier in couriers:
+            go_online(courier.pk)
+            DeviceToken.objects.get_or_create(user_id=courier.pk, defaults={
+                'token': f'courier-{courier.pk}', 'platform': DeviceToken.PLATFORM_ANDROID})
+
+        def run(orders_count):
+            NotificationEvent.objects.all().delete()
+            cache.clear()
+            enqueue_order_events([self.create_order().pk for _ in range(orders_count)], self.status_processing)
+            with CaptureQueriesContext(connection) as ctx:
+                stats = process_batch(now=timezone.now())
+            self.assertEqual(stats['messages'], orders_count * len(couriers))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(run(2), run(10))
+
+
+class DeviceTokenAPITests(NotificationTestMixin, TestCase):
+
+    def test_register_transfer_and_delete_token(self):
+        url = reverse('notifications_api:device_tokens')
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post(url, {'token': 'new-phone', 'platform': 'android'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.api.post(url, {'token': 'new-phone', 'platform': 'bada'}, format='json').status_code,
+                         400)
+
+        # Тот же телефон после входа курьером
+        DeviceToken.objects.filter(token='new-phone').update(is_active=False)
+        self.api.force_authenticate(self.courier_user)
+        response = self.api.post(url, {'token': 'new-phone', 'platform': 'android'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        token = DeviceToken.objects.get(token='new-phone')
+        self.assertEqual((token.user_id, token.is_active), (self.courier_user.pk, True))
+
+        delete_url = reverse('notifications_api:device_token_delete', args=['new-phone'])
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.delete(delete_url).status_code, 404)
+        self.api.force_authenticate(self.courier_user)
+        self.assertEqual(self.api.delete(delete_url).status_code, 204)
+        self.assertFalse(DeviceToken.objects.filter(token='new-phone').exists())
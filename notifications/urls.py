@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import DeviceTokenAPIView, DeviceTokenDeleteAPIView
+
+app_name = 'notifications_api'
+
+urlpatterns = [
+    path('devices/', DeviceTokenAPIView.as_view(), name='device_tokens'),
+    path('devices/<str:token>/', DeviceTokenDeleteAPIView.as_view(), name='device_token_delete'),
+]
@@ -0,0 +1,36 @@
+from django.http import Http404
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+
+from .models import DeviceToken
+from .serializers import DeviceTokenSerializer
+
+
+class DeviceTokenAPIView(generics.GenericAPIView):
+    """
+        Регистрация токена push-уведомлений устройства: {"token", "platform"}.
+
+        Повторная регистрация того же токена (в том числе другим пользователем
+        после смены аккаунта на устройстве) переносит его и снова включает.
+    """
+    serializer_class = DeviceTokenSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        _, created = DeviceToken.objects.update_or_create(
+            token=data['token'], defaults={'user': request.user, 'platform': data['platform'], 'is_active': True})
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class DeviceTokenDeleteAPIView(generics.GenericAPIView):
+    """Отключение уведомлений на устройстве (выход из аккаунта)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def delete(self, request, token):
+        deleted, _ = DeviceToken.objects.filter(token=token, user=request.user).delete()
+        if not deleted:
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,14 +1,28 @@
 # orders/admin.py
 from django.contrib import admin
-from .models import OrderStatus, Order
+from .models import OrderStatus, Order, OrderStatusEvent
+from .statuses import status_registry
+from .transitions import record_status_event
 
 
 @admin.register(OrderStatus)
 class OrderStatusAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description', 'order_index')
+    list_display = ('name', 'code', 'description', 'order_index')
     ordering = ('order_index',)
 
 
+class OrderStatusEventInline(admin.TabularInline):
+    model = OrderStatusEvent
+    extra = 0
+    fields = ('created_at', 'from_status', 'to_status', 'actor', 'comment')
+    readonly_fields = fields
+    can_delete = False
+    ordering = ('created_at', 'id')
+
+    def has_add_permission(self, request, obj=None):
+        return False  # Журнал пополняется только при смене статуса
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
@@ -33,6 +47,10 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('origin_city', 'pickup_address', 'destination_city', 'delivery_address', 'package_size',
                        'comment')
         }),
+        ('Координаты', {
+            'fields': (('pickup_latitude', 'pickup_longitude'), ('delivery_latitude', 'delivery_longitude')),
+            'classes': ('collapse',)
+        }),
         ('Время', {
             'fields': ('pickup_date', 'pickup_time_slot', 'pickup_timestamp', 'delivery_timestamp')
         }),
@@ -46,4 +64,14 @@ class OrderAdmin(admin.ModelAdmin):
     )
 
     # Для удобства выбора client и courier, можно использовать raw_id_fields, если их много
-    # raw_id_fields = ('client', 'courier', 'status', 'package_size', 'origin_city', 'destination_city')
\ No newline at end of file
+    # raw_id_fields = ('client', 'courier', 'status', 'package_size', 'origin_city', 'destination_city')
+    inlines = [OrderStatusEventInline]
+
+    def save_model(self, request, obj, form, change):
+        # Смена статуса из админки тоже попадает в журнал (admin сохраняет объект в транзакции)
+        old_status_id = form.initial.get('status') if change else None
+        super().save_model(request, obj, form, change)
+        if not change or 'status' in form.changed_data:
+            old_status = status_registry.get_by_id(old_status_id) if old_status_id else None
+            record_status_event(obj.pk, old_status, obj.status, actor_id=request.user.pk,
+                                comment='Изменено в админ-панели' if change else '')
@@ -0,0 +1,163 @@
+"""
+Массовое создание заказов корпоративными клиентами (JSON-массив или CSV).
+
+Все строки сначала проверяются целиком: сериализатор не обращается к БД,
+города и размеры посылок загружаются двумя запросами на всю пачку, цена
+берется из матрицы тарифов в памяти. Если хотя бы одна строка с ошибкой,
+не создается ни один заказ, а в ответе перечислены ошибки по строкам.
+Затем адреса геокодируются пачками, а заказы и записи журнала статусов
+вставляются через bulk_create в одной транзакции.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.geocoding import geocode_many_or_none
+from core.models import PackageSize
+from .models import ORDER_ID_MAX_ATTEMPTS, Order, OrderStatus, generate_unique_order_id
+from .pricing import PricingError, priced_cities, resolve_order_price
+from .serializers import BulkOrderRowSerializer
+from .statuses import status_registry
+from .transitions import record_status_events
+
+BULK_MAX_ROWS = 5000
+BULK_CHUNK_SIZE = 500
+
+REFERENCE_FIELDS = (
+    ('origin_city_id', 'origin_city'),
+    ('destination_city_id', 'destination_city'),
+    ('package_size_id', 'package_size'),
+)
+
+
+class BulkOrderError(Exception):
+    """Строки пачки не прошли проверку; errors - список {'row': номер строки с 1, 'errors': {...}}."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def validate_rows(data):
+    """
+    Проверка формата строк без обращения к БД.
+    Возвращает validated_data по строкам (None для неверных) и ошибки по строкам ({} для верных).
+    """
+    if not isinstance(data, list):
+        raise serializers.ValidationError({'non_field_errors': ['Ожидается список заказов.']})
+    if not data:
+        raise serializers.ValidationError({'non_field_errors': ['Список заказов пуст.']})
+    if len(data) > BULK_MAX_ROWS:
+        raise serializers.ValidationError(
+            {'non_field_errors': [f'За один запрос можно создать не больше {BULK_MAX_ROWS} заказов.']})
+
+    serializer = BulkOrderRowSerializer()
+    rows = []
+    errors = []
+    for item in data:
+        try:
+            rows.append(serializer.run_validation(item))
+            errors.append({})
+        except serializers.ValidationError as exc:
+            rows.append(None)
+            errors.append(exc.detail)
+    return rows, errors
+
+
+def resolve_rows(rows, errors):
+    """
+    Подставляет в проверенные строки города и размеры посылок и считает цену
+    по тарифу; ошибки добавляются в errors. Связанные объекты загружаются
+    двумя запросами на всю пачку.
+    """
+    valid_rows = [row for row in rows if row is not None]
+    # Только справочники с тарифом, как в OrderSerializer
+    cities = priced_cities().in_bulk(
+        {row[key] for row in valid_rows for key in ('origin_city_id', 'destination_city_id')})
+    sizes = PackageSize.objects.filter(is_active=True).in_bulk({row['package_size_id'] for row in valid_rows})
+    lookups = {'origin_city_id': cities, 'destination_city_id': cities, 'package_size_id': sizes}
+    does_not_exist = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+
+    resolved = []
+    for row, row_errors in zip(rows, errors):
+        if row is None:
+            continue
+        data = {key: value for key, value in row.items() if key not in lookups}
+        for key, field in REFERENCE_FIELDS:
+            data[field] = lookups[key].get(row[key])
+            if data[field] is None:
+                row_errors[key] = [str(does_not_exist).format(pk_value=row[key])]
+        if not row_errors:
+            try:
+                data['price'] = resolve_order_price(
+                    row['origin_city_id'], row['destination_city_id'], row['package_size_id'], row.get('price'))
+            except PricingError as exc:
+                row_errors['price'] = [str(exc)]
+        resolved.append(data)
+    return resolved
+
+
+def geocode_rows(rows, chunk_size=BULK_CHUNK_SIZE):
+    """Геокодирует адреса без переданных координат пачками по chunk_size адресов."""
+    requests = []
+    targets = []
+    for data in rows:
+        for prefix, address_field, city_field in (('pickup', 'pickup_address', 'origin_city'),
+                                                  ('delivery', 'delivery_address', 'destination_city')):
+            if data.get(f'{prefix}_latitude') is None or data.get(f'{prefix}_longitude') is None:
+                requests.append((data[address_field], data[city_field]))
+                targets.append((data, prefix))
+
+    for start in range(0, len(requests), chunk_size):
+        points = geocode_many_or_none(requests[start:start + chunk_size])
+        for (data, prefix), point in zip(targets[start:start + chunk_size], points):
+            if point is not None:
+                data[f'{prefix}_latitude'], data[f'{prefix}_longitude'] = point
+
+
+def insert_orders(orders, initial_status, actor_id=None, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Вставляет заказы и события журнала в одной транзакции. Как и Order.save,
+    при конфликте unique_order_id повторяет вставку с новыми ID.
+    """
+    for attempt in range(ORDER_ID_MAX_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                Order.objects.bulk_create(orders, batch_size=chunk_size)
+                record_status_events([order.pk for order in orders], None, initial_status,
+                                     actor_id=actor_id, at=timezone.now())
+            return
+        except IntegrityError as exc:
+            if 'unique_order_id' not in str(exc) or attempt == ORDER_ID_MAX_ATTEMPTS - 1:
+                raise
+            for order in orders:
+                order.pk = None
+                order._state.adding = True
+                order.unique_order_id = generate_unique_order_id()
+
+
+def create_orders_bulk(client, data, actor_id=None, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Создает заказы клиента из данных массовой загрузки: все или ни одного.
+
+    client - ClientProfile (с загруженным user: из него берутся данные
+    отправителя); data - список словарей из JSON или CSV. Бросает
+    BulkOrderError с ошибками по строкам, ValidationError при неверном
+    формате пачки и OrderStatus.DoesNotExist, если не настроен начальный
+    статус. Возвращает созданные заказы в порядке строк.
+    """
+    initial_status = status_registry.get(OrderStatus.CODE_PROCESSING)
+    rows, errors = validate_rows(data)
+    rows = resolve_rows(rows, errors)
+    if any(errors):
+        raise BulkOrderError([
+            {'row': number, 'errors': row_errors} for number, row_errors in enumerate(errors, start=1) if row_errors
+        ])
+    geocode_rows(rows, chunk_size)
+
+    sender = {'sender_name_snapshot': client.full_name, 'sender_phone_snapshot': client.user.phone_number}
+    orders = [Order(client=client, status=initial_status, **sender, **row) for row in rows]
+    for order in orders:
+        order.pickup_geohash = order.get_pickup_geohash()
+    insert_orders(orders, initial_status, actor_id, chunk_size)
+    return orders
@@ -0,0 +1,173 @@
+"""
+Автоматическое распределение открытых заказов между свободными курьерами.
+
+Раунд диспетчеризации берет пачку заказов в статусе "Обработка" и свободных
+курьеров на смене (индекс couriers/availability.py), группирует их по городу (город отправки заказа = город курьера),
+для каждого города строит матрицу расстояний заказ x курьер векторно (numpy)
+и жадно назначает пары от ближайших к дальним: каждый курьер получает не
+больше одного заказа за раунд. Назначение выполняется через take_order,
+как при ручном взятии заказа, поэтому гонка с курьером, взявшим заказ сам,
+безопасна: такой заказ просто пропускается.
+
+При одинаковых входных данных результат детерминирован: заказы упорядочены
+по (created_at, id), курьеры по id, а равные расстояния разрешаются в этом порядке.
+"""
+import logging
+from collections import defaultdict
+
+import numpy as np
+from django.db.models.functions import Coalesce
+
+from core.geo import EARTH_RADIUS_KM
+from couriers.availability import COURIER_CAPACITY, online_couriers
+from couriers.locations import latest_locations
+from users.models import CourierProfile
+from .models import Order, OrderStatus
+from .services import OrderAlreadyTaken, take_order
+from .statuses import status_registry
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_BATCH_SIZE = 5000
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """Матрица расстояний (км) между точками (lat1, lon1) и (lat2, lon2): форма (len(lat1), len(lat2))."""
+    lat1, lon1 = np.radians(lat1)[:, None], np.radians(lon1)[:, None]
+    lat2, lon2 = np.radians(lat2)[None, :], np.radians(lon2)[None, :]
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def match_greedy(distances, max_distance_km=None):
+    """
+    Жадное паросочетание по матрице расстояний: сначала самые близкие пары.
+
+    Возвращает список (индекс строки, индекс столбца). Каждая строка и каждый
+    столбец используются не больше одного раза; пары дальше max_distance_km
+    не назначаются. При равных расстояниях выигрывает меньший индекс строки,
+    затем столбца.
+    """
+    rows, cols = distances.shape
+    limit = min(rows, cols)
+    if not limit:
+        return []
+
+    # До назначения пары (r, c) занято не больше limit - 1 строк и столбцов, поэтому
+    # пара всегда входит в limit ближайших кандидатов по большему измерению матрицы
+    # (с учетом равных расстояний). Сортируются только они, а не вся матрица.
+    axis = 0 if rows >= cols else 1
+    kth = np.partition(distances, limit - 1, axis=axis).take(limit - 1, axis=axis)
+    candidates = distances <= np.expand_dims(kth, axis)
+    if max_distance_km is not None:
+        candidates &= distances <= max_distance_km
+    cand_rows, cand_cols = np.nonzero(candidates)
+    cand_distances = distances[cand_rows, cand_cols]
+    order = np.lexsort((cand_cols, cand_rows, cand_distances))
+
+    row_used = np.zeros(rows, dtype=bool)
+    col_used = np.zeros(cols, dtype=bool)
+    pairs = []
+    for row, col in zip(cand_rows[order].tolist(), cand_cols[order].tolist()):
+        if row_used[row] or col_used[col]:
+            continue
+        row_used[row] = col_used[col] = True
+        pairs.append((row, col))
+        if len(pairs) == limit:
+            break
+    return pairs
+
+
+def load_open_orders(limit):
+    """Открытые заказы, старые первыми: (id, id города отправки, широта, долгота) точки забора."""
+    processing = status_registry.get(OrderStatus.CODE_PROCESSING)
+    rows = Order.objects.filter(courier__isnull=True, status=processing).order_by('created_at', 'pk').values_list(
+        'pk', 'origin_city_id',
+        Coalesce('pickup_latitude', 'origin_city__center_latitude'),
+        Coalesce('pickup_longitude', 'origin_city__center_longitude'),
+    )[:limit]
+    return [row for row in rows if row[2] is not None and row[3] is not None]
+
+
+def load_available_couriers(city_ids):
+    """
+    Свободные курьеры на смене в городах city_ids: (id, id города, широта, долгота).
+
+    Кандидаты берутся из индекса курьеров на связи (couriers/availability.py):
+    только курьеры без заказов в пути, без перебора всех профилей. Одним
+    запросом к БД проверяется, что они активны, по-прежнему в этом городе
+    и не заняты. Позиция - последняя переданная курьером точка, если она
+    свежая (couriers/locations.py), иначе центр его города.
+    """
+    candidates = {
+        courier_id: city_id
+        for city_id in set(city_ids)
+        for courier_id, _ in online_couriers(city_id, min_free_slots=COURIER_CAPACITY)
+    }
+    if not candidates:
+        return []
+    in_transit = status_registry.get(OrderStatus.CODE_IN_TRANSIT)
+    busy = Order.objects.filter(status=in_transit, courier_id__in=candidates).values('courier_id')
+    couriers = [
+        courier for courier in CourierProfile.objects.filter(
+            pk__in=candidates, user__is_active=True,
+            city__center_latitude__isnull=False, city__center_longitude__isnull=False,
+        ).exclude(pk__in=busy).order_by('pk').values_list(
+            'pk', 'city_id', 'city__center_latitude', 'city__center_longitude')
+        if candidates[courier[0]] == courier[1]
+    ]
+    positions = latest_locations(courier_id for courier_id, _, _, _ in couriers)
+    return [
+        (courier_id, city_id, *positions[courier_id][:2]) if courier_id in positions else
+        (courier_id, city_id, latitude, longitude)
+        for courier_id, city_id, latitude, longitude in couriers
+    ]
+
+
+def plan_assignments(orders, couriers, max_distance_km=None):
+    """
+    Считает назначения без обращения к БД.
+
+    orders и couriers - последовательности (id, id города, широта, долгота)
+    в порядке приоритета. Возвращает список (id заказа, id курьера, расстояние, км).
+    """
+    orders_by_city = defaultdict(list)
+    for order in orders:
+        orders_by_city[order[1]].append(order)
+    couriers_by_city = defaultdict(list)
+    for courier in couriers:
+        couriers_by_city[courier[1]].append(courier)
+
+    assignments = []
+    for city_id, city_orders in orders_by_city.items():
+        city_couriers = couriers_by_city.get(city_id)
+        if not city_couriers:
+            continue
+        order_points = np.array([(lat, lon) for _, _, lat, lon in city_orders], dtype=float)
+        courier_points = np.array([(lat, lon) for _, _, lat, lon in city_couriers], dtype=float)
+        distances = haversine_matrix(order_points[:, 0], order_points[:, 1],
+                                     courier_points[:, 0], courier_points[:, 1])
+        for row, col in match_greedy(distances, max_distance_km):
+            assignments.append((city_orders[row][0], city_couriers[col][0], float(distances[row, col])))
+    return assignments
+
+
+def dispatch_open_orders(batch_size=DISPATCH_BATCH_SIZE, max_distance_km=None):
+    """
+    Один раунд диспетчеризации. Возвращает список фактически выполненных
+    назначений (id заказа, id курьера, расстояние, км).
+    """
+    orders = load_open_orders(batch_size)
+    couriers = load_available_couriers(city_id for _, city_id, _, _ in orders)
+    assignments = plan_assignments(orders, couriers, max_distance_km)
+    applied = []
+    for order_id, courier_id, distance in assignments:
+        try:
+            take_order(order_id, courier_id)
+        except OrderAlreadyTaken:
+            # Заказ успели взять вручную или отменить между чтением и назначением
+            logger.info('Заказ %s уже недоступен, пропускаем', order_id)
+            continue
+        applied.append((order_id, courier_id, distance))
+    return applied
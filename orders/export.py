@@ -0,0 +1,134 @@
+"""
+Потоковая выгрузка заказов в CSV или JSONL для сотрудников и бухгалтерии.
+
+Заказы читаются одним запросом с JOIN справочников через iterator(chunk_size):
+на PostgreSQL это серверный курсор, поэтому память процесса не зависит от
+объема выгрузки - в ней одновременно находится не больше одной порции строк.
+Результат отдается генератором текстовых фрагментов, который используют
+и StreamingHttpResponse, и команда export_orders.
+"""
+import csv
+import datetime
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Order
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Колонка выгрузки -> поле или связь, которую БД отдает через JOIN
+EXPORT_COLUMNS = (
+    ('id', 'pk'),
+    ('unique_order_id', 'unique_order_id'),
+    ('created_at', 'created_at'),
+    ('status', 'status__code'),
+    ('status_name', 'status__name'),
+    ('origin_city', 'origin_city__name'),
+    ('destination_city', 'destination_city__name'),
+    ('package_size', 'package_size__name'),
+    ('price', 'price'),
+    ('sender_name', 'sender_name_snapshot'),
+    ('sender_phone', 'sender_phone_snapshot'),
+    ('recipient_name', 'recipient_name'),
+    ('recipient_phone', 'recipient_phone'),
+    ('pickup_address', 'pickup_address'),
+    ('delivery_address', 'delivery_address'),
+    ('pickup_date', 'pickup_date'),
+    ('pickup_time_slot', 'pickup_time_slot'),
+    ('courier_name', 'courier__full_name'),
+    ('pickup_timestamp', 'pickup_timestamp'),
+    ('delivery_timestamp', 'delivery_timestamp'),
+    ('cancellation_reason', 'cancellation_reason'),
+    ('comment', 'comment'),
+)
+EXPORT_HEADER = tuple(name for name, _ in EXPORT_COLUMNS)
+
+
+def local_datetime(value):
+    return timezone.localtime(value) if isinstance(value, datetime.datetime) else value
+
+
+# Ячейку, начинающуюся с этих символов, Excel и LibreOffice считают формулой
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Телефоны проверяются сериализатором как номера, формулой они быть не могут
+CSV_UNESCAPED_COLUMNS = ('sender_phone', 'recipient_phone')
+# Число со знаком, например -5 или +1.5, формулой не считается
+SIGNED_NUMBER_RE = re.compile(r'[+-]\d+(\.\d+)?')
+
+
+def csv_value(value, escape=True):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat()
+    if (escape and isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES)
+            and not SIGNED_NUMBER_RE.fullmatch(value)):
+        # Адреса, имена и комментарии вводят клиенты: апостроф делает ячейку текстом
+        return "'" + value
+    return value
+
+
+def export_queryset(date_from=None, date_to=None, city_id=None, status=None):
+    """
+    Заказы для выгрузки в порядке создания.
+
+    date_from / date_to - даты создания включительно (по местному времени),
+    city_id - город отправки или доставки, status - код статуса.
+    """
+    queryset = Order.objects.all()
+    # Границы - моменты времени, а не created_at__date: так БД использует индекс по created_at
+    if date_from is not None:
+        queryset = queryset.filter(
+            created_at__gte=timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min)))
+    if date_to is not None:
+        queryset = queryset.filter(created_at__lt=timezone.make_aware(
+            datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min)))
+    if city_id is not None:
+        queryset = queryset.filter(Q(origin_city_id=city_id) | Q(destination_city_id=city_id))
+    if status is not None:
+        queryset = queryset.filter(status__code=status)
+    return queryset.order_by('created_at', 'pk').values_list(*(field for _, field in EXPORT_COLUMNS))
+
+
+class Echo:
+    """Псевдофайл для csv.writer: writerow возвращает строку вместо записи в буфер."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    # BOM, чтобы Excel открывал кириллицу без выбора кодировки
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(EXPORT_HEADER)
+    escape = [name not in CSV_UNESCAPED_COLUMNS for name in EXPORT_HEADER]
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([csv_value(value, flag) for value, flag in zip(row, escape)]))
+        if len(chunk) == chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_jsonl(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    chunk = []
+    for row in rows:
+        chunk.append(encoder.encode(dict(zip(EXPORT_HEADER, map(local_datetime, row)))) + '\n')
+        if len(chunk) == chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_export(queryset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Фрагменты выгрузки в формате export_format ('csv' или 'jsonl'), по chunk_size заказов."""
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if export_format == 'csv':
+        return iter_csv(rows, chunk_size)
+    return iter_jsonl(rows, chunk_size)
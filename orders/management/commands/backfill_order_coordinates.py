@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.geocoding import GeocodingError, get_geocoder
+from orders.models import Order
+
+COORDINATE_FIELDS = ('pickup_latitude', 'pickup_longitude', 'delivery_latitude', 'delivery_longitude')
+
+
+class Command(BaseCommand):
+    help = (
+        'Геокодирует адреса существующих заказов без координат. Заказы читаются '
+        'порциями по возрастанию id (keyset), поэтому память не зависит от '
+        'размера таблицы, а прерванный запуск можно продолжить с --after-id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Количество заказов в одной порции')
+        parser.add_argument('--after-id', type=int, default=0, help='Начать с заказов, id которых больше')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size должен быть положительным.')
+        geocoder = get_geocoder()
+        missing = (Q(pickup_latitude__isnull=True) | Q(pickup_longitude__isnull=True)
+                   | Q(delivery_latitude__isnull=True) | Q(delivery_longitude__isnull=True))
+        queryset = (Order.objects.filter(missing)
+                    .select_related('origin_city', 'destination_city')
+                    .only('pk', 'pickup_address', 'delivery_address', 'pickup_geohash',
+                          'origin_city', 'destination_city', *COORDINATE_FIELDS)
+                    .order_by('pk'))
+
+        last_id = options['after_id']
+        processed = updated = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            try:
+                changed = self.geocode_chunk(geocoder, chunk)
+            except GeocodingError as exc:
+                raise CommandError(
+                    f'Геокодер недоступен: {exc}. Обработано заказов: {processed}; '
+                    f'продолжить можно с --after-id {last_id}'
+                )
+            if changed:
+                Order.objects.bulk_update(changed, [*COORDINATE_FIELDS, 'pickup_geohash'])
+            processed += len(chunk)
+            updated += len(changed)
+            last_id = chunk[-1].pk
+            self.stdout.write(f'Обработано {processed} заказов (id <= {last_id}), обновлено {updated}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: обработано {processed}, обновлено {updated}'))
+
+    def geocode_chunk(self, geocoder, chunk):
+        requests = []
+        targets = []
+        for order in chunk:
+            if order.pickup_latitude is None or order.pickup_longitude is None:
+                requests.append((order.pickup_address, order.origin_city))
+                targets.append((order, 'pickup'))
+            if order.delivery_latitude is None or order.delivery_longitude is None:
+                requests.append((order.delivery_address, order.destination_city))
+                targets.append((order, 'delivery'))
+
+        changed = {}
+        for (order, prefix), point in zip(targets, geocoder.geocode_many(requests)):
+            if point is None:
+                continue
+            setattr(order, f'{prefix}_latitude', point[0])
+            setattr(order, f'{prefix}_longitude', point[1])
+            if prefix == 'pickup':
+                order.pickup_geohash = order.get_pickup_geohash()
+            changed[order.pk] = order
+        return list(changed.values())
@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from orders.dispatch import plan_assignments
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет расчет назначений диспетчера (матрицы расстояний и жадное '
+        'паросочетание) на синтетических данных без обращения к БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000, help='Количество открытых заказов')
+        parser.add_argument('--couriers', type=int, default=1000, help='Количество свободных курьеров')
+        parser.add_argument('--cities', type=int, default=1, help='Между сколькими городами распределить данные')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора случайных чисел')
+        parser.add_argument('--repeat', type=int, default=3, help='Количество прогонов')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        # Города по Казахстану, точки в пределах ~15 км от центра
+        centers = np.column_stack([rng.uniform(42, 53, options['cities']), rng.uniform(50, 85, options['cities'])])
+        orders = self.generate_points(rng, centers, options['orders'])
+        couriers = self.generate_points(rng, centers, options['couriers'])
+
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            assignments = plan_assignments(orders, couriers)
+            timings.append(time.perf_counter() - started)
+
+        distances = [distance for _, _, distance in assignments]
+        self.stdout.write(
+            f'{options["orders"]} заказов x {options["couriers"]} курьеров, городов: {options["cities"]}\n'
+            f'назначено: {len(assignments)}, среднее расстояние: {np.mean(distances) if distances else 0:.2f} км\n'
+            f'время расчета: лучшее {min(timings):.3f} с, среднее {np.mean(timings):.3f} с'
+        )
+
+    def generate_points(self, rng, centers, count):
+        city_ids = rng.integers(0, len(centers), count)
+        points = centers[city_ids] + rng.normal(0, 0.08, (count, 2))
+        return [(index, int(city_id), lat, lon)
+                for index, (city_id, (lat, lon)) in enumerate(zip(city_ids, points.tolist()))]
@@ -0,0 +1,93 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import City, PackageSize
+from orders.bulk import create_orders_bulk
+from orders.models import Order, OrderStatus, generate_unique_order_id
+from orders.pricing import tariff_matrix
+from orders.statuses import status_registry
+from users.models import User, ClientProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость создания заказов: старая схема с проверкой '
+        'уникальности ID через SELECT, текущая без предварительного запроса '
+        'и массовая загрузка (orders/bulk.py, вместе с записями журнала статусов). '
+        'Все созданные данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Количество заказов в каждом прогоне')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        with transaction.atomic():
+            fixtures = self.create_fixtures()
+            for mode in ('legacy', 'current', 'bulk'):
+                elapsed, queries = self.run(mode, count, fixtures)
+                self.stdout.write(
+                    f'{mode:>8}: {count} заказов за {elapsed:.3f} с '
+                    f'({count / elapsed:.0f} заказов/с, {queries / count:.2f} запросов на заказ)'
+                )
+            transaction.set_rollback(True)
+        # Реестр и матрица тарифов могли запомнить данные из откаченной транзакции
+        status_registry.invalidate()
+        tariff_matrix.invalidate()
+
+    def create_fixtures(self):
+        # Без координат у города нет тарифа, и массовая загрузка отклонит заказы
+        city = City.objects.create(name='Benchmark City', center_latitude='43.238949', center_longitude='76.889709')
+        package_size = PackageSize.objects.create(name='Benchmark size')
+        user = User.objects.create_user('+70000000000', role=User.ROLE_CLIENT)
+        return {
+            'client': ClientProfile.objects.create(
+                user=user, full_name='Benchmark', iin='000000000000', city=city,
+                date_of_birth=datetime.date(1990, 1, 1),
+            ),
+            'status': OrderStatus.objects.get_or_create(
+                code=OrderStatus.CODE_PROCESSING, defaults={'name': 'Benchmark status'})[0],
+            'package_size': package_size,
+            'origin_city': city,
+            'destination_city': city,
+            'pickup_address': '-',
+            'delivery_address': '-',
+            'pickup_date': datetime.date.today(),
+            'pickup_time_slot': '10:00-12:00',
+            'recipient_name': '-',
+            'recipient_phone': '-',
+            'price': tariff_matrix.quote(city.pk, city.pk, package_size.pk),
+        }
+
+    def run(self, mode, count, fixtures):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            if mode == 'bulk':
+                create_orders_bulk(fixtures['client'], [self.bulk_row(fixtures)] * count)
+            else:
+                for _ in range(count):
+                    if mode == 'legacy':
+                        # Поведение прежнего generate_unique_order_id: SELECT перед каждой вставкой
+                        while True:
+                            order_id = generate_unique_order_id()
+                            if not Order.objects.filter(unique_order_id=order_id).exists():
+                                break
+                        Order.objects.create(unique_order_id=order_id, **fixtures)
+                    else:
+                        Order.objects.create(**fixtures)
+            elapsed = time.perf_counter() - started
+        return elapsed, len(ctx.captured_queries)
+
+    def bulk_row(self, fixtures):
+        """Строка массовой загрузки в том виде, в каком она приходит в JSON."""
+        return {
+            'origin_city_id': fixtures['origin_city'].pk,
+            'destination_city_id': fixtures['destination_city'].pk,
+            'package_size_id': fixtures['package_size'].pk,
+            **{field: str(fixtures[field]) for field in (
+                'pickup_address', 'delivery_address', 'pickup_date', 'pickup_time_slot',
+                'recipient_name', 'recipient_phone')},
+        }
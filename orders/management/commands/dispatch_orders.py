@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.dispatch import DISPATCH_BATCH_SIZE, dispatch_open_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Распределяет открытые заказы между свободными курьерами их города. '
+        'Без --loop выполняет один раунд, с --loop работает как воркер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Запускать раунды непрерывно')
+        parser.add_argument('--interval', type=float, default=10, help='Пауза между раундами, с')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE,
+                            help='Сколько самых старых открытых заказов рассматривать за раунд')
+        parser.add_argument('--max-distance-km', type=float, default=None,
+                            help='Не назначать курьеров дальше этого расстояния от точки забора')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.run_round(options)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановлено')
+
+    def run_round(self, options):
+        # Воркер живет долго: соединение с БД обновляется так же, как между запросами
+        close_old_connections()
+        started = time.perf_counter()
+        applied = dispatch_open_orders(options['batch_size'], options['max_distance_km'])
+        elapsed = time.perf_counter() - started
+        if options['verbosity'] >= 2:
+            for order_id, courier_id, distance in applied:
+                self.stdout.write(f'Заказ {order_id} -> курьер {courier_id} ({distance:.1f} км)')
+        self.stdout.write(f'Назначено заказов: {len(applied)} за {elapsed:.3f} с')
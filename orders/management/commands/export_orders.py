@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_queryset, iter_export
+from orders.serializers import OrderExportFilterSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает заказы в CSV или JSONL (в файл или stdout) с фильтрами как у '
+        '/orders/export/. Заказы читаются порциями, память не зависит от объема выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file-format', choices=EXPORT_FORMATS, default='csv', help='Формат выгрузки')
+        parser.add_argument('--output', help='Путь к файлу (по умолчанию stdout)')
+        parser.add_argument('--date-from', help='Дата создания с (ГГГГ-ММ-ДД, включительно)')
+        parser.add_argument('--date-to', help='Дата создания по (ГГГГ-ММ-ДД, включительно)')
+        parser.add_argument('--city-id', type=int, help='Город отправки или доставки')
+        parser.add_argument('--status', help='Код статуса')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Заказов в одной порции')
+
+    def handle(self, *args, **options):
+        params = {name: options[name] for name in ('file_format', 'date_from', 'date_to', 'city_id', 'status')
+                  if options[name] is not None}
+        serializer = OrderExportFilterSerializer(data=params)
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        filters = dict(serializer.validated_data)
+        export_format = filters.pop('file_format')
+
+        chunks = iter_export(export_queryset(**filters), export_format, options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
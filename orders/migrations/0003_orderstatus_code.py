@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+# Коды проставляются существующим статусам по их названиям
+STATUS_CODES_BY_NAME = {
+    'Обработка': 'processing',
+    'В пути': 'in_transit',
+    'Доставлен': 'delivered',
+}
+
+
+def fill_status_codes(apps, schema_editor):
+    OrderStatus = apps.get_model('orders', 'OrderStatus')
+    for name, code in STATUS_CODES_BY_NAME.items():
+        OrderStatus.objects.filter(name=name).update(code=code)
+    cancel_status = OrderStatus.objects.filter(name__contains='Отменен').order_by('id').first()
+    if cancel_status is not None:
+        cancel_status.code = 'cancelled'
+        cancel_status.save(update_fields=['code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderstatus',
+            name='code',
+            field=models.SlugField(blank=True, help_text='Используется логикой приложения: processing, in_transit, delivered, cancelled', null=True, unique=True, verbose_name='Код статуса'),
+        ),
+        migrations.RunPython(fill_status_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+from core.geo import geohash_encode
+
+
+def fill_pickup_geohash(apps, schema_editor):
+    # Один UPDATE на город: geohash пока вычисляется по центру города отправки
+    City = apps.get_model('core', 'City')
+    Order = apps.get_model('orders', 'Order')
+    cities = City.objects.filter(center_latitude__isnull=False, center_longitude__isnull=False)
+    for city in cities:
+        Order.objects.filter(origin_city=city).update(
+            pickup_geohash=geohash_encode(city.center_latitude, city.center_longitude))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('orders', '0004_order_list_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='pickup_geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Geohash точки забора'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('courier__isnull', True)), fields=['status', 'pickup_geohash'], name='order_available_geo_idx'),
+        ),
+        migrations.RunPython(fill_pickup_geohash, migrations.RunPython.noop),
+    ]
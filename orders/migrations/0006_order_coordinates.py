@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_pickup_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivery_latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Широта доставки'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Долгота доставки'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Широта забора'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pickup_longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='Долгота забора'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_current_statuses(apps, schema_editor):
+    # Для существующих заказов журнал начинается с их текущего статуса
+    Order = apps.get_model('orders', 'Order')
+    OrderStatusEvent = apps.get_model('orders', 'OrderStatusEvent')
+    last_id = 0
+    while True:
+        chunk = list(Order.objects.filter(pk__gt=last_id).order_by('pk')
+                     .values_list('pk', 'status_id', 'updated_at')[:1000])
+        if not chunk:
+            break
+        OrderStatusEvent.objects.bulk_create([
+            OrderStatusEvent(order_id=pk, to_status_id=status_id, created_at=updated_at,
+                             comment='Статус на момент появления журнала')
+            for pk, status_id, updated_at in chunk
+        ])
+        last_id = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_coordinates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment', models.TextField(blank=True, default='', verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Время')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил')),
+                ('from_status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='orders.orderstatus', verbose_name='Предыдущий статус')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='orders.order', verbose_name='Заказ')),
+                ('to_status', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='orders.orderstatus', verbose_name='Новый статус')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса заказа',
+                'verbose_name_plural': 'История статусов заказов',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['order', '-created_at', '-id'], name='order_status_event_order_idx'), models.Index(fields=['created_at'], name='order_status_event_time_idx'), models.Index(fields=['to_status', 'created_at'], name='order_status_event_status_idx')],
+            },
+        ),
+        migrations.RunPython(seed_current_statuses, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,25 @@
-from django.db import models
+from contextlib import nullcontext
+
+from django.db import IntegrityError, models, router, transaction
 from django.utils.crypto import get_random_string
 from django.conf import settings # Чтобы ссылаться на AUTH_USER_MODEL
+from django.utils import timezone
 from users.models import ClientProfile, CourierProfile # Прямой импорт профилей
+from core.geo import geohash_encode
 from core.models import City, PackageSize
 
 class OrderStatus(models.Model):
+    # Стабильные коды статусов, на которые опирается логика (названия могут меняться в админке)
+    CODE_PROCESSING = 'processing'
+    CODE_IN_TRANSIT = 'in_transit'
+    CODE_DELIVERED = 'delivered'
+    CODE_CANCELLED = 'cancelled'
+
     name = models.CharField(max_length=50, unique=True, verbose_name='Название статуса')
+    code = models.SlugField(
+        max_length=50, unique=True, null=True, blank=True, verbose_name='Код статуса',
+        help_text='Используется логикой приложения: processing, in_transit, delivered, cancelled'
+    )
     description = models.TextField(blank=True, null=True, verbose_name='Описание')
     # Порядок для отображения или логики смены статусов, если потребуется
     order_index = models.PositiveIntegerField(default=0, verbose_name='Порядок сортировки')
@@ -18,15 +32,32 @@ class OrderStatus(models.Model):
         verbose_name_plural = 'Статусы заказов'
         ordering = ['order_index', 'name']
 
+ORDER_ID_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+ORDER_ID_LENGTH = 12
+ORDER_ID_MAX_ATTEMPTS = 5
+
+
 def generate_unique_order_id():
-    """Генерирует уникальный ID для заказа (12 символов, буквы и цифры)"""
-    # Проверяем уникальность, хотя вероятность коллизии при 12 символах крайне мала
-    # для get_random_string(12, allowed_chars='ABCDEFGHJKLMNPQRSTUVWXYZ23456789')
-    # (убрали I, O, 0, 1 для читаемости, если нужно)
-    while True:
-        order_id = get_random_string(12, allowed_chars='ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
-        if not Order.objects.filter(unique_order_id=order_id).exists():
-            return order_id
+    """
+    Генерирует ID заказа (12 символов, буквы и цифры) без обращения к БД.
+
+    36^12 ≈ 4.7·10^18 вариантов, поэтому коллизия практически невозможна;
+    уникальность гарантирует unique-индекс, а редкий конфликт обрабатывает
+    Order.save повторной вставкой с новым ID.
+    """
+    return get_random_string(ORDER_ID_LENGTH, allowed_chars=ORDER_ID_ALPHABET)
+
+
+class OrderQuerySet(models.QuerySet):
+    # Все связи, которые отдает OrderSerializer, загружаются одним JOIN-запросом
+    SERIALIZER_RELATED_FIELDS = (
+        'client', 'courier', 'status', 'package_size', 'origin_city', 'destination_city',
+    )
+
+    def with_related(self):
+        """Подгружает связанные объекты для сериализации без N+1 запросов."""
+        return self.select_related(*self.SERIALIZER_RELATED_FIELDS)
+
 
 class Order(models.Model):
     # Связи
@@ -70,6 +101,20 @@ class Order(models.Model):
     pickup_address = models.CharField(max_length=255, verbose_name='Адрес забора')
     delivery_address = models.CharField(max_length=255, verbose_name='Адрес доставки')
 
+    # Координаты адресов (геокодируются при создании, см. core.geocoding)
+    pickup_latitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True, verbose_name='Широта забора'
+    )
+    pickup_longitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True, verbose_name='Долгота забора'
+    )
+    delivery_latitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True, verbose_name='Широта доставки'
+    )
+    delivery_longitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True, verbose_name='Долгота доставки'
+    )
+
     # Время
     pickup_date = models.DateField(verbose_name='Желаемая дата забора')
     pickup_time_slot = models.CharField(max_length=100, verbose_name='Желаемый временной промежуток забора') # Например, "10:00-12:00"
@@ -95,23 +140,142 @@ class Order(models.Model):
     delivery_timestamp = models.DateTimeField(null=True, blank=True, verbose_name='Время фактической доставки заказа')
     cancellation_reason = models.TextField(blank=True, null=True, verbose_name='Причина отмены')
 
+    # Ячейка geohash точки забора для поиска заказов рядом с курьером (см. core.geo)
+    pickup_geohash = models.CharField(
+        max_length=12, blank=True, default='', editable=False, verbose_name='Geohash точки забора'
+    )
+
 
     # Временные метки создания/обновления
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлен')
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Заказ {self.unique_order_id} от {self.client.full_name}"
 
+    def get_pickup_point(self):
+        """Координаты забора; если адрес не геокодирован, используется центр города отправки."""
+        if self.pickup_latitude is not None and self.pickup_longitude is not None:
+            return self.pickup_latitude, self.pickup_longitude
+        city = self.origin_city
+        if city.center_latitude is None or city.center_longitude is None:
+            return None
+        return city.center_latitude, city.center_longitude
+
+    def get_pickup_geohash(self):
+        point = self.get_pickup_point()
+        return geohash_encode(*point) if point else ''
+
     def save(self, *args, **kwargs):
         if not self.pk: # Если это новый объект (еще не сохранен в БД)
             # Заполняем данные отправителя из профиля клиента
             self.sender_name_snapshot = self.client.full_name
             self.sender_phone_snapshot = self.client.user.phone_number
-        super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is None:
+            # Координаты забора могли измениться вместе с остальными полями
+            self.pickup_geohash = self.get_pickup_geohash()
+
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
 
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        # Внутри транзакции вызывающего кода каждая попытка идет в своей точке сохранения:
+        # ошибка INSERT откатывает только ее. Вне транзакции INSERT и так выполняется отдельно
+        in_transaction = transaction.get_connection(using).in_atomic_block
+        for attempt in range(ORDER_ID_MAX_ATTEMPTS):
+            try:
+                with transaction.atomic(using=using) if in_transaction else nullcontext():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError as exc:
+                if 'unique_order_id' not in str(exc) or attempt == ORDER_ID_MAX_ATTEMPTS - 1:
+                    raise
+                self.unique_order_id = generate_unique_order_id()
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        # Индексы под ключ пагинации (created_at, id) в основных списках заказов
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['client', '-created_at', '-id'], name='order_client_created_idx'),
+            models.Index(fields=['courier', '-created_at', '-id'], name='order_courier_created_idx'),
+            # Лента доступных заказов: частичный индекс только по неназначенным заказам
+            models.Index(
+                fields=['status', '-created_at', '-id'],
+                condition=models.Q(courier__isnull=True),
+                name='order_available_idx',
+            ),
+            # Лента доступных заказов рядом с курьером: поиск по набору ячеек geohash
+            models.Index(
+                fields=['status', 'pickup_geohash'],
+                condition=models.Q(courier__isnull=True),
+                name='order_available_geo_idx',
+            ),
+        ]
+
+
+class OrderStatusEventQuerySet(models.QuerySet):
+
+    def between(self, start, end):
+        """События за период [start, end) - индекс order_status_event_time_idx."""
+        return self.filter(created_at__gte=start, created_at__lt=end)
+
+    def latest_per_order(self):
+        """
+        Последнее событие каждого заказа: для каждой строки коррелированный
+        подзапрос берет верхнюю запись индекса (order, -created_at, -id).
+        """
+        latest = OrderStatusEvent.objects.filter(order=models.OuterRef('order')).order_by('-created_at', '-id')
+        return self.filter(pk=models.Subquery(latest.values('pk')[:1]))
+
+
+class OrderStatusEvent(models.Model):
+    """
+    Журнал смен статусов заказа: только добавление, записи не изменяются.
+
+    Пишется в той же транзакции, что и смена статуса (см. orders/transitions.py),
+    поэтому история и текущий статус заказа всегда согласованы.
+    """
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name='status_events', verbose_name='Заказ'
+    )
+    from_status = models.ForeignKey(
+        OrderStatus, on_delete=models.PROTECT, null=True, blank=True, related_name='+',
+        verbose_name='Предыдущий статус'
+    )
+    to_status = models.ForeignKey(
+        OrderStatus, on_delete=models.PROTECT, related_name='+', verbose_name='Новый статус'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        verbose_name='Кто изменил'
+    )
+    comment = models.TextField(blank=True, default='', verbose_name='Комментарий')
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Время')
+
+    objects = OrderStatusEventQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.order_id}: {self.from_status_id} -> {self.to_status_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Записи журнала статусов не изменяются.')
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = 'Смена статуса заказа'
+        verbose_name_plural = 'История статусов заказов'
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Последний статус и история конкретного заказа
+            models.Index(fields=['order', '-created_at', '-id'], name='order_status_event_order_idx'),
+            # Выборки за период, в том числе по конкретному статусу
+            models.Index(fields=['created_at'], name='order_status_event_time_idx'),
+            models.Index(fields=['to_status', 'created_at'], name='order_status_event_status_idx'),
+        ]
@@ -0,0 +1,114 @@
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from core.geo import haversine_km
+from core.models import City, PackageSize
+
+PRICE_QUANT = Decimal('1')  # Цены в целых тенге
+
+
+class PricingError(Exception):
+    """Цену заказа нельзя рассчитать или она не совпадает с тарифом."""
+
+
+def priced_cities():
+    """
+    Города, в которые и из которых принимаются заказы: активные и с координатами
+    центра (без них не посчитать расстояние, а значит, и тариф).
+    """
+    return City.objects.filter(is_active=True, center_latitude__isnull=False, center_longitude__isnull=False)
+
+
+class TariffMatrix:
+    """
+    Предрасчитанные цены доставки в памяти процесса.
+
+    Для каждой пары активных городов с координатами и каждого активного
+    размера посылки цена считается один раз при загрузке (два запроса),
+    после чего quote - это поиск в словаре без обращения к БД.
+    Матрица сбрасывается сигналами при изменении городов и размеров
+    (см. orders/signals.py) и пересчитывается при следующем запросе цены;
+    TTL ограничивает время жизни устаревших цен в других процессах.
+    """
+    ttl = 300  # секунд
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None  # (цены, расстояния): один атрибут, чтобы invalidate не разорвал пару
+        self._loaded_at = 0.0
+
+    @staticmethod
+    def tariff():
+        return {name: Decimal(str(value)) for name, value in settings.ORDER_PRICING.items()}
+
+    @staticmethod
+    def price_for(distance_km, multiplier, tariff):
+        price = max(tariff['MIN_FARE'], tariff['BASE_FARE'] + tariff['PER_KM'] * distance_km) * multiplier
+        return price.quantize(PRICE_QUANT, rounding=ROUND_HALF_UP)
+
+    def _load(self):
+        with self._lock:
+            data = self._data
+            if data is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return data
+            tariff = self.tariff()
+            cities = list(priced_cities().values_list('pk', 'center_latitude', 'center_longitude'))
+            sizes = list(PackageSize.objects.filter(is_active=True).values_list('pk', 'price_multiplier'))
+
+            distances = {}
+            prices = {}
+            for origin_id, origin_lat, origin_lon in cities:
+                for destination_id, destination_lat, destination_lon in cities:
+                    km = Decimal(haversine_km(origin_lat, origin_lon, destination_lat, destination_lon))
+                    km = (km * tariff['ROAD_FACTOR']).quantize(Decimal('0.1'))
+                    distances[origin_id, destination_id] = km
+                    for size_id, multiplier in sizes:
+                        prices[origin_id, destination_id, size_id] = self.price_for(km, multiplier, tariff)
+            data = (prices, distances)
+            self._data = data
+            self._loaded_at = time.monotonic()
+            return data
+
+    def _ensure_loaded(self):
+        """Возвращает (цены, расстояния) локальной ссылкой, которую не обнулит параллельный invalidate()."""
+        data = self._data
+        if data is None or time.monotonic() - self._loaded_at >= self.ttl:
+            data = self._load()
+        return data
+
+    def quote(self, origin_city_id, destination_city_id, package_size_id):
+        """Цена доставки или None, если для маршрута и размера тарифа нет."""
+        prices, _ = self._ensure_loaded()
+        return prices.get((origin_city_id, destination_city_id, package_size_id))
+
+    def distance(self, origin_city_id, destination_city_id):
+        """Расчетное расстояние маршрута, км (с учетом ROAD_FACTOR), или None."""
+        _, distances = self._ensure_loaded()
+        return distances.get((origin_city_id, destination_city_id))
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+
+tariff_matrix = TariffMatrix()
+
+
+def resolve_order_price(origin_city_id, destination_city_id, package_size_id, client_price=None):
+    """
+    Цена нового заказа по тарифу.
+
+    Если клиент передал цену, она должна совпадать с тарифной (например,
+    показанной ему ранее в /orders/quote/). Цена клиента никогда не
+    принимается вместо тарифа: маршрут без тарифа отклоняется. Города и
+    размеры без тарифа отсекают уже сериализаторы (см. priced_cities).
+    """
+    price = tariff_matrix.quote(origin_city_id, destination_city_id, package_size_id)
+    if price is None:
+        raise PricingError('Для этого маршрута и размера посылки нет тарифа.')
+    if client_price is not None and client_price != price:
+        raise PricingError(f'Цена доставки по тарифу изменилась: {price}.')
+    return price
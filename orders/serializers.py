@@ -1,19 +1,39 @@
 from rest_framework import serializers
 from .models import Order, OrderStatus # Модели из текущего приложения orders
+from .export import EXPORT_FORMATS
+from .pricing import priced_cities
+from .statuses import status_registry
+from .trips import TRIP_MAX_ORDERS
 
-# Импорты сериализаторов из других приложений для использования в to_representation
+# Импорты сериализаторов из других приложений для вложенного представления
 from users.serializers import ClientProfileSerializer, CourierProfileSerializer
 from core.serializers import CitySerializer as CoreCitySerializer # Используем алиас для ясности
 from core.serializers import PackageSizeSerializer as CorePackageSizeSerializer # Используем алиас для ясности
 
 # --- ДОБАВЬТЕ ЭТИ ИМПОРТЫ МОДЕЛЕЙ ---
-from core.models import City, PackageSize # Модели из приложения core
+from core.models import PackageSize # Модели из приложения core
 # ------------------------------------
 
 class OrderStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderStatus
-        fields = ['id', 'name', 'description', 'order_index']
+        fields = ['id', 'name', 'code', 'description', 'order_index']
+
+
+class OrderStatusRelatedField(serializers.PrimaryKeyRelatedField):
+    """Принимает id статуса и берет объект из status_registry без запроса к БД."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return status_registry.get_by_id(data)
+        except OrderStatus.DoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+
+
+# Поля, от которых зависит цена заказа (orders/pricing.py)
+PRICED_FIELDS = ('origin_city_id', 'destination_city_id', 'package_size_id')
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -26,17 +46,18 @@ class OrderSerializer(serializers.ModelSerializer):
     destination_city = CoreCitySerializer(read_only=True)  # Используем импортированный CoreCitySerializer
 
     # Поля только для записи (используем импортированные МОДЕЛИ для queryset)
-    status_id = serializers.PrimaryKeyRelatedField(
+    status_id = OrderStatusRelatedField(
         queryset=OrderStatus.objects.all(), source='status', write_only=True, required=False
     )
+    # Только справочники с тарифом: активные размеры, активные города с координатами (см. orders/pricing.py)
     package_size_id = serializers.PrimaryKeyRelatedField(
-        queryset=PackageSize.objects.all(), source='package_size', write_only=True  # Теперь PackageSize известен
+        queryset=PackageSize.objects.filter(is_active=True), source='package_size', write_only=True
     )
     origin_city_id = serializers.PrimaryKeyRelatedField(
-        queryset=City.objects.all(), source='origin_city', write_only=True  # Теперь City известен
+        queryset=priced_cities(), source='origin_city', write_only=True
     )
     destination_city_id = serializers.PrimaryKeyRelatedField(
-        queryset=City.objects.all(), source='destination_city', write_only=True  # Теперь City известен
+        queryset=priced_cities(), source='destination_city', write_only=True
     )
 
     class Meta:
@@ -46,6 +67,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'client', 'courier', 'status',
             'package_size', 'origin_city', 'destination_city',
             'pickup_address', 'delivery_address',
+            'pickup_latitude', 'pickup_longitude', 'delivery_latitude', 'delivery_longitude',
             'pickup_date', 'pickup_time_slot',
             'recipient_name', 'recipient_phone',
             'sender_name_snapshot', 'sender_phone_snapshot',
@@ -64,17 +86,130 @@ class OrderSerializer(serializers.ModelSerializer):
             # из-за того, как мы их определили выше для чтения, а для записи используем *_id поля.
             # Можно добавить их сюда для явности, если хотите.
         ]
+        # Координаты необязательны: если их нет, адреса геокодируются при создании заказа
+        extra_kwargs = {
+            # Цена считается по тарифу (orders/pricing.py); переданная клиентом цена только сверяется с ним
+            'price': {'required': False},
+            'pickup_latitude': {'min_value': -90, 'max_value': 90},
+            'pickup_longitude': {'min_value': -180, 'max_value': 180},
+            'delivery_latitude': {'min_value': -90, 'max_value': 90},
+            'delivery_longitude': {'min_value': -180, 'max_value': 180},
+        }
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # Цена проверена по тарифу при создании: после этого ее, маршрут и размер,
+            # от которых она зависит, не меняет никто, включая курьера заказа
+            for name in PRICED_FIELDS:
+                fields.pop(name, None)
+            fields['price'].read_only = True
+        return fields
+
+
+class AvailableOrderSerializer(OrderSerializer):
+    """Заказ в ленте доступных заказов рядом с курьером."""
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        fields = OrderSerializer.Meta.fields + ['distance_km']
+
+
+class BulkOrderRowSerializer(serializers.ModelSerializer):
+    """
+    Строка массовой загрузки заказов (JSON-объект или строка CSV).
+
+    Связанные объекты передаются числовыми id и не загружаются для каждой
+    строки отдельно: существование городов и размеров, а также цена
+    проверяются для всей пачки сразу (см. orders/bulk.py).
+    """
+    origin_city_id = serializers.IntegerField(min_value=1)
+    destination_city_id = serializers.IntegerField(min_value=1)
+    package_size_id = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Order
+        fields = [
+            'origin_city_id', 'destination_city_id', 'package_size_id',
+            'pickup_address', 'delivery_address',
+            'pickup_latitude', 'pickup_longitude', 'delivery_latitude', 'delivery_longitude',
+            'pickup_date', 'pickup_time_slot',
+            'recipient_name', 'recipient_phone',
+            'comment', 'price',
+        ]
+        extra_kwargs = OrderSerializer.Meta.extra_kwargs
 
-    # Метод to_representation я немного изменил, чтобы он использовал импортированные сериализаторы,
-    # а для статуса - локальный OrderStatusSerializer.
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['client'] = ClientProfileSerializer(instance.client).data if instance.client else None
-        representation['courier'] = CourierProfileSerializer(instance.courier).data if instance.courier else None
-        representation['status'] = OrderStatusSerializer(instance.status).data if instance.status else None
-        representation['package_size'] = CorePackageSizeSerializer(
-            instance.package_size).data if instance.package_size else None
-        representation['origin_city'] = CoreCitySerializer(instance.origin_city).data if instance.origin_city else None
-        representation['destination_city'] = CoreCitySerializer(
-            instance.destination_city).data if instance.destination_city else None
-        return representation
+
+class BulkOrderResultSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ['id', 'unique_order_id', 'price']
+
+
+class OrderQuoteSerializer(serializers.Serializer):
+    origin_city_id = serializers.IntegerField(min_value=1)
+    destination_city_id = serializers.IntegerField(min_value=1)
+    package_size_id = serializers.IntegerField(min_value=1)
+    distance_km = serializers.DecimalField(max_digits=7, decimal_places=1, read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+
+class OrderExportFilterSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    city_id = serializers.IntegerField(min_value=1, required=False)
+    status = serializers.SlugField(required=False)
+    # Не "format": этот параметр DRF использует для выбора рендерера
+    file_format = serializers.ChoiceField(choices=EXPORT_FORMATS, default='csv')
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'Дата окончания раньше даты начала.'})
+        return attrs
+
+
+class OrderTrackingStatusSerializer(serializers.Serializer):
+    code = serializers.CharField()
+    name = serializers.CharField()
+
+
+class OrderTrackingEventSerializer(OrderTrackingStatusSerializer):
+    at = serializers.DateTimeField()
+
+
+class OrderTrackingSerializer(serializers.Serializer):
+    """Публичная проекция заказа для страницы отслеживания."""
+    unique_order_id = serializers.CharField()
+    status = OrderTrackingStatusSerializer()
+    origin_city = serializers.CharField()
+    destination_city = serializers.CharField()
+    pickup_date = serializers.DateField()
+    created_at = serializers.DateTimeField()
+    pickup_timestamp = serializers.DateTimeField(allow_null=True)
+    delivery_timestamp = serializers.DateTimeField(allow_null=True)
+    history = OrderTrackingEventSerializer(many=True)
+
+
+class TripStopSerializer(serializers.Serializer):
+    order_id = serializers.IntegerField()
+    kind = serializers.ChoiceField(choices=['pickup', 'delivery'])
+    address = serializers.CharField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+
+
+class TripSerializer(serializers.Serializer):
+    """Рейс из нескольких совместимых заказов с порядком остановок."""
+    order_ids = serializers.ListField(child=serializers.IntegerField())
+    origin_city_id = serializers.IntegerField()
+    destination_city_id = serializers.IntegerField()
+    pickup_date = serializers.DateField()
+    capacity_units = serializers.IntegerField()
+    distance_km = serializers.FloatField()
+    stops = TripStopSerializer(many=True)
+
+
+class TripTakeSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=TRIP_MAX_ORDERS
+    )
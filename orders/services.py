@@ -0,0 +1,120 @@
+import heapq
+
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from chat.models import ChatSession
+from core.geo import geohash_cells_within, haversine_km
+from core.geocoding import geocode_or_none
+from .models import Order, OrderStatus
+from .statuses import status_registry
+from .transitions import record_status_events
+
+
+class OrderAlreadyTaken(Exception):
+    """Заказ уже взят другим курьером или больше не доступен для взятия."""
+
+
+def take_order(order_id, courier_id, actor_id=None):
+    """
+    Назначает заказ курьеру одним условным UPDATE.
+
+    Условие courier IS NULL AND status = "processing" проверяется самой БД,
+    поэтому из нескольких одновременных запросов выигрывает ровно один,
+    остальные получают OrderAlreadyTaken. Чат создается в той же транзакции.
+    """
+    take_orders([order_id], courier_id, actor_id)
+
+
+def take_orders(order_ids, courier_id, actor_id=None):
+    """
+    Назначает курьеру сразу несколько заказов (рейс) по принципу "все или ничего".
+
+    Тот же условный UPDATE, что и в take_order, но по списку id: если хотя бы
+    один заказ уже взят, транзакция откатывается и бросается OrderAlreadyTaken.
+    Чаты и записи журнала статусов создаются одним INSERT каждые;
+    actor_id - пользователь, выполнивший действие (None - система).
+    """
+    order_ids = set(order_ids)
+    processing = status_registry.get(OrderStatus.CODE_PROCESSING)
+    in_transit = status_registry.get(OrderStatus.CODE_IN_TRANSIT)
+    now = timezone.now()
+
+    with transaction.atomic():
+        updated = Order.objects.filter(
+            pk__in=order_ids, courier__isnull=True, status=processing
+        ).update(courier_id=courier_id, status=in_transit, pickup_timestamp=now, updated_at=now)
+        if updated != len(order_ids):
+            raise OrderAlreadyTaken()
+        # INSERT ... ON CONFLICT DO NOTHING: без предварительного SELECT
+        ChatSession.objects.bulk_create(
+            [ChatSession(order_id=order_id) for order_id in sorted(order_ids)], ignore_conflicts=True)
+        record_status_events(sorted(order_ids), processing, in_transit, actor_id=actor_id, at=now)
+
+
+def geocode_order_addresses(data):
+    """
+    Координаты адресов забора и доставки для нового заказа.
+
+    data - validated_data сериализатора; координаты, переданные клиентом
+    (например, точка на карте), не перезаписываются. Возвращает словарь
+    полей, которые удалось заполнить.
+    """
+    coordinates = {}
+    points = (
+        ('pickup', data.get('pickup_address'), data.get('origin_city')),
+        ('delivery', data.get('delivery_address'), data.get('destination_city')),
+    )
+    for prefix, address, city in points:
+        if data.get(f'{prefix}_latitude') is not None and data.get(f'{prefix}_longitude') is not None:
+            continue
+        point = geocode_or_none(address, city) if address else None
+        if point is not None:
+            coordinates[f'{prefix}_latitude'], coordinates[f'{prefix}_longitude'] = point
+    return coordinates
+
+
+def nearby_available_orders(latitude, longitude, radius_km, limit, after=None):
+    """
+    Доступные заказы в радиусе radius_km от точки, ближайшие первыми.
+
+    Кандидаты выбираются по частичному индексу order_available_geo_idx
+    списком ячеек geohash, покрывающих круг, поэтому стоимость запроса
+    зависит от числа заказов рядом, а не от общего числа открытых заказов.
+    Сначала читаются только координаты (точка забора или центр города
+    отправки, если адрес не геокодирован), затем полностью загружаются
+    не более limit ближайших заказов. У каждого заказа заполняется distance_km
+    и feed_position - ключ сортировки (расстояние, -время создания, -id);
+    after - ключ последнего заказа предыдущей страницы, выдача начинается строго после него.
+    """
+    processing = status_registry.get(OrderStatus.CODE_PROCESSING)
+    # order_by() убирает сортировку Meta.ordering: с ней планировщик выбрал бы order_available_idx
+    candidates = Order.objects.filter(
+        courier__isnull=True, status=processing,
+        pickup_geohash__in=geohash_cells_within(latitude, longitude, radius_km),
+    ).order_by().values_list(
+        'pk', 'created_at',
+        Coalesce('pickup_latitude', 'origin_city__center_latitude'),
+        Coalesce('pickup_longitude', 'origin_city__center_longitude'),
+    )
+
+    def within_radius():
+        for pk, created_at, order_lat, order_lon in candidates.iterator():
+            distance = haversine_km(latitude, longitude, order_lat, order_lon)
+            if distance <= radius_km:
+                # При равном расстоянии новые заказы идут первыми, как в обычной ленте
+                key = (distance, -created_at.timestamp(), -pk)
+                if after is None or key > after:
+                    yield key
+
+    nearest = heapq.nsmallest(limit, within_radius())
+    orders = Order.objects.with_related().in_bulk([-neg_pk for _, _, neg_pk in nearest])
+    result = []
+    for key in nearest:
+        distance, _, neg_pk = key
+        order = orders[-neg_pk]
+        order.distance_km = round(distance, 3)
+        order.feed_position = key
+        result.append(order)
+    return result
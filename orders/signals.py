@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.caching import invalidate_reference_cache
+from core.geo import geohash_encode
+from core.models import City, PackageSize
+from .models import Order, OrderStatus
+from .pricing import tariff_matrix
+from .tracking import invalidate_tracking_keys
+from .statuses import status_registry
+
+
+@receiver(post_save, sender=OrderStatus)
+@receiver(post_delete, sender=OrderStatus)
+def invalidate_status_caches(sender, **kwargs):
+    status_registry.invalidate()
+    invalidate_reference_cache('order_statuses')
+
+
+@receiver(post_save, sender=City)
+def refresh_city_pickup_geohash(sender, instance, created, **kwargs):
+    # Geohash заказов без геокодированного адреса вычислен по центру города и следует за ним
+    if created:
+        return
+    if instance.center_latitude is None or instance.center_longitude is None:
+        geohash = ''
+    else:
+        geohash = geohash_encode(instance.center_latitude, instance.center_longitude)
+    Order.objects.filter(origin_city=instance, pickup_latitude__isnull=True).exclude(
+        pickup_geohash=geohash).update(pickup_geohash=geohash)
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=PackageSize)
+@receiver(post_delete, sender=PackageSize)
+def invalidate_tariff_matrix(sender, **kwargs):
+    tariff_matrix.invalidate()
+
+
+@receiver(post_save, sender=Order)
+def invalidate_order_tracking(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_tracking_keys([instance.unique_order_id])
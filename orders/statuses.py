@@ -0,0 +1,75 @@
+import threading
+import time
+
+from .models import OrderStatus
+
+
+class OrderStatusRegistry:
+    """
+    Кэш справочника статусов заказа в памяти процесса.
+
+    Все строки OrderStatus загружаются одним запросом и дальше отдаются
+    по коду или по id без обращения к БД. Кэш сбрасывается сигналами
+    при изменении статусов (см. orders/signals.py), а TTL ограничивает
+    время жизни устаревших данных в других процессах.
+    """
+    ttl = 300  # секунд
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None  # (по коду, по id): один атрибут, чтобы invalidate не разорвал пару
+        self._loaded_at = 0.0
+
+    def _load(self):
+        with self._lock:
+            data = self._data
+            if data is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return data
+            statuses = list(OrderStatus.objects.all())
+            data = (
+                {status.code: status for status in statuses if status.code},
+                {status.pk: status for status in statuses},
+            )
+            self._data = data
+            self._loaded_at = time.monotonic()
+            return data
+
+    def _ensure_loaded(self):
+        """
+        Возвращает словари (по коду, по id). Вызывающий работает с локальной
+        ссылкой: параллельный invalidate() сбрасывает только атрибут.
+        """
+        data = self._data
+        if data is None or time.monotonic() - self._loaded_at >= self.ttl:
+            data = self._load()
+        return data
+
+    def get(self, code):
+        """Возвращает статус по коду или бросает OrderStatus.DoesNotExist."""
+        by_code, _ = self._ensure_loaded()
+        try:
+            return by_code[code]
+        except KeyError:
+            raise OrderStatus.DoesNotExist(f"Статус с кодом '{code}' не настроен в системе.")
+
+    def get_by_id(self, pk):
+        """Возвращает статус по id или бросает OrderStatus.DoesNotExist."""
+        _, by_id = self._ensure_loaded()
+        try:
+            return by_id[int(pk)]
+        except (KeyError, TypeError, ValueError):
+            raise OrderStatus.DoesNotExist(f"Статус с id '{pk}' не найден.")
+
+    def code_for(self, status_id):
+        """Код статуса по его id (None, если статус неизвестен или без кода)."""
+        try:
+            return self.get_by_id(status_id).code
+        except OrderStatus.DoesNotExist:
+            return None
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+
+status_registry = OrderStatusRegistry()
@@ -1,3 +1,1103 @@
-from django.test import TestCase
+import csv
+import datetime
+import json
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.db import OperationalError, connection, transaction
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from chat.models import ChatSession
+from core.geo import geohash_cells_within, geohash_encode, haversine_km
+from core.geocoding import GeocodingError, OfflineGeocoder
+from core.models import City, PackageSize
+from couriers.availability import go_online
+from couriers.online_index import get_online_index
+from users.models import User, ClientProfile, CourierProfile
+from .dispatch import dispatch_open_orders, match_greedy
+from .models import ORDER_ID_LENGTH, Order, OrderStatus, OrderStatusEvent
+from .pricing import tariff_matrix
+from .services import OrderAlreadyTaken, take_order
+from .statuses import status_registry
+from .transitions import check_transition
+from .trips import build_trips, open_trip_orders, plan_route
+
+
+class OrderTestMixin:
+    """Общие фикстуры для тестов заказов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status_processing = OrderStatus.objects.create(
+            name='Обработка', code=OrderStatus.CODE_PROCESSING, order_index=1)
+        cls.status_in_transit = OrderStatus.objects.create(
+            name='В пути', code=OrderStatus.CODE_IN_TRANSIT, order_index=2)
+        cls.status_delivered = OrderStatus.objects.create(
+            name='Доставлен', code=OrderStatus.CODE_DELIVERED, order_index=3)
+        cls.status_cancelled = OrderStatus.objects.create(
+            name='Отменен', code=OrderStatus.CODE_CANCELLED, order_index=4)
+        cls.almaty = City.objects.create(name='Алматы', center_latitude=Decimal('43.238949'),
+                                         center_longitude=Decimal('76.889709'))
+        cls.astana = City.objects.create(name='Астана', center_latitude=Decimal('51.128207'),
+                                         center_longitude=Decimal('71.430411'))
+        cls.size = PackageSize.objects.create(name='S')
+        cls.client_user = User.objects.create_user('+77010000001', 'pass', role=User.ROLE_CLIENT)
+        cls.client_profile = ClientProfile.objects.create(
+            user=cls.client_user, full_name='Клиент', iin='000000000001', city=cls.almaty,
+            date_of_birth=datetime.date(1990, 1, 1),
+        )
+        cls.courier_user = User.objects.create_user('+77010000002', 'pass', role=User.ROLE_COURIER)
+        cls.courier_profile = cls.create_courier(cls.courier_user, '000000000002')
+
+    @classmethod
+    def create_courier(cls, user, iin):
+        return CourierProfile.objects.create(
+            user=user, full_name=f'Курьер {iin}', iin=iin, city=cls.almaty,
+            date_of_birth=datetime.date(1990, 1, 1),
+            id_card_front='x.jpg', id_card_back='x.jpg', driver_license_front='x.jpg',
+            driver_license_back='x.jpg', selfie_with_id='x.jpg',
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        """Проверяет по плану запроса (EXPLAIN), что БД читает данные через индекс."""
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # На маленьких тестовых таблицах PostgreSQL предпочел бы seq scan
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan, f'План запроса не использует {index_name}:\n{plan}')
+
+    def setUp(self):
+        super().setUp()
+        # Реестр, тарифы и индекс курьеров на связи живут в памяти процесса,
+        # а тестовые транзакции откатываются без сигналов
+        status_registry.invalidate()
+        tariff_matrix.invalidate()
+        get_online_index().clear()
+
+    def create_order(self, **kwargs):
+        fields = {
+            'client': self.client_profile,
+            'status': self.status_processing,
+            'package_size': self.size,
+            'origin_city': self.almaty,
+            'destination_city': self.astana,
+            'pickup_address': 'ул. Абая 1',
+            'delivery_address': 'пр. Республики 2',
+            'pickup_date': datetime.date(2025, 1, 1),
+            'pickup_time_slot': '10:00-12:00',
+            'recipient_name': 'Получатель',
+            'recipient_phone': '+77010000009',
+            'price': Decimal('1000.00'),
+        }
+        fields.update(kwargs)
+        return Order.objects.create(**fields)
+
+
+class OrderListQueryCountTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+
+    def count_list_queries(self, user, url):
+        self.api.force_authenticate(user)
+        # Прогреваем кэши процесса (реестр статусов), чтобы считать только запросы страницы
+        self.api.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_client_list_query_count_does_not_grow_with_page_size(self):
+        url = reverse('orders_api:order_list_create')
+        self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        small_count, _ = self.count_list_queries(self.client_user, url)
+
+        for _ in range(10):
+            self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        large_count, response = self.count_list_queries(self.client_user, url)
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.json()['results']), 11)
+
+    def test_available_list_query_count_does_not_grow_with_page_size(self):
+        url = reverse('orders_api:available_order_list')
+        self.create_order()
+        small_count, _ = self.count_list_queries(self.courier_user, url)
+
+        for _ in range(10):
+            self.create_order()
+        large_count, response = self.count_list_queries(self.courier_user, url)
+
+        self.assertEqual(small_count, large_count)
+        order = response.json()['results'][0]
+        self.assertEqual(order['status']['name'], 'Обработка')
+        self.assertEqual(order['origin_city']['name'], 'Алматы')
+        self.assertIsNone(order['courier'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class OrderDetailQueryCountTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.api = APIClient()
+
+    def assertDetailQueries(self, user, order, expected):
+        token = Token.objects.create(user=user)
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = reverse('orders_api:order_detail_update', args=[order.pk])
+        # Первый запрос кладет токен в кэш и прогревает реестр статусов
+        self.api.get(url)
+        with self.assertNumQueries(expected):
+            response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_client_detail_needs_single_query(self):
+        self.assertDetailQueries(self.client_user, self.create_order(), 1)
+
+    def test_courier_detail_needs_single_query(self):
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        self.assertDetailQueries(self.courier_user, order, 1)
+
+
+class OrderCursorPaginationTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+        self.url = reverse('orders_api:order_list_create')
+
+    def test_pages_are_stable_under_concurrent_inserts_and_equal_timestamps(self):
+        orders = [self.create_order() for _ in range(5)]
+        # Одинаковое время создания: порядок должен определяться id
+        Order.objects.filter(pk__in=[o.pk for o in orders[:3]]).update(created_at=orders[0].created_at)
+
+        seen = []
+        response = self.api.get(self.url, {'page_size': 2})
+        seen += [item['id'] for item in response.json()['results']]
+
+        # Новый заказ, созданный во время листания, не должен сдвигать страницы
+        self.create_order()
+
+        next_url = response.json()['next']
+        while next_url:
+            response = self.api.get(next_url)
+            self.assertEqual(response.status_code, 200)
+            seen += [item['id'] for item in response.json()['results']]
+            next_url = response.json()['next']
+
+        expected = list(
+            Order.objects.filter(pk__in=[o.pk for o in orders])
+            .order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.api.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderStatusRegistryTests(OrderTestMixin, TestCase):
+
+    def test_lookups_by_code_and_id_hit_database_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(status_registry.get(OrderStatus.CODE_PROCESSING), self.status_processing)
+            self.assertEqual(status_registry.get_by_id(self.status_delivered.pk).code, OrderStatus.CODE_DELIVERED)
+            self.assertEqual(status_registry.code_for(str(self.status_in_transit.pk)), OrderStatus.CODE_IN_TRANSIT)
+
+    def test_unknown_status_raises_does_not_exist(self):
+        with self.assertRaises(OrderStatus.DoesNotExist):
+            status_registry.get('unknown')
+        with self.assertRaises(OrderStatus.DoesNotExist):
+            status_registry.get_by_id('abc')
+
+    def test_concurrent_invalidate_does_not_break_lookup(self):
+        ensure_loaded = status_registry._ensure_loaded
+
+        def load_then_invalidate():
+            data = ensure_loaded()
+            status_registry.invalidate()  # Другой поток сбросил кэш между загрузкой и поиском
+            return data
+
+        with mock.patch.object(status_registry, '_ensure_loaded', side_effect=load_then_invalidate):
+            self.assertEqual(status_registry.get(OrderStatus.CODE_PROCESSING), self.status_processing)
+            self.assertEqual(status_registry.get_by_id(self.status_delivered.pk), self.status_delivered)
+
+    def test_admin_edit_invalidates_registry(self):
+        self.assertEqual(status_registry.get(OrderStatus.CODE_PROCESSING).name, 'Обработка')
+        self.status_processing.name = 'Новый'
+        self.status_processing.save()
+        self.assertEqual(status_registry.get(OrderStatus.CODE_PROCESSING).name, 'Новый')
+
+    def test_client_cancels_order_by_status_code(self):
+        order = self.create_order()
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        response = api.patch(
+            reverse('orders_api:order_detail_update', args=[order.pk]),
+            {'status_id': self.status_cancelled.pk, 'cancellation_reason': 'Передумал'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, self.status_cancelled)
+        self.assertEqual(order.cancellation_reason, 'Передумал')
+
+
+class NearbyAvailableOrderTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.courier_user)
+        self.url = reverse('orders_api:available_order_list')
+
+    def test_pickup_geohash_is_filled_from_origin_city(self):
+        order = self.create_order()
+        self.assertEqual(order.pickup_geohash, geohash_encode(self.almaty.center_latitude,
+                                                              self.almaty.center_longitude))
+
+    def test_city_move_refreshes_order_geohash(self):
+        order = self.create_order()
+        self.almaty.center_latitude = Decimal('43.300000')
+        self.almaty.save()
+        order.refresh_from_db()
+        self.assertEqual(order.pickup_geohash, geohash_encode(Decimal('43.3'), self.almaty.center_longitude))
+
+    def test_orders_within_radius_of_position_nearest_first(self):
+        in_astana = self.create_order(origin_city=self.astana, destination_city=self.almaty)
+        self.create_order()
+        response = self.api.get(self.url, {'latitude': '51.15', 'longitude': '71.45', 'radius_km': '10'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([order['id'] for order in results], [in_astana.pk])
+        self.assertLess(results[0]['distance_km'], 10)
+
+    def test_nearby_feed_pages_through_all_orders_in_radius(self):
+        orders = [self.create_order() for _ in range(5)]
+        # Одинаковое расстояние и время создания: порядок определяется id
+        Order.objects.filter(pk__in=[o.pk for o in orders[:3]]).update(created_at=orders[0].created_at)
+        seen = []
+        url, params = self.url, {'latitude': '43.24', 'longitude': '76.89', 'page_size': 2}
+        while url:
+            body = self.api.get(url, params).json()
+            self.assertEqual(body['radius_km'], 15)
+            seen += [order['id'] for order in body['results']]
+            url, params = body['next'], None
+        self.assertEqual(seen, [orders[4].pk, orders[3].pk, orders[2].pk, orders[1].pk, orders[0].pk])
+        self.assertEqual(self.api.get(self.url, {'latitude': '43.24', 'longitude': '76.89',
+                                                 'cursor': 'bad'}).status_code, 404)
+
+    def test_courier_city_is_used_without_position(self):
+        older = self.create_order()
+        newer = self.create_order()
+        self.create_order(origin_city=self.astana, destination_city=self.almaty)
+        self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        results = self.api.get(self.url).json()['results']
+        self.assertEqual([order['id'] for order in results], [newer.pk, older.pk])
+        self.assertEqual(results[0]['distance_km'], 0)
+
+    def test_without_position_falls_back_to_paginated_feed(self):
+        CourierProfile.objects.filter(pk=self.courier_profile.pk).update(city=None)
+        self.create_order(origin_city=self.astana, destination_city=self.almaty)
+        self.create_order()
+        body = self.api.get(self.url).json()
+        self.assertEqual(len(body['results']), 2)
+        self.assertNotIn('distance_km', body['results'][0])
+
+    def test_invalid_position_returns_400(self):
+        self.assertEqual(self.api.get(self.url, {'latitude': '95', 'longitude': '71'}).status_code, 400)
+        self.assertEqual(self.api.get(self.url, {'latitude': '51.1'}).status_code, 400)
+        self.assertEqual(self.api.get(self.url, {'latitude': 'x', 'longitude': '71'}).status_code, 400)
+
+
+class OrderCoordinatesTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def create_via_api(self, **extra):
+        payload = {
+            'package_size_id': self.size.pk,
+            'origin_city_id': self.almaty.pk,
+            'destination_city_id': self.astana.pk,
+            'pickup_address': 'ул. Абая 1',
+            'delivery_address': 'пр. Республики 2',
+            'pickup_date': '2025-01-01',
+            'pickup_time_slot': '10:00-12:00',
+            'recipient_name': 'Получатель',
+            'recipient_phone': '+77010000009',
+            **extra,
+        }
+        response = self.api.post(reverse('orders_api:order_list_create'), payload)
+        self.assertEqual(response.status_code, 201, response.content)
+        return Order.objects.get(pk=response.json()['id'])
+
+    def test_addresses_are_geocoded_on_create(self):
+        order = self.create_via_api()
+        self.assertLess(haversine_km(order.pickup_latitude, order.pickup_longitude,
+                                     self.almaty.center_latitude, self.almaty.center_longitude), 8)
+        self.assertLess(haversine_km(order.delivery_latitude, order.delivery_longitude,
+                                     self.astana.center_latitude, self.astana.center_longitude), 8)
+        self.assertEqual(order.pickup_geohash, geohash_encode(order.pickup_latitude, order.pickup_longitude))
+
+    def test_client_coordinates_are_kept(self):
+        order = self.create_via_api(pickup_latitude='43.250000', pickup_longitude='76.900000')
+        self.assertEqual(order.pickup_latitude, Decimal('43.25'))
+        self.assertEqual(order.pickup_longitude, Decimal('76.9'))
+        self.assertIsNotNone(order.delivery_latitude)
+
+    def test_geocoder_failure_does_not_block_order(self):
+        with mock.patch.object(OfflineGeocoder, 'geocode', side_effect=GeocodingError('timeout')), \
+                self.assertLogs('core.geocoding', 'WARNING'):
+            order = self.create_via_api()
+        self.assertIsNone(order.pickup_latitude)
+        self.assertEqual(order.pickup_geohash, geohash_encode(self.almaty.center_latitude,
+                                                              self.almaty.center_longitude))
+
+    def test_backfill_command_fills_missing_coordinates_in_chunks(self):
+        orders = [self.create_order() for _ in range(5)]
+        geocoded = self.create_order(pickup_latitude=Decimal('43.2'), pickup_longitude=Decimal('76.8'))
+
+        call_command('backfill_order_coordinates', chunk_size=2, stdout=StringIO())
+
+        expected = OfflineGeocoder().geocode('ул. Абая 1', self.almaty)
+        for order in orders:
+            order.refresh_from_db()
+            self.assertEqual((order.pickup_latitude, order.pickup_longitude), expected)
+            self.assertEqual(order.pickup_geohash, geohash_encode(*expected))
+            self.assertIsNotNone(order.delivery_latitude)
+        geocoded.refresh_from_db()
+        self.assertEqual(geocoded.pickup_latitude, Decimal('43.2'))
+        self.assertIsNotNone(geocoded.delivery_latitude)
+
+
+class DispatchTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        go_online(self.courier_profile.pk)
+
+    def test_greedy_matching_takes_closest_pairs_first(self):
+        distances = np.array([
+            [1.0, 9.0],
+            [2.0, 3.0],
+            [0.5, 8.0],
+        ])
+        self.assertEqual(match_greedy(distances), [(2, 0), (1, 1)])
+        self.assertEqual(match_greedy(distances, max_distance_km=2.5), [(2, 0)])
+
+    def test_greedy_matching_breaks_ties_by_index(self):
+        self.assertEqual(match_greedy(np.ones((3, 2))), [(0, 0), (1, 1)])
+
+    def test_dispatch_assigns_nearest_free_courier_in_same_city(self):
+        second_courier = self.create_courier(
+            User.objects.create_user('+77010000003', 'pass', role=User.ROLE_COURIER), '000000000003')
+        busy_courier = self.create_courier(
+            User.objects.create_user('+77010000004', 'pass', role=User.ROLE_COURIER), '000000000004')
+        self.create_order(courier=busy_courier, status=self.status_in_transit)
+        go_online(second_courier.pk)
+        go_online(busy_courier.pk)
+
+        far = self.create_order(pickup_latitude=Decimal('43.300000'), pickup_longitude=Decimal('76.950000'))
+        near = self.create_order(pickup_latitude=Decimal('43.240000'), pickup_longitude=Decimal('76.890000'))
+        unreachable = self.create_order(pickup_latitude=Decimal('43.500000'), pickup_longitude=Decimal('77.300000'))
+        other_city = self.create_order(origin_city=self.astana, destination_city=self.almaty)
+
+        applied = dispatch_open_orders(max_distance_km=20)
+
+        self.assertEqual([(order_id, courier_id) for order_id, courier_id, _ in applied],
+                         [(near.pk, self.courier_profile.pk), (far.pk, second_courier.pk)])
+        near.refresh_from_db()
+        self.assertEqual(near.status, self.status_in_transit)
+        self.assertTrue(ChatSession.objects.filter(order=near).exists())
+        for order in (unreachable, other_city):
+            order.refresh_from_db()
+            self.assertIsNone(order.courier_id)
+
+        # Все курьеры города заняты, следующий раунд ничего не назначает
+        self.assertEqual(dispatch_open_orders(), [])
+
+    def test_dispatch_skips_orders_taken_in_between(self):
+        order = self.create_order()
+        with mock.patch('orders.dispatch.take_order', side_effect=OrderAlreadyTaken):
+            self.assertEqual(dispatch_open_orders(), [])
+        order.refresh_from_db()
+        self.assertIsNone(order.courier_id)
+
+    def test_dispatch_command_runs_single_round(self):
+        order = self.create_order()
+        out = StringIO()
+        call_command('dispatch_orders', stdout=out)
+        self.assertIn('Назначено заказов: 1', out.getvalue())
+        order.refresh_from_db()
+        self.assertEqual(order.courier_id, self.courier_profile.pk)
+
+
+class TripTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.courier_user)
+
+    def create_trip_order(self, latitude, **kwargs):
+        return self.create_order(
+            pickup_latitude=Decimal(latitude), pickup_longitude=Decimal('76.900000'),
+            delivery_latitude=Decimal('51.100000') + Decimal(latitude) - 43, delivery_longitude=Decimal('71.400000'),
+            **kwargs)
+
+    def test_route_visits_points_in_shortest_order(self):
+        sequence, length = plan_route((0.0, 0.0), [(0.0, 0.3), (0.0, 0.1), (0.0, 0.2)])
+        self.assertEqual(sequence, [1, 2, 0])
+        self.assertAlmostEqual(length, haversine_km(0, 0, 0, 0.3), places=6)
+
+    def test_two_opt_removes_crossing(self):
+        # Ближайший сосед идет 1 -> 0 -> 2 -> 3 и возвращается назад; 2-opt выпрямляет путь
+        points = [(0.0, 0.2), (0.0, 0.1), (0.0, 0.6), (0.0, 0.35)]
+        sequence, length = plan_route((0.0, 0.0), points)
+        self.assertEqual(sequence, [1, 0, 3, 2])
+        self.assertAlmostEqual(length, haversine_km(0, 0, 0, 0.6), places=6)
+
+    def test_orders_are_grouped_by_route_date_and_capacity(self):
+        big = PackageSize.objects.create(name='XL', capacity_units=10)
+        first = self.create_trip_order('43.200000')
+        second = self.create_trip_order('43.210000')
+        bulky = self.create_trip_order('43.205000', package_size=big)
+        self.create_trip_order('43.220000', pickup_date=datetime.date(2025, 1, 2))
+        self.create_order(origin_city=self.astana, destination_city=self.almaty)
+
+        trips = build_trips(open_trip_orders())
+
+        self.assertEqual(len(trips), 1)
+        trip = trips[0]
+        self.assertEqual(sorted(trip.order_ids), [first.pk, second.pk])
+        self.assertNotIn(bulky.pk, trip.order_ids)
+        self.assertEqual([stop.kind for stop in trip.stops], ['pickup', 'pickup', 'delivery', 'delivery'])
+        self.assertEqual([stop.order_id for stop in trip.stops], [second.pk, first.pk, first.pk, second.pk])
+
+    def test_trip_list_for_courier_city(self):
+        first = self.create_trip_order('43.200000')
+        second = self.create_trip_order('43.210000')
+        response = self.api.get(reverse('orders_api:trip_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([sorted(trip['order_ids']) for trip in response.json()], [[first.pk, second.pk]])
+        self.assertEqual(len(response.json()[0]['stops']), 4)
+
+    def test_take_trip_assigns_all_orders(self):
+        orders = [self.create_trip_order('43.200000'), self.create_trip_order('43.210000')]
+        response = self.api.post(reverse('orders_api:trip_take'),
+                                 {'order_ids': [order.pk for order in orders]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()['stops']), 4)
+        for order in orders:
+            order.refresh_from_db()
+            self.assertEqual(order.courier_id, self.courier_profile.pk)
+            self.assertEqual(order.status, self.status_in_transit)
+        self.assertEqual(ChatSession.objects.filter(order__in=orders).count(), 2)
+
+    def test_take_trip_is_all_or_nothing(self):
+        free = self.create_trip_order('43.200000')
+        taken = self.create_trip_order('43.210000', courier=self.courier_profile, status=self.status_in_transit)
+        response = self.api.post(reverse('orders_api:trip_take'), {'order_ids': [free.pk, taken.pk]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        free.refresh_from_db()
+        self.assertIsNone(free.courier_id)
+
+        with mock.patch('orders.views.take_orders', side_effect=OrderAlreadyTaken):
+            other = self.create_trip_order('43.220000')
+            response = self.api.post(reverse('orders_api:trip_take'),
+                                     {'order_ids': [free.pk, other.pk]}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_take_incompatible_trip_returns_400(self):
+        first = self.create_trip_order('43.200000')
+        other_day = self.create_trip_order('43.210000', pickup_date=datetime.date(2025, 1, 2))
+        response = self.api.post(reverse('orders_api:trip_take'),
+                                 {'order_ids': [first.pk, other_day.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        first.refresh_from_db()
+        self.assertIsNone(first.courier_id)
+
+
+class OrderPricingTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+
+    def quote(self, origin, destination, size):
+        return self.api.get(reverse('orders_api:order_quote'), {
+            'origin_city_id': origin.pk, 'destination_city_id': destination.pk, 'package_size_id': size.pk})
+
+    def test_quote_is_served_from_memory(self):
+        self.quote(self.almaty, self.astana, self.size)
+        with self.assertNumQueries(0):
+            response = self.quote(self.almaty, self.astana, self.size)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        # ~969 км по прямой * 1.25 = 1211 км; 1000 + 25 * 1211 = 31275
+        self.assertEqual(body['distance_km'], '1211.0')
+        self.assertEqual(body['price'], '31275.00')
+
+    def test_intracity_quote_uses_base_fare(self):
+        self.assertEqual(self.quote(self.almaty, self.almaty, self.size).json()['price'], '1000.00')
+
+    def test_concurrent_invalidate_does_not_break_quote(self):
+        ensure_loaded = tariff_matrix._ensure_loaded
+
+        def load_then_invalidate():
+            data = ensure_loaded()
+            tariff_matrix.invalidate()  # Другой поток сбросил матрицу между загрузкой и поиском
+            return data
+
+        with mock.patch.object(tariff_matrix, '_ensure_loaded', side_effect=load_then_invalidate):
+            self.assertEqual(tariff_matrix.quote(self.almaty.pk, self.almaty.pk, self.size.pk), Decimal('1000'))
+            self.assertEqual(tariff_matrix.distance(self.almaty.pk, self.almaty.pk), Decimal('0'))
+
+    def test_size_multiplier_change_rebuilds_matrix(self):
+        self.quote(self.almaty, self.astana, self.size)
+        self.size.price_multiplier = Decimal('2.00')
+        self.size.save()
+        self.assertEqual(self.quote(self.almaty, self.astana, self.size).json()['price'], '62550.00')
+
+    def test_route_without_tariff_returns_404(self):
+        nowhere = City.objects.create(name='Без координат')
+        self.assertEqual(self.quote(self.almaty, nowhere, self.size).status_code, 404)
+        self.assertEqual(self.api.get(reverse('orders_api:order_quote')).status_code, 400)
+
+    def test_create_computes_and_validates_price(self):
+        self.api.force_authenticate(self.client_user)
+        payload = {
+            'package_size_id': self.size.pk, 'origin_city_id': self.almaty.pk,
+            'destination_city_id': self.astana.pk, 'pickup_address': 'ул. Абая 1',
+            'delivery_address': 'пр. Республики 2', 'pickup_date': '2025-01-01',
+            'pickup_time_slot': '10:00-12:00', 'recipient_name': 'Получатель',
+            'recipient_phone': '+77010000009',
+        }
+        url = reverse('orders_api:order_list_create')
+        response = self.api.post(url, payload)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['price'], '31275.00')
+
+        self.assertEqual(self.api.post(url, {**payload, 'price': '31275'}).status_code, 201)
+        response = self.api.post(url, {**payload, 'price': '10.00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', response.json())
+
+    def test_client_price_is_not_accepted_without_tariff(self):
+        self.api.force_authenticate(self.client_user)
+        inactive_size = PackageSize.objects.create(name='XL', is_active=False)
+        nowhere = City.objects.create(name='Без координат')
+        payload = {
+            'package_size_id': self.size.pk, 'origin_city_id': self.almaty.pk,
+            'destination_city_id': self.astana.pk, 'pickup_address': 'ул. Абая 1',
+            'delivery_address': 'пр. Республики 2', 'pickup_date': '2025-01-01',
+            'pickup_time_slot': '10:00-12:00', 'recipient_name': 'Получатель',
+            'recipient_phone': '+77010000009', 'price': '1.00',
+        }
+        url = reverse('orders_api:order_list_create')
+        response = self.api.post(url, {**payload, 'package_size_id': inactive_size.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('package_size_id', response.json())
+        # Город без координат отклоняется как город, а не как маршрут без тарифа
+        response = self.api.post(url, {**payload, 'destination_city_id': nowhere.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ['destination_city_id'])
+
+        response = self.api.post(reverse('orders_api:order_bulk_create'), [
+            {**payload, 'package_size_id': inactive_size.pk}, {**payload, 'destination_city_id': nowhere.pk},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([sorted(row['errors']) for row in response.json()['errors']],
+                         [['package_size_id'], ['destination_city_id']])
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderStatusTransitionTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+
+    def patch_status(self, user, order, new_status):
+        self.api.force_authenticate(user)
+        return self.api.patch(reverse('orders_api:order_detail_update', args=[order.pk]),
+                              {'status_id': new_status.pk}, format='json')
+
+    def test_courier_delivery_is_logged(self):
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        response = self.patch_status(self.courier_user, order, self.status_delivered)
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertIsNotNone(order.delivery_timestamp)
+        event = OrderStatusEvent.objects.get(order=order)
+        self.assertEqual((event.from_status, event.to_status, event.actor_id),
+                         (self.status_in_transit, self.status_delivered, self.courier_user.pk))
+
+    def test_transitions_outside_table_are_rejected(self):
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        self.assertEqual(self.patch_status(self.courier_user, order, self.status_processing).status_code, 400)
+        # Заказ в пути клиент отменить уже не может
+        self.assertEqual(self.patch_status(self.client_user, order, self.status_cancelled).status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, self.status_in_transit)
+        self.assertFalse(OrderStatusEvent.objects.exists())
+
+    def test_status_change_conflicts_with_concurrent_take(self):
+        order = self.create_order()
+        real_check = check_transition
+
+        def take_in_between(*args):
+            # Курьер берет заказ между чтением заказа и сменой статуса клиентом
+            take_order(order.pk, self.courier_profile.pk, actor_id=self.courier_user.pk)
+            return real_check(*args)
+
+        with mock.patch('orders.views.check_transition', side_effect=take_in_between):
+            response = self.patch_status(self.client_user, order, self.status_cancelled)
+        self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.courier_id), (self.status_in_transit, self.courier_profile.pk))
+        self.assertEqual(list(OrderStatusEvent.objects.filter(order=order).values_list('to_status', flat=True)),
+                         [self.status_in_transit.pk])
+
+    def test_courier_cannot_change_price_or_route(self):
+        order = self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+        other_size = PackageSize.objects.create(name='XL')
+        self.api.force_authenticate(self.courier_user)
+        response = self.api.patch(reverse('orders_api:order_detail_update', args=[order.pk]), {
+            'status_id': self.status_delivered.pk, 'price': '1.00', 'origin_city_id': self.astana.pk,
+            'destination_city_id': self.almaty.pk, 'package_size_id': other_size.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        changed = Order.objects.get(pk=order.pk)
+        self.assertEqual(changed.status, self.status_delivered)
+        self.assertEqual((changed.price, changed.origin_city_id, changed.destination_city_id, changed.package_size_id),
+                         (order.price, order.origin_city_id, order.destination_city_id, order.package_size_id))
+
+    def test_take_and_create_are_logged(self):
+        order = self.create_order()
+        take_order(order.pk, self.courier_profile.pk, actor_id=self.courier_user.pk)
+        event = OrderStatusEvent.objects.get(order=order)
+        self.assertEqual((event.from_status, event.to_status), (self.status_processing, self.status_in_transit))
+
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post(reverse('orders_api:order_list_create'), {
+            'package_size_id': self.size.pk, 'origin_city_id': self.almaty.pk,
+            'destination_city_id': self.astana.pk, 'pickup_address': 'ул. Абая 1',
+            'delivery_address': 'пр. Республики 2', 'pickup_date': '2025-01-01',
+            'pickup_time_slot': '10:00-12:00', 'recipient_name': 'Получатель',
+            'recipient_phone': '+77010000009',
+        })
+        event = OrderStatusEvent.objects.get(order_id=response.json()['id'])
+        self.assertEqual((event.from_status, event.to_status), (None, self.status_processing))
+
+    def test_events_are_append_only(self):
+        order = self.create_order()
+        event = OrderStatusEvent.objects.create(order=order, to_status=self.status_processing)
+        event.comment = 'изменено'
+        with self.assertRaises(ValueError):
+            event.save()
+
+    def test_latest_status_per_order_and_time_range(self):
+        first, second = self.create_order(), self.create_order()
+        now = timezone.now()
+        for minutes, order, to_status in [(3, first, self.status_processing), (2, first, self.status_in_transit),
+                                          (1, second, self.status_processing)]:
+            OrderStatusEvent.objects.create(order=order, to_status=to_status,
+                                            created_at=now - datetime.timedelta(minutes=minutes))
+        latest = dict(OrderStatusEvent.objects.latest_per_order().values_list('order_id', 'to_status_id'))
+        self.assertEqual(latest, {first.pk: self.status_in_transit.pk, second.pk: self.status_processing.pk})
+        recent = OrderStatusEvent.objects.between(now - datetime.timedelta(minutes=2, seconds=30), now)
+        self.assertEqual(recent.count(), 2)
+        self.assertUsesIndex(OrderStatusEvent.objects.filter(order=first).order_by('-created_at', '-id')[:1],
+                             'order_status_event_order_idx')
+        self.assertUsesIndex(recent.order_by('created_at'), 'order_status_event_time_idx')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class OrderTrackingTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.api = APIClient()
+        self.order = self.create_order()
+        self.url = reverse('orders_api:order_tracking', args=[self.order.unique_order_id])
+
+    def test_tracking_is_cached_with_etag(self):
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['status']['code'], OrderStatus.CODE_PROCESSING)
+        self.assertEqual((body['origin_city'], body['destination_city']), ('Алматы', 'Астана'))
+        self.assertNotIn('recipient_phone', body)
+
+        with self.assertNumQueries(0):
+            cached = self.api.get(self.url)
+            not_modified = self.api.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.json(), body)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_status_change_invalidates_tracking(self):
+        etag = self.api.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            take_order(self.order.pk, self.courier_profile.pk)
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['status']['code'], OrderStatus.CODE_IN_TRANSIT)
+        self.assertEqual([event['code'] for event in body['history']], [OrderStatus.CODE_IN_TRANSIT])
+        self.assertIsNotNone(body['pickup_timestamp'])
+
+    def test_unknown_order_is_cached_miss(self):
+        url = reverse('orders_api:order_tracking', args=['A' * ORDER_ID_LENGTH])
+        self.assertEqual(self.api.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.api.get(url).status_code, 404)
+            self.assertEqual(self.api.get(reverse('orders_api:order_tracking', args=['bad'])).status_code, 404)
+
+
+class OrderTakeTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.courier_user)
+
+    def test_courier_takes_order_and_chat_is_created(self):
+        order = self.create_order()
+        response = self.api.post(reverse('orders_api:order_take', args=[order.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status']['code'], OrderStatus.CODE_IN_TRANSIT)
+        order.refresh_from_db()
+        self.assertEqual(order.courier, self.courier_profile)
+        self.assertEqual(order.status, self.status_in_transit)
+        self.assertIsNotNone(order.pickup_timestamp)
+        self.assertTrue(ChatSession.objects.filter(order=order).exists())
+
+    def test_second_courier_gets_conflict(self):
+        order = self.create_order()
+        other_user = User.objects.create_user('+77010000003', 'pass', role=User.ROLE_COURIER)
+        other_profile = self.create_courier(other_user, '000000000003')
+        take_order(order.pk, other_profile.pk)
+
+        response = self.api.post(reverse('orders_api:order_take', args=[order.pk]))
+        self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.assertEqual(order.courier, other_profile)
+
+    def test_missing_order_returns_404(self):
+        response = self.api.post(reverse('orders_api:order_take', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_client_cannot_take_order(self):
+        order = self.create_order()
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post(reverse('orders_api:order_take', args=[order.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderTakeConcurrencyTests(OrderTestMixin, TransactionTestCase):
+    couriers_count = 8
+
+    def setUp(self):
+        type(self).setUpTestData()
+        super().setUp()
+        self.couriers = [
+            self.create_courier(
+                User.objects.create_user(f'+7702000000{i}', role=User.ROLE_COURIER),
+                f'10000000000{i}',
+            )
+            for i in range(self.couriers_count)
+        ]
+
+    def test_exactly_one_courier_wins_parallel_claims(self):
+        order = self.create_order()
+        barrier = threading.Barrier(self.couriers_count)
+        results = []
+
+        def claim(courier):
+            try:
+                barrier.wait()
+                for _ in range(1000):
+                    try:
+                        take_order(order.pk, courier.pk)
+                        results.append(courier.pk)
+                        return
+                    except OrderAlreadyTaken:
+                        results.append(None)
+                        return
+                    except OperationalError:
+                        # SQLite блокирует таблицу целиком, повторяем попытку
+                        continue
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim, args=(courier,)) for courier in self.couriers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [pk for pk in results if pk is not None]
+        self.assertEqual(len(results), self.couriers_count)
+        self.assertEqual(len(winners), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.courier_id, winners[0])
+        self.assertEqual(ChatSession.objects.filter(order=order).count(), 1)
+
+
+class OrderIdGenerationTests(OrderTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        type(self).setUpTestData()
+        super().setUp()
+
+    def test_order_insert_needs_no_uniqueness_select(self):
+        with self.assertNumQueries(1):
+            order = self.create_order()
+        self.assertEqual(len(order.unique_order_id), ORDER_ID_LENGTH)
+        self.assertTrue(order.unique_order_id.isalnum())
+
+    def test_collision_is_retried_with_new_id(self):
+        existing = self.create_order()
+        with mock.patch('orders.models.generate_unique_order_id', return_value='NEWORDERID12'):
+            order = self.create_order(unique_order_id=existing.unique_order_id)
+        self.assertEqual(order.unique_order_id, 'NEWORDERID12')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_collision_is_retried_inside_callers_transaction(self):
+        existing = self.create_order()
+        with transaction.atomic():
+            with mock.patch('orders.models.generate_unique_order_id', return_value='NEWORDERID12'):
+                order = self.create_order(unique_order_id=existing.unique_order_id)
+            # Транзакция вызывающего кода не прервана ошибкой INSERT
+            self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(order.unique_order_id, 'NEWORDERID12')
+
+    def test_api_create_retries_collision(self):
+        existing = self.create_order()
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        with mock.patch('orders.models.get_random_string', side_effect=[existing.unique_order_id, 'NEWORDERID12']):
+            response = api.post(reverse('orders_api:order_list_create'), {
+                'package_size_id': self.size.pk, 'origin_city_id': self.almaty.pk,
+                'destination_city_id': self.astana.pk, 'pickup_address': 'ул. Абая 1',
+                'delivery_address': 'пр. Республики 2', 'pickup_date': '2025-01-01',
+                'pickup_time_slot': '10:00-12:00', 'recipient_name': 'Получатель',
+                'recipient_phone': '+77010000009',
+            })
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['unique_order_id'], 'NEWORDERID12')
+        self.assertEqual(OrderStatusEvent.objects.filter(order_id=response.json()['id']).count(), 1)
+
+
+class OrderIndexPlanTests(OrderTestMixin, TestCase):
+    """Основные списки заказов должны читаться по индексам, а не полным сканированием."""
+
+    def setUp(self):
+        super().setUp()
+        for _ in range(3):
+            self.create_order()
+            self.create_order(courier=self.courier_profile, status=self.status_in_transit)
+
+    def page(self, queryset):
+        return queryset.order_by('-created_at', '-id')[:51]
+
+    def test_client_orders_use_client_index(self):
+        self.assertUsesIndex(
+            self.page(Order.objects.filter(client=self.client_profile)), 'order_client_created_idx')
+
+    def test_courier_orders_use_courier_index(self):
+        self.assertUsesIndex(
+            self.page(Order.objects.filter(courier=self.courier_profile)), 'order_courier_created_idx')
+
+    def test_available_feed_uses_partial_index(self):
+        queryset = Order.objects.filter(courier__isnull=True, status=self.status_processing)
+        self.assertUsesIndex(self.page(queryset), 'order_available_idx')
+
+    def test_nearby_feed_uses_geohash_index(self):
+        queryset = Order.objects.filter(
+            courier__isnull=True, status=self.status_processing,
+            pickup_geohash__in=geohash_cells_within(43.24, 76.89, 15),
+        ).order_by().values_list('pk', 'created_at', 'origin_city__center_latitude', 'origin_city__center_longitude')
+        self.assertUsesIndex(queryset, 'order_available_geo_idx')
+
+    def test_staff_list_uses_created_index(self):
+        self.assertUsesIndex(self.page(Order.objects.all()), 'order_created_idx')
+
+
+class OrderBulkCreateTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+        self.url = reverse('orders_api:order_bulk_create')
+
+    def row(self, **overrides):
+        return {
+            'package_size_id': self.size.pk, 'origin_city_id': self.almaty.pk,
+            'destination_city_id': self.astana.pk, 'pickup_address': 'ул. Абая 1',
+            'delivery_address': 'пр. Республики 2', 'pickup_date': '2025-01-01',
+            'pickup_time_slot': '10:00-12:00', 'recipient_name': 'Получатель',
+            'recipient_phone': '+77010000009', **overrides,
+        }
+
+    def post_rows(self, count):
+        rows = [self.row(pickup_address=f'ул. Абая {number}') for number in range(count)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response, len(ctx.captured_queries)
+
+    def test_bulk_create_uses_constant_queries(self):
+        self.post_rows(1)  # Реестр статусов и матрица тарифов загружаются при первом запросе
+        response, few_queries = self.post_rows(2)
+        _, many_queries = self.post_rows(30)
+        self.assertEqual(few_queries, many_queries)
+
+        body = response.json()
+        self.assertEqual(body['created'], 2)
+        self.assertEqual(body['orders'][0]['price'], '31275.00')
+        order = Order.objects.get(pk=body['orders'][0]['id'])
+        self.assertEqual(order.unique_order_id, body['orders'][0]['unique_order_id'])
+        self.assertEqual((order.sender_name_snapshot, order.sender_phone_snapshot), ('Клиент', '+77010000001'))
+        self.assertEqual(order.status, self.status_processing)
+        self.assertIsNotNone(order.pickup_latitude)
+        self.assertEqual(order.pickup_geohash, geohash_encode(order.pickup_latitude, order.pickup_longitude))
+        self.assertEqual(OrderStatusEvent.objects.filter(order__client=self.client_profile).count(), 33)
+
+    def test_csv_upload(self):
+        row = self.row(comment='')
+        csv_body = '﻿' + ','.join(row) + '\r\n' + ','.join(str(value) for value in row.values()) + '\r\n'
+        response = self.api.post(self.url, csv_body.encode('utf-8'), content_type='text/csv')
+        self.assertEqual(response.status_code, 201, response.content)
+        order = Order.objects.get(pk=response.json()['orders'][0]['id'])
+        self.assertEqual((order.pickup_address, order.comment), ('ул. Абая 1', None))
+
+        broken = self.api.post(self.url, 'pickup_address\r\nа,б\r\n'.encode('utf-8'), content_type='text/csv')
+        self.assertEqual(broken.status_code, 400)
+
+    def test_benchmark_command_creates_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark_order_creation', '--count', '3', stdout=out)
+        self.assertEqual([line.split(':')[0].strip() for line in out.getvalue().splitlines()],
+                         ['legacy', 'current', 'bulk'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_csv_upload_stops_after_row_limit(self):
+        row = self.row()
+        header = ','.join(row) + '\r\n'
+        line = ','.join(str(value) for value in row.values()) + '\r\n'
+        # Хвост после лимита не читается: иначе ответом была бы ошибка кодировки
+        body = (header + line * 50).encode('utf-8') + b'\xff\xfe' * 1000
+        with mock.patch('orders.views.BulkOrderCSVParser.max_rows', 2):
+            response = self.api.post(self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'В файле больше 2 строк.')
+        self.assertFalse(Order.objects.exists())
+
+    def test_row_errors_create_nothing(self):
+        rows = [
+            self.row(),
+            self.row(pickup_date='не дата'),
+            self.row(origin_city_id=999999),
+            self.row(price='10.00'),
+        ]
+        response = self.api.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error['row'] for error in errors], [2, 3, 4])
+        self.assertIn('pickup_date', errors[0]['errors'])
+        self.assertIn('origin_city_id', errors[1]['errors'])
+        self.assertIn('price', errors[2]['errors'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_bad_payloads(self):
+        self.assertEqual(self.api.post(self.url, [], format='json').status_code, 400)
+        self.assertEqual(self.api.post(self.url, {'orders': []}, format='json').status_code, 400)
+        self.api.force_authenticate(self.courier_user)
+        self.assertEqual(self.api.post(self.url, [self.row()], format='json').status_code, 403)
+
+
+class OrderExportTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.staff_user = User.objects.create_user('+77010000099', 'pass', is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff_user)
+        self.url = reverse('orders_api:order_export')
+        self.first = self.create_order(recipient_name='Иванов, "Иван"')
+        self.second = self.create_order(destination_city=self.almaty, status=self.status_cancelled)
+
+    def export(self, **params):
+        response = self.api.get(self.url, params)
+        self.assertEqual(response.status_code, 200, getattr(response, 'content', b''))
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export_streams_all_orders_in_one_query(self):
+        self.export()  # Роль пользователя определяется при первом запросе
+        with self.assertNumQueries(1):
+            body = self.export()
+        self.assertTrue(body.startswith('\ufeff'))
+        rows = list(csv.DictReader(StringIO(body[1:])))
+        self.assertEqual([row['id'] for row in rows], [str(self.first.pk), str(self.second.pk)])
+        self.assertEqual(rows[0]['recipient_name'], 'Иванов, "Иван"')
+        self.assertEqual((rows[0]['origin_city'], rows[0]['destination_city']), ('Алматы', 'Астана'))
+        self.assertEqual(rows[0]['courier_name'], '')
+
+    def test_csv_cells_are_not_formulas(self):
+        Order.objects.filter(pk=self.first.pk).update(comment='=HYPERLINK("http://evil")', pickup_address='@SUM(1)',
+                                                      delivery_address='-1', recipient_name='+SUM(1)')
+        rows = list(csv.DictReader(StringIO(self.export()[1:])))
+        self.assertEqual((rows[0]['comment'], rows[0]['pickup_address'], rows[0]['recipient_name']),
+                         ('\'=HYPERLINK("http://evil")', "'@SUM(1)", "'+SUM(1)"))
+        # Телефоны и числа со знаком выгружаются как есть
+        self.assertTrue(self.first.recipient_phone.startswith('+'))
+        self.assertEqual(rows[0]['recipient_phone'], self.first.recipient_phone)
+        self.assertEqual(rows[0]['delivery_address'], '-1')
+        # В JSONL формул нет: значения отдаются как есть
+        line = json.loads(self.export(file_format='jsonl').splitlines()[0])
+        self.assertEqual(line['comment'], '=HYPERLINK("http://evil")')
+
+    def test_jsonl_export_with_filters(self):
+        lines = self.export(file_format='jsonl', status=OrderStatus.CODE_CANCELLED).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.second.pk])
+
+        self.assertEqual(len(self.export(file_format='jsonl', city_id=self.astana.pk).splitlines()), 1)
+        today = timezone.localdate()
+        self.assertEqual(len(self.export(file_format='jsonl', date_from=today, date_to=today).splitlines()), 2)
+        tomorrow = today + datetime.timedelta(days=1)
+        self.assertEqual(self.export(file_format='jsonl', date_from=tomorrow), '')
+
+    def test_export_requires_staff(self):
+        self.assertEqual(self.api.get(self.url, {'file_format': 'xml'}).status_code, 400)
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.get(self.url).status_code, 403)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_orders', '--file-format', 'jsonl', '--chunk-size', '1', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
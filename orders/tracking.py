@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from core.caching import make_cache_entry
+from .models import Order, OrderStatusEvent
+from .serializers import OrderTrackingSerializer
+
+# Смены статуса сбрасывают запись сразу; TTL ограничивает жизнь переименований статусов и городов
+TRACKING_CACHE_TIMEOUT = 60 * 60
+# Неизвестные номера тоже кэшируются, чтобы перебор номеров не доходил до БД
+TRACKING_MISS_TIMEOUT = 60
+TRACKING_MISS = 'missing'
+
+
+def tracking_cache_key(unique_order_id):
+    return f'tracking:{unique_order_id}'
+
+
+def build_tracking_data(unique_order_id):
+    """Компактная проекция заказа для публичного отслеживания или None, если заказа нет."""
+    order = (Order.objects.select_related('status', 'origin_city', 'destination_city')
+             .only('pk', 'unique_order_id', 'pickup_date', 'pickup_timestamp', 'delivery_timestamp', 'created_at',
+                   'status__code', 'status__name', 'origin_city__name', 'destination_city__name')
+             .filter(unique_order_id=unique_order_id).first())
+    if order is None:
+        return None
+    history = OrderStatusEvent.objects.filter(order_id=order.pk).order_by('created_at', 'id').values_list(
+        'to_status__code', 'to_status__name', 'created_at')
+    return OrderTrackingSerializer({
+        'unique_order_id': order.unique_order_id,
+        'status': {'code': order.status.code, 'name': order.status.name},
+        'origin_city': order.origin_city.name,
+        'destination_city': order.destination_city.name,
+        'pickup_date': order.pickup_date,
+        'created_at': order.created_at,
+        'pickup_timestamp': order.pickup_timestamp,
+        'delivery_timestamp': order.delivery_timestamp,
+        'history': [{'code': code, 'name': name, 'at': at} for code, name, at in history],
+    }).data
+
+
+def get_tracking_entry(unique_order_id):
+    """
+    Запись кэша отслеживания (данные, ETag, время изменения) или None.
+
+    Повторные запросы, в том числе по несуществующим номерам, обслуживаются
+    из кэша без обращения к БД; запись сбрасывает invalidate_tracking.
+    """
+    key = tracking_cache_key(unique_order_id)
+    entry = cache.get(key)
+    if entry is None:
+        data = build_tracking_data(unique_order_id)
+        if data is None:
+            cache.set(key, TRACKING_MISS, TRACKING_MISS_TIMEOUT)
+            return None
+        entry = make_cache_entry(data)
+        cache.set(key, entry, TRACKING_CACHE_TIMEOUT)
+    return None if entry == TRACKING_MISS else entry
+
+
+def invalidate_tracking_keys(unique_order_ids):
+    unique_order_ids = list(unique_order_ids)
+    transaction.on_commit(lambda: cache.delete_many([tracking_cache_key(uid) for uid in unique_order_ids]))
+
+
+def invalidate_tracking(order_ids):
+    """
+    Сбрасывает кэш отслеживания заказов после фиксации текущей транзакции:
+    иначе параллельный запрос мог бы закэшировать данные до коммита.
+    """
+    order_ids = list(order_ids)
+
+    def delete_entries():
+        unique_ids = Order.objects.filter(pk__in=order_ids).values_list('unique_order_id', flat=True)
+        cache.delete_many([tracking_cache_key(unique_id) for unique_id in unique_ids])
+
+    transaction.on_commit(delete_entries)
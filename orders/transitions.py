@@ -0,0 +1,75 @@
+from django.utils import timezone
+
+from couriers.availability import refresh_capacity_for_orders
+from notifications.outbox import enqueue_order_events
+from .models import OrderStatus, OrderStatusEvent
+from .tracking import invalidate_tracking
+
+ROLE_CLIENT = 'client'
+ROLE_COURIER = 'courier'
+ROLE_STAFF = 'staff'
+ROLE_SYSTEM = 'system'  # Автоматические действия, например диспетчер
+
+# Разрешенные переходы: код текущего статуса -> {код нового статуса: роли, которым переход доступен}
+STATUS_TRANSITIONS = {
+    OrderStatus.CODE_PROCESSING: {
+        OrderStatus.CODE_IN_TRANSIT: {ROLE_COURIER, ROLE_STAFF, ROLE_SYSTEM},
+        OrderStatus.CODE_CANCELLED: {ROLE_CLIENT, ROLE_STAFF},
+    },
+    OrderStatus.CODE_IN_TRANSIT: {
+        OrderStatus.CODE_DELIVERED: {ROLE_COURIER, ROLE_STAFF},
+        OrderStatus.CODE_CANCELLED: {ROLE_STAFF},
+    },
+    OrderStatus.CODE_DELIVERED: {},
+    OrderStatus.CODE_CANCELLED: {},
+}
+
+
+class InvalidTransition(Exception):
+    """Переход между статусами не разрешен для этой роли."""
+
+
+def role_for(actor):
+    """Роль для таблицы переходов по users.actor.Actor."""
+    if actor.is_staff:
+        return ROLE_STAFF
+    if actor.is_courier:
+        return ROLE_COURIER
+    if actor.is_client:
+        return ROLE_CLIENT
+    return None
+
+
+def check_transition(from_status, to_status, role):
+    """Бросает InvalidTransition, если переход from_status -> to_status недоступен роли."""
+    allowed_roles = STATUS_TRANSITIONS.get(from_status.code, {}).get(to_status.code, set())
+    if role not in allowed_roles:
+        raise InvalidTransition(
+            f"Смена статуса «{from_status.name}» на «{to_status.name}» недоступна."
+        )
+
+
+def record_status_events(order_ids, from_status, to_status, actor_id=None, comment='', at=None):
+    """
+    Добавляет в журнал смену статуса для нескольких заказов одним INSERT,
+    пишет события push-уведомлений (notifications/outbox.py) и сбрасывает
+    кэш отслеживания. Если заказы попадают в путь или покидают его, после
+    коммита пересчитываются свободные места их курьеров.
+    Вызывается внутри транзакции, которая меняет сам статус.
+    """
+    at = at or timezone.now()
+    OrderStatusEvent.objects.bulk_create([
+        OrderStatusEvent(
+            order_id=order_id, from_status=from_status, to_status=to_status,
+            actor_id=actor_id, comment=comment, created_at=at,
+        )
+        for order_id in order_ids
+    ])
+    enqueue_order_events(order_ids, to_status, actor_id)
+    invalidate_tracking(order_ids)
+    if any(status is not None and status.code == OrderStatus.CODE_IN_TRANSIT for status in (from_status, to_status)):
+        refresh_capacity_for_orders(order_ids)
+
+
+def record_status_event(order_id, from_status, to_status, actor_id=None, comment='', at=None):
+    record_status_events([order_id], from_status, to_status, actor_id, comment, at)
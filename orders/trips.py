@@ -0,0 +1,239 @@
+"""
+Объединение открытых заказов в рейсы для курьеров, везущих несколько посылок.
+
+Совместимые заказы - это одинаковые город отправки, город доставки и дата
+забора; суммарный объем посылок (PackageSize.capacity_units) не превышает
+вместимость рейса. Порядок остановок строится эвристикой "ближайший сосед"
+с улучшением 2-opt: сначала все заборы (из центра города отправки), затем
+все доставки от последней точки забора. Так каждый заказ забирается раньше,
+чем доставляется, а маршрут внутри каждого города короткий.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from core.geo import haversine_km
+from .models import Order, OrderStatus
+from .statuses import status_registry
+
+TRIP_MAX_ORDERS = 8
+TRIP_CAPACITY_UNITS = 10
+# Сколько открытых заказов рассматривается при построении рейсов за один запрос
+TRIP_CANDIDATE_LIMIT = 500
+
+
+class IncompatibleTrip(Exception):
+    """Заказы нельзя объединить в один рейс."""
+
+
+@dataclass(frozen=True)
+class TripOrder:
+    id: int
+    origin_city_id: int
+    destination_city_id: int
+    pickup_date: object
+    created_at: object
+    pickup_address: str
+    delivery_address: str
+    pickup_point: tuple
+    delivery_point: tuple
+    capacity_units: int
+    origin_center: tuple
+
+    @property
+    def trip_key(self):
+        return self.origin_city_id, self.destination_city_id, self.pickup_date
+
+
+@dataclass
+class TripStop:
+    order_id: int
+    kind: str  # 'pickup' или 'delivery'
+    address: str
+    latitude: float
+    longitude: float
+
+
+@dataclass
+class Trip:
+    orders: list
+    stops: list = field(default_factory=list)
+    distance_km: float = 0.0
+
+    @property
+    def order_ids(self):
+        return [order.id for order in self.orders]
+
+    @property
+    def capacity_units(self):
+        return sum(order.capacity_units for order in self.orders)
+
+    @property
+    def origin_city_id(self):
+        return self.orders[0].origin_city_id
+
+    @property
+    def destination_city_id(self):
+        return self.orders[0].destination_city_id
+
+    @property
+    def pickup_date(self):
+        return self.orders[0].pickup_date
+
+
+def load_trip_orders(queryset, limit=None):
+    """Читает из queryset заказов (старые первыми) только поля, нужные для планирования рейсов."""
+    rows = queryset.order_by('created_at', 'pk').values_list(
+        'pk', 'origin_city_id', 'destination_city_id', 'pickup_date', 'created_at',
+        'pickup_address', 'delivery_address',
+        Coalesce('pickup_latitude', 'origin_city__center_latitude'),
+        Coalesce('pickup_longitude', 'origin_city__center_longitude'),
+        Coalesce('delivery_latitude', 'destination_city__center_latitude'),
+        Coalesce('delivery_longitude', 'destination_city__center_longitude'),
+        Coalesce('package_size__capacity_units', Value(1)),
+        'origin_city__center_latitude', 'origin_city__center_longitude',
+    )[:limit]
+    orders = []
+    for (pk, origin_id, destination_id, pickup_date, created_at, pickup_address, delivery_address,
+         pickup_lat, pickup_lon, delivery_lat, delivery_lon, units, center_lat, center_lon) in rows:
+        if None in (pickup_lat, pickup_lon, delivery_lat, delivery_lon):
+            continue  # Без координат маршрут не построить
+        pickup_point = (float(pickup_lat), float(pickup_lon))
+        orders.append(TripOrder(
+            id=pk, origin_city_id=origin_id, destination_city_id=destination_id,
+            pickup_date=pickup_date, created_at=created_at,
+            pickup_address=pickup_address, delivery_address=delivery_address,
+            pickup_point=pickup_point, delivery_point=(float(delivery_lat), float(delivery_lon)),
+            capacity_units=units,
+            origin_center=(float(center_lat), float(center_lon)) if center_lat is not None else pickup_point,
+        ))
+    return orders
+
+
+def open_trip_orders(**filters):
+    processing = status_registry.get(OrderStatus.CODE_PROCESSING)
+    queryset = Order.objects.filter(courier__isnull=True, status=processing, **filters)
+    return load_trip_orders(queryset, limit=TRIP_CANDIDATE_LIMIT)
+
+
+def path_length(start, points, sequence):
+    length = 0.0
+    current = start
+    for index in sequence:
+        length += haversine_km(*current, *points[index])
+        current = points[index]
+    return length
+
+
+def nearest_neighbour(start, points):
+    """Жадный маршрут: из текущей точки всегда в ближайшую непосещенную."""
+    remaining = list(range(len(points)))
+    sequence = []
+    current = start
+    while remaining:
+        # При равных расстояниях берется меньший индекс - порядок детерминирован
+        nearest = min(remaining, key=lambda index: (haversine_km(*current, *points[index]), index))
+        remaining.remove(nearest)
+        sequence.append(nearest)
+        current = points[nearest]
+    return sequence
+
+
+def two_opt(start, points, sequence):
+    """
+    Улучшает открытый маршрут (без возврата в start) разворотами отрезков,
+    пока разворот хотя бы одного отрезка сокращает путь.
+    """
+    nodes = [start] + [points[index] for index in sequence]
+
+    def dist(a, b):
+        return haversine_km(*nodes[a], *nodes[b])
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(nodes) - 2):
+            for j in range(i + 2, len(nodes)):
+                # Разворот nodes[i+1..j]: ребра (i, i+1) и (j, j+1) заменяются на (i, j) и (i+1, j+1)
+                before = dist(i, i + 1)
+                after = dist(i, j)
+                if j + 1 < len(nodes):
+                    before += dist(j, j + 1)
+                    after += dist(i + 1, j + 1)
+                if after < before - 1e-9:
+                    nodes[i + 1:j + 1] = reversed(nodes[i + 1:j + 1])
+                    sequence[i:j] = reversed(sequence[i:j])
+                    improved = True
+    return sequence
+
+
+def plan_route(start, points):
+    """Порядок обхода точек из start: ближайший сосед + 2-opt. Возвращает (порядок, длина, км)."""
+    sequence = two_opt(start, points, nearest_neighbour(start, points))
+    return sequence, path_length(start, points, sequence)
+
+
+def plan_trip(orders):
+    """Строит маршрут рейса: заборы из центра города отправки, затем доставки."""
+    trip = Trip(orders=list(orders))
+    start = trip.orders[0].origin_center
+
+    pickups = [order.pickup_point for order in trip.orders]
+    pickup_sequence, pickup_km = plan_route(start, pickups)
+    last_pickup = pickups[pickup_sequence[-1]]
+    deliveries = [order.delivery_point for order in trip.orders]
+    delivery_sequence, delivery_km = plan_route(last_pickup, deliveries)
+
+    for kind, sequence, points in (('pickup', pickup_sequence, pickups),
+                                   ('delivery', delivery_sequence, deliveries)):
+        for index in sequence:
+            order = trip.orders[index]
+            address = order.pickup_address if kind == 'pickup' else order.delivery_address
+            trip.stops.append(TripStop(order.id, kind, address, *points[index]))
+    trip.distance_km = round(pickup_km + delivery_km, 3)
+    return trip
+
+
+def validate_trip(orders, capacity_units=TRIP_CAPACITY_UNITS, max_orders=TRIP_MAX_ORDERS):
+    if len(orders) > max_orders:
+        raise IncompatibleTrip(f'В рейсе может быть не больше {max_orders} заказов.')
+    if len({order.trip_key for order in orders}) > 1:
+        raise IncompatibleTrip('Заказы рейса должны иметь одинаковые города и дату забора.')
+    if sum(order.capacity_units for order in orders) > capacity_units:
+        raise IncompatibleTrip(f'Суммарный объем посылок превышает вместимость рейса ({capacity_units}).')
+
+
+def build_trips(orders, capacity_units=TRIP_CAPACITY_UNITS, max_orders=TRIP_MAX_ORDERS, min_orders=2):
+    """
+    Группирует заказы в рейсы. Внутри группы совместимых заказов самый старый
+    заказ открывает рейс, к нему добавляются ближайшие по точке забора заказы,
+    пока позволяют вместимость и лимит заказов. Рейсы короче min_orders
+    не возвращаются: такой заказ курьер берет обычным способом.
+    """
+    groups = defaultdict(list)
+    for order in orders:
+        groups[order.trip_key].append(order)
+
+    trips = []
+    for group in groups.values():
+        remaining = sorted(group, key=lambda order: (order.created_at, order.id))
+        while remaining:
+            seed = remaining.pop(0)
+            members = [seed]
+            units = seed.capacity_units
+            by_distance = sorted(remaining, key=lambda order: (
+                haversine_km(*seed.pickup_point, *order.pickup_point), order.created_at, order.id))
+            for order in by_distance:
+                if len(members) == max_orders:
+                    break
+                if units + order.capacity_units <= capacity_units:
+                    members.append(order)
+                    units += order.capacity_units
+            if len(members) < min_orders:
+                continue
+            taken = {order.id for order in members}
+            remaining = [order for order in remaining if order.id not in taken]
+            trips.append(plan_trip(members))
+    return trips
@@ -3,8 +3,15 @@ from django.urls import path
 from .views import (
     OrderStatusListAPIView,
     OrderListCreateAPIView,
+    OrderBulkCreateAPIView,
+    OrderExportAPIView,
     OrderDetailAPIView,
-    AvailableOrderListAPIView # <--- Импортируем новое представление
+    AvailableOrderListAPIView, # <--- Импортируем новое представление
+    OrderTakeAPIView,
+    OrderQuoteAPIView,
+    OrderTrackingAPIView,
+    TripListAPIView,
+    TripTakeAPIView,
 )
 
 app_name = 'orders_api'
@@ -12,6 +19,13 @@ app_name = 'orders_api'
 urlpatterns = [
     path('statuses/', OrderStatusListAPIView.as_view(), name='orderstatus_list'),
     path('', OrderListCreateAPIView.as_view(), name='order_list_create'),
+    path('bulk/', OrderBulkCreateAPIView.as_view(), name='order_bulk_create'),
+    path('export/', OrderExportAPIView.as_view(), name='order_export'),
+    path('quote/', OrderQuoteAPIView.as_view(), name='order_quote'),
+    path('track/<str:unique_order_id>/', OrderTrackingAPIView.as_view(), name='order_tracking'),
     path('available/', AvailableOrderListAPIView.as_view(), name='available_order_list'), # <--- НОВЫЙ ПУТЬ
     path('<int:pk>/', OrderDetailAPIView.as_view(), name='order_detail_update'),
+    path('<int:pk>/take/', OrderTakeAPIView.as_view(), name='order_take'),
+    path('trips/', TripListAPIView.as_view(), name='trip_list'),
+    path('trips/take/', TripTakeAPIView.as_view(), name='trip_take'),
 ]
\ No newline at end of file
@@ -1,175 +1,343 @@
 # orders/views.py
-from rest_framework import generics, permissions, status
+from rest_framework import exceptions, generics, permissions, serializers, status
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from .models import Order, OrderStatus
-from .serializers import OrderSerializer, OrderStatusSerializer
-from users.models import User
-from chat.models import ChatSession  # <--- ДОБАВЬТЕ ЭТОТ ИМПОРТ
-
+from .bulk import BULK_MAX_ROWS, BulkOrderError, create_orders_bulk
+from .export import export_queryset, iter_export
+from .models import ORDER_ID_ALPHABET, ORDER_ID_LENGTH, Order, OrderStatus
+from .pricing import PricingError, resolve_order_price, tariff_matrix
+from .serializers import (
+    AvailableOrderSerializer, BulkOrderResultSerializer, BulkOrderRowSerializer, OrderExportFilterSerializer, OrderQuoteSerializer, OrderSerializer, OrderStatusSerializer,
+    OrderTrackingSerializer, TripSerializer, TripTakeSerializer,
+)
+from .services import OrderAlreadyTaken, geocode_order_addresses, nearby_available_orders, take_order, take_orders
+from .statuses import status_registry
+from .transitions import InvalidTransition, check_transition, record_status_event, role_for
+from .tracking import get_tracking_entry
+from .trips import IncompatibleTrip, build_trips, load_trip_orders, open_trip_orders, plan_trip, validate_trip
+from users.actor import get_actor
+from users.models import CourierProfile
+from core.caching import CachedReferenceListMixin, conditional_response
+from core.pagination import KeysetPagination
+from core.parsers import CSVParser
+
+
+class OrderCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class NearbyOrderPagination(KeysetPagination):
+    """
+    Курсорная пагинация ленты заказов рядом с курьером. Позиция - ключ
+    сортировки последнего заказа страницы (расстояние, -время создания, -id),
+    выборку по нему делает nearby_available_orders.
+    """
 
-class OrderStatusListAPIView(generics.ListAPIView):
+    def paginate_nearby(self, request, latitude, longitude, radius_km):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        page = nearby_available_orders(latitude, longitude, radius_km, self.page_size + 1,
+                                       after=self.decode_cursor(request))
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = list(page[-1].feed_position) if self.has_next else None
+        return page
+
+    def decode_cursor(self, request):
+        values = self.load_cursor(request)
+        if values is None:
+            return None
+        try:
+            distance, created, pk = values
+            return float(distance), float(created), int(pk)
+        except (TypeError, ValueError):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+
+
+class OrderStatusConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Статус заказа уже изменился, обновите данные и повторите действие."
+    default_code = 'status_conflict'
+
+
+def take_order_response(view, order_id, courier_id):
+    """Общая обработка взятия заказа для OrderTakeAPIView и OrderDetailAPIView."""
+    try:
+        take_order(order_id, courier_id, actor_id=view.request.user.pk)
+    except OrderStatus.DoesNotExist as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    except OrderAlreadyTaken:
+        if not Order.objects.filter(pk=order_id).exists():
+            raise exceptions.NotFound("Заказ не найден.")
+        return Response(
+            {"detail": "Заказ уже взят другим курьером или недоступен."},
+            status=status.HTTP_409_CONFLICT
+        )
+    order = Order.objects.with_related().get(pk=order_id)
+    return Response(view.get_serializer(order).data)
+
+
+class OrderStatusListAPIView(CachedReferenceListMixin, generics.ListAPIView):
     queryset = OrderStatus.objects.all().order_by('order_index')
     serializer_class = OrderStatusSerializer
     permission_classes = [permissions.AllowAny]
+    reference_cache_name = 'order_statuses'
+
+
+class OrderQuoteAPIView(generics.GenericAPIView):
+    """
+        Стоимость доставки по тарифу: ?origin_city_id=&destination_city_id=&package_size_id=
+
+        Цена берется из предрасчитанной матрицы тарифов в памяти процесса,
+        без обращения к БД. Эту же цену проверяет создание заказа.
+    """
+    serializer_class = OrderQuoteSerializer
+    permission_classes = [permissions.AllowAny]
+    # Калькулятор публичный, токен не нужен: не тратим время на аутентификацию
+    authentication_classes = []
+
+    def get(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        route = serializer.validated_data
+        price = tariff_matrix.quote(route['origin_city_id'], route['destination_city_id'], route['package_size_id'])
+        if price is None:
+            raise exceptions.NotFound("Для этого маршрута и размера посылки нет тарифа.")
+        return Response(self.get_serializer({
+            **route,
+            'distance_km': tariff_matrix.distance(route['origin_city_id'], route['destination_city_id']),
+            'price': price,
+        }).data)
+
+
+class OrderTrackingAPIView(generics.GenericAPIView):
+    """
+        Публичное отслеживание заказа по его 12-символьному номеру.
+
+        Возвращает компактную проекцию (статус, города, временные метки,
+        история статусов). Ответ кэшируется и сбрасывается при смене статуса;
+        поддерживаются ETag / If-None-Match (304 Not Modified).
+    """
+    serializer_class = OrderTrackingSerializer
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request, unique_order_id):
+        unique_order_id = unique_order_id.upper()
+        # Заведомо неверные номера не доходят ни до кэша, ни до БД
+        if len(unique_order_id) != ORDER_ID_LENGTH or not set(unique_order_id) <= set(ORDER_ID_ALPHABET):
+            raise exceptions.NotFound("Заказ не найден.")
+        entry = get_tracking_entry(unique_order_id)
+        if entry is None:
+            raise exceptions.NotFound("Заказ не найден.")
+        return conditional_response(request, entry)
 
 
 class OrderListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == User.ROLE_CLIENT and hasattr(user, 'client_profile'):
-            return Order.objects.filter(client=user.client_profile).order_by('-created_at')
-        elif user.role == User.ROLE_COURIER and hasattr(user, 'courier_profile'):
-            return Order.objects.filter(courier=user.courier_profile).order_by('-created_at')
-        elif user.is_staff:
-            return Order.objects.all().order_by('-created_at')
+        actor = get_actor(self.request.user)
+        if actor.is_client:
+            return Order.objects.with_related().filter(client_id=actor.client_id).order_by('-created_at')
+        elif actor.is_courier:
+            return Order.objects.with_related().filter(courier_id=actor.courier_id).order_by('-created_at')
+        elif actor.is_staff:
+            return Order.objects.with_related().order_by('-created_at')
         return Order.objects.none()
 
     def perform_create(self, serializer):
-        if not (self.request.user.role == User.ROLE_CLIENT and hasattr(self.request.user, 'client_profile')):
+        if not get_actor(self.request.user).is_client:
             raise serializers.ValidationError(
                 {"detail": "Только клиенты могут создавать заказы."},
                 code=status.HTTP_403_FORBIDDEN
             )
 
+        # Профиль нужен целиком: Order.save берет из него данные отправителя
         client_profile = self.request.user.client_profile
 
         try:
-            initial_status_name = "Обработка"
-            initial_status = OrderStatus.objects.get(name=initial_status_name)
+            initial_status = status_registry.get(OrderStatus.CODE_PROCESSING)
         except OrderStatus.DoesNotExist:
             raise serializers.ValidationError(
-                {"detail": f"Начальный статус заказа '{initial_status_name}' не настроен в системе."},
+                {"detail": f"Начальный статус заказа '{OrderStatus.CODE_PROCESSING}' не настроен в системе."},
                 code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        serializer.save(client=client_profile, status=initial_status)
+        data = serializer.validated_data
+        try:
+            price = resolve_order_price(
+                data['origin_city'].pk, data['destination_city'].pk, data['package_size'].pk, data.get('price'))
+        except PricingError as exc:
+            raise serializers.ValidationError({"price": str(exc)})
+
+        coordinates = geocode_order_addresses(data)
+        with transaction.atomic():
+            order = serializer.save(client=client_profile, status=initial_status, price=price, **coordinates)
+            record_status_event(order.pk, None, initial_status, actor_id=self.request.user.pk)
+
+
+class BulkOrderCSVParser(CSVParser):
+    max_rows = BULK_MAX_ROWS
+
+
+class OrderBulkCreateAPIView(generics.GenericAPIView):
+    """
+        Массовое создание заказов клиента: JSON-массив объектов или text/csv
+        с заголовком (колонки - поля BulkOrderRowSerializer), до BULK_MAX_ROWS строк.
+
+        Создаются все заказы или ни одного: при ошибках ответ 400 со списком
+        {"row": номер строки с 1, "errors": {...}}. Цена считается по тарифу,
+        адреса без координат геокодируются, см. orders/bulk.py.
+    """
+    serializer_class = BulkOrderRowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, BulkOrderCSVParser]
+
+    def post(self, request):
+        if not get_actor(request.user).is_client:
+            raise exceptions.PermissionDenied("Только клиенты могут создавать заказы.")
+        try:
+            orders = create_orders_bulk(request.user.client_profile, request.data, actor_id=request.user.pk)
+        except BulkOrderError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except OrderStatus.DoesNotExist as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"created": len(orders), "orders": BulkOrderResultSerializer(orders, many=True).data},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class OrderExportAPIView(generics.GenericAPIView):
+    """
+        Потоковая выгрузка заказов для сотрудников: ?file_format=csv|jsonl
+        &date_from=&date_to= (даты создания включительно)&city_id=&status=<код>.
+
+        Ответ формируется по мере чтения из БД (см. orders/export.py),
+        память не зависит от количества заказов.
+    """
+    serializer_class = OrderExportFilterSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    content_types = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+    def get(self, request):
+        if not get_actor(request.user).is_staff:
+            raise exceptions.PermissionDenied("Выгрузка заказов доступна только сотрудникам.")
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = dict(serializer.validated_data)
+        export_format = filters.pop('file_format')
+
+        response = StreamingHttpResponse(
+            iter_export(export_queryset(**filters), export_format), content_type=self.content_types[export_format])
+        filename = f"orders-{timezone.localdate():%Y%m%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class OrderDetailAPIView(generics.RetrieveUpdateAPIView):
-    queryset = Order.objects.all()
+    queryset = Order.objects.with_related()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         obj = super().get_object()
-        user = self.request.user
+        actor = get_actor(self.request.user)
 
-        if user.is_staff:
+        if actor.is_staff:
             return obj
 
-        is_client_owner = (user.role == User.ROLE_CLIENT and
-                           hasattr(user, 'client_profile') and
-                           obj.client == user.client_profile)
+        is_client_owner = actor.is_client and obj.client_id == actor.client_id
 
-        is_assigned_courier = (user.role == User.ROLE_COURIER and
-                               hasattr(user, 'courier_profile') and
-                               obj.courier == user.courier_profile)
+        is_assigned_courier = actor.is_courier and obj.courier_id == actor.courier_id
 
-        is_available_for_courier_to_take = (user.role == User.ROLE_COURIER and
-                                            obj.courier is None and
-                                            obj.status.name == "Обработка")
+        is_available_for_courier_to_take = (actor.is_courier and
+                                            obj.courier_id is None and
+                                            obj.status.code == OrderStatus.CODE_PROCESSING)
 
         if is_client_owner or is_assigned_courier or is_available_for_courier_to_take:
             return obj
 
-        raise permissions.PermissionDenied("У вас нет прав для доступа к этому заказу.")
+        raise exceptions.PermissionDenied("У вас нет прав для доступа к этому заказу.")
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', True)
         instance = self.get_object()
-        user = request.user
+        actor = get_actor(request.user)
 
-        if (user.role == User.ROLE_COURIER and
-                hasattr(user, 'courier_profile') and
-                instance.courier is None and
-                instance.status.name == "Обработка"):
-
-            try:
-                new_status_name = "В пути"
-                new_status = OrderStatus.objects.get(name=new_status_name)
-            except OrderStatus.DoesNotExist:
-                return Response(
-                    {"error": f"Статус '{new_status_name}' для взятия заказа не найден."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if (actor.is_courier and
+                instance.courier_id is None and
+                instance.status.code == OrderStatus.CODE_PROCESSING):
+            # Взятие заказа (и создание чата) выполняется атомарно, см. orders.services.take_order
+            return take_order_response(self, instance.pk, actor.courier_id)
 
-            instance.courier = user.courier_profile
-            instance.status = new_status
-            instance.pickup_timestamp = timezone.now()
-            instance.save()
+        elif actor.is_courier and instance.courier_id == actor.courier_id:
 
-            # --- СОЗДАНИЕ ЧАТА ПРИ ВЗЯТИИ ЗАКАЗА ---
-            ChatSession.objects.get_or_create(order=instance)
-            # get_or_create вернет кортеж (object, created_boolean)
-            # Это гарантирует, что чат будет создан только один раз для заказа.
-            # ------------------------------------
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+            return Response(serializer.data)
 
-            serializer = self.get_serializer(instance)
+        elif actor.is_client and instance.client_id == actor.client_id:
+            # Клиент может только сменить статус (отменить заказ), допустимость проверяет таблица переходов
+            requested_status_id = request.data.get("status_id")
+            if not requested_status_id:
+                return Response(
+                    {"detail": "Обновление заказа клиентом не разрешено для данного статуса или данных."},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            serializer = self.get_serializer(instance, data={'status_id': requested_status_id}, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
             return Response(serializer.data)
 
-        elif (user.role == User.ROLE_COURIER and
-              hasattr(user, 'courier_profile') and
-              instance.courier == user.courier_profile):
+        elif actor.is_staff:
 
             serializer = self.get_serializer(instance, data=request.data, partial=partial)
             serializer.is_valid(raise_exception=True)
             self.perform_update(serializer)
             return Response(serializer.data)
 
-        elif (user.role == User.ROLE_CLIENT and
-              hasattr(user, 'client_profile') and
-              instance.client == user.client_profile):
-
-            requested_status_id = request.data.get("status_id")
-            if instance.status.name == "Обработка" and requested_status_id:
-                try:
-                    cancel_status = OrderStatus.objects.get(id=requested_status_id)
-                    if "Отменен" in cancel_status.name:
-                        data_for_update = {'status': cancel_status.id}
-                        if "cancellation_reason" in request.data:
-                            data_for_update['cancellation_reason'] = request.data.get("cancellation_reason")
-
-                        serializer = self.get_serializer(instance, data=data_for_update, partial=partial)
-                        serializer.is_valid(raise_exception=True)
-                        self.perform_update(serializer)
-                        return Response(serializer.data)
-                    else:
-                        return Response(
-                            {"error": "Некорректный статус для отмены заказа."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                except OrderStatus.DoesNotExist:
-                    return Response(
-                        {"error": "Указанный статус для отмены не найден."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            return Response(
-                {"detail": "Обновление заказа клиентом не разрешено для данного статуса или данных."},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
-        raise permissions.PermissionDenied("Действие не разрешено для вашей роли или статуса заказа.")
+        raise exceptions.PermissionDenied("Действие не разрешено для вашей роли или статуса заказа.")
 
     def perform_update(self, serializer):
         instance = serializer.instance
-        validated_data = serializer.validated_data
-        new_status = validated_data.get('status')
+        old_status = instance.status
+        new_status = serializer.validated_data.get('status')
+        if new_status is None or new_status == old_status:
+            serializer.save()
+            return
 
-        if self.request.user.role == User.ROLE_COURIER:
-            if new_status and new_status.name == "Доставлен" and not instance.delivery_timestamp:
-                serializer.save(delivery_timestamp=timezone.now())
-                return
-        if self.request.user.role == User.ROLE_CLIENT and new_status and "Отменен" in new_status.name:
-            if 'cancellation_reason' in validated_data:
-                serializer.save(cancellation_reason=validated_data.get('cancellation_reason', "Отменено клиентом"))
-                return
-
-        serializer.save()
+        try:
+            check_transition(old_status, new_status, role_for(get_actor(self.request.user)))
+        except InvalidTransition as exc:
+            raise serializers.ValidationError({"status_id": str(exc)})
+
+        extra = {}
+        comment = ''
+        if new_status.code == OrderStatus.CODE_DELIVERED and not instance.delivery_timestamp:
+            extra['delivery_timestamp'] = timezone.now()
+        elif new_status.code == OrderStatus.CODE_CANCELLED:
+            # cancellation_reason доступно только для чтения в сериализаторе, поэтому берем его из запроса
+            default_reason = "Отменено клиентом" if instance.client_id == self.request.user.pk else "Отменено"
+            comment = extra['cancellation_reason'] = self.request.data.get('cancellation_reason') or default_reason
+
+        with transaction.atomic():
+            # Условный UPDATE проверяет, что статус и курьер не изменились после чтения
+            # (например, заказ не взят параллельно), и блокирует строку до конца транзакции
+            unchanged = Order.objects.filter(
+                pk=instance.pk, status=old_status, courier_id=instance.courier_id,
+            ).update(updated_at=timezone.now())
+            if not unchanged:
+                raise OrderStatusConflict()
+            serializer.save(**extra)
+            record_status_event(instance.pk, old_status, new_status, actor_id=self.request.user.pk, comment=comment)
 
 
 class AvailableOrderListAPIView(generics.ListAPIView):
@@ -179,16 +347,176 @@ class AvailableOrderListAPIView(generics.ListAPIView):
         Эндпоинт для аутентифицированных пользователей с ролью "курьер".
         Возвращает список заказов, у которых еще не назначен курьер
         и которые находятся в статусе "Обработка".
+
+        Позицию курьера можно передать параметрами latitude и longitude,
+        иначе берется центр его города. Если позиция известна, возвращаются
+        только заказы в радиусе radius_km (по умолчанию 15, не более 30 км),
+        ближайшие первыми, с курсором next на следующую страницу; радиус
+        выборки возвращается в поле radius_km, у заказов заполнено distance_km.
+        Без позиции возвращается общая лента с курсорной пагинацией.
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
+    default_radius_km = 15
+    max_radius_km = 30
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == User.ROLE_COURIER and hasattr(user, 'courier_profile'):
+        if get_actor(self.request.user).is_courier:
             try:
-                available_status = OrderStatus.objects.get(name="Обработка")
-                return Order.objects.filter(courier__isnull=True, status=available_status).order_by('-created_at')
+                available_status = status_registry.get(OrderStatus.CODE_PROCESSING)
+                return Order.objects.with_related().filter(
+                    courier__isnull=True, status=available_status
+                ).order_by('-created_at')
             except OrderStatus.DoesNotExist:
                 return Order.objects.none()
-        return Order.objects.none()
\ No newline at end of file
+        return Order.objects.none()
+
+    def get_float_param(self, name, min_value, max_value):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            value = float(value)
+        except ValueError:
+            raise serializers.ValidationError({name: "Ожидается число."})
+        if not min_value <= value <= max_value:
+            raise serializers.ValidationError({name: f"Допустимый диапазон: от {min_value} до {max_value}."})
+        return value
+
+    def get_courier_position(self, actor):
+        latitude = self.get_float_param('latitude', -90, 90)
+        longitude = self.get_float_param('longitude', -180, 180)
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError({"detail": "Передайте latitude и longitude вместе."})
+        if latitude is not None:
+            return latitude, longitude
+        city_center = (CourierProfile.objects.filter(pk=actor.courier_id)
+                       .values_list('city__center_latitude', 'city__center_longitude').first())
+        if city_center is None or None in city_center:
+            return None
+        return city_center
+
+    def list(self, request, *args, **kwargs):
+        actor = get_actor(request.user)
+        position = self.get_courier_position(actor) if actor.is_courier else None
+        if position is None:
+            return super().list(request, *args, **kwargs)
+
+        radius_km = self.get_float_param('radius_km', 0.1, self.max_radius_km) or self.default_radius_km
+        paginator = NearbyOrderPagination()
+        try:
+            orders = paginator.paginate_nearby(request, *position, radius_km)
+        except OrderStatus.DoesNotExist:
+            return Response({'next': None, 'radius_km': radius_km, 'results': []})
+        serializer = AvailableOrderSerializer(orders, many=True, context=self.get_serializer_context())
+        response = paginator.get_paginated_response(serializer.data)
+        # Заказы дальше радиуса в эту ленту не попадают
+        response.data['radius_km'] = radius_km
+        return response
+
+
+class OrderTakeAPIView(generics.GenericAPIView):
+    """
+        Взятие доступного заказа курьером.
+
+        Заказ назначается одним условным UPDATE, поэтому при одновременных
+        запросах нескольких курьеров заказ получает только один из них,
+        остальные получают 409 Conflict.
+    """
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        actor = get_actor(request.user)
+        if not actor.is_courier:
+            raise exceptions.PermissionDenied("Брать заказы могут только курьеры.")
+        return take_order_response(self, pk, actor.courier_id)
+
+
+class TripListAPIView(generics.GenericAPIView):
+    """
+        Рейсы из нескольких доступных заказов для курьера.
+
+        Заказы объединяются по городу отправки, городу доставки и дате забора
+        с учетом вместимости рейса; для каждого рейса возвращается порядок
+        остановок (заборы, затем доставки) и длина маршрута.
+        По умолчанию город отправки - город курьера; фильтры: origin_city_id,
+        destination_city_id, pickup_date (YYYY-MM-DD).
+    """
+    serializer_class = TripSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_params = {
+        'origin_city_id': serializers.IntegerField(min_value=1),
+        'destination_city_id': serializers.IntegerField(min_value=1),
+        'pickup_date': serializers.DateField(),
+    }
+
+    def get_filters(self, actor):
+        filters = {}
+        for name, field in self.filter_params.items():
+            value = self.request.query_params.get(name)
+            if value:
+                try:
+                    filters[name] = field.run_validation(value)
+                except serializers.ValidationError as exc:
+                    raise serializers.ValidationError({name: exc.detail})
+        if 'origin_city_id' not in filters:
+            city_id = CourierProfile.objects.filter(pk=actor.courier_id).values_list('city_id', flat=True).first()
+            if city_id is not None:
+                filters['origin_city_id'] = city_id
+        return filters
+
+    def get(self, request):
+        actor = get_actor(request.user)
+        if not actor.is_courier:
+            raise exceptions.PermissionDenied("Рейсы доступны только курьерам.")
+        try:
+            trips = build_trips(open_trip_orders(**self.get_filters(actor)))
+        except OrderStatus.DoesNotExist:
+            trips = []
+        return Response(self.get_serializer(trips, many=True).data)
+
+
+class TripTakeAPIView(generics.GenericAPIView):
+    """
+        Взятие рейса: все заказы назначаются курьеру атомарно.
+
+        Если хотя бы один заказ уже взят или отменен, не назначается ни один
+        (409 Conflict). Несовместимые заказы (разные города или дата забора,
+        превышение вместимости) - 400.
+    """
+    serializer_class = TripTakeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        actor = get_actor(request.user)
+        if not actor.is_courier:
+            raise exceptions.PermissionDenied("Брать рейсы могут только курьеры.")
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = set(serializer.validated_data['order_ids'])
+
+        try:
+            processing = status_registry.get(OrderStatus.CODE_PROCESSING)
+        except OrderStatus.DoesNotExist as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        orders = load_trip_orders(Order.objects.filter(pk__in=order_ids, courier__isnull=True, status=processing))
+        if len(orders) != len(order_ids):
+            return Response(
+                {"detail": "Часть заказов рейса уже взята, отменена или не найдена."},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            validate_trip(orders)
+        except IncompatibleTrip as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            take_orders(order_ids, actor.courier_id, actor_id=actor.user_id)
+        except OrderAlreadyTaken:
+            return Response(
+                {"detail": "Часть заказов рейса уже взята другим курьером."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(TripSerializer(plan_trip(orders)).data)
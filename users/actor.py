@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from .models import User
+
+
+@dataclass(frozen=True)
+class Actor:
+    """
+    Роль и профили текущего пользователя, вычисленные один раз на запрос.
+
+    client_id / courier_id - первичные ключи ClientProfile / CourierProfile
+    (совпадают с id пользователя) или None, если профиля нет.
+    """
+    user_id: Optional[int]
+    role: Optional[str]
+    is_staff: bool
+    client_id: Optional[int]
+    courier_id: Optional[int]
+
+    @property
+    def is_client(self):
+        return self.role == User.ROLE_CLIENT and self.client_id is not None
+
+    @property
+    def is_courier(self):
+        return self.role == User.ROLE_COURIER and self.courier_id is not None
+
+
+ANONYMOUS_ACTOR = Actor(user_id=None, role=None, is_staff=False, client_id=None, courier_id=None)
+
+
+def build_actor(user, has_client_profile, has_courier_profile):
+    return Actor(
+        user_id=user.pk,
+        role=user.role,
+        is_staff=user.is_staff,
+        client_id=user.pk if has_client_profile else None,
+        courier_id=user.pk if has_courier_profile else None,
+    )
+
+
+def get_actor(user):
+    """
+    Возвращает Actor пользователя, кэшируя его на объекте user.
+
+    CachedTokenAuthentication заполняет actor сразу, без запросов; для других
+    способов аутентификации наличие профилей определяется одним запросом.
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_ACTOR
+    actor = getattr(user, '_actor', None)
+    if actor is None:
+        profiles = (User.objects.filter(pk=user.pk)
+                    .values_list('client_profile__pk', 'courier_profile__pk').first()) or (None, None)
+        actor = build_actor(user, profiles[0] is not None, profiles[1] is not None)
+        user._actor = actor
+    return actor
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .actor import build_actor
+from .models import User
+
+TOKEN_CACHE_TIMEOUT = 300  # секунд
+PROFILE_RELATIONS = ('client_profile', 'courier_profile')
+
+
+def token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def invalidate_user_tokens(user_id):
+    """Сбрасывает кэш всех токенов пользователя (смена пароля, деактивация, изменение профиля)."""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшем "токен -> пользователь".
+
+    При промахе токен, пользователь и признаки наличия профилей загружаются
+    одним запросом; при попадании запросов к БД нет. К пользователю сразу
+    прикрепляется Actor (users/actor.py) с ролью и профилями. Пароль в кэш не попадает:
+    у восстановленного пользователя поле password отложено (deferred), поэтому
+    save() не перезапишет его. Кэш сбрасывается сигналами (users/signals.py)
+    при выходе, изменении пользователя или его профилей, а также по TTL.
+    """
+    cache_timeout = TOKEN_CACHE_TIMEOUT
+
+    def authenticate_credentials(self, key):
+        data = cache.get(token_cache_key(key))
+        if data is None:
+            try:
+                token = Token.objects.select_related(
+                    *(f'user__{relation}' for relation in PROFILE_RELATIONS)
+                ).get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            data = self.get_cache_data(token)
+            cache.set(token_cache_key(key), data, self.cache_timeout)
+            self.attach_actor(token.user, data)
+        else:
+            token = self.restore_token(key, data)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
+
+    @staticmethod
+    def get_cache_data(token):
+        user = token.user
+        fields = {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+            if field.attname != 'password'
+        }
+        profiles = {relation: hasattr(user, relation) for relation in PROFILE_RELATIONS}
+        return {'token_created': token.created, 'fields': fields, 'profiles': profiles}
+
+    @staticmethod
+    def restore_token(key, data):
+        fields = data['fields']
+        user = User.from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+        for relation, exists in data['profiles'].items():
+            if not exists:
+                # Отсутствующий профиль кэшируем как None: hasattr() вернет False без запроса
+                user._state.fields_cache[relation] = None
+        token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'],
+                              [key, user.pk, data['token_created']])
+        token.user = user
+        CachedTokenAuthentication.attach_actor(user, data)
+        return token
+
+    @staticmethod
+    def attach_actor(user, data):
+        # Роль и профили для get_actor() без дополнительных запросов
+        user._actor = build_actor(user, data['profiles']['client_profile'], data['profiles']['courier_profile'])
@@ -0,0 +1,42 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import exceptions
+
+from .authentication import CachedTokenAuthentication
+
+
+@database_sync_to_async
+def get_user_for_token(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Аутентификация WebSocket-соединений тем же DRF-токеном, что и REST API.
+
+    Токен берется из заголовка "Authorization: Token <key>" (мобильные клиенты)
+    или из параметра строки запроса ?token=<key> (браузеры не умеют задавать
+    заголовки для WebSocket).
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token_key(scope)
+        scope['user'] = await get_user_for_token(key) if key else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_token_key(scope):
+        headers = dict(scope.get('headers', []))
+        auth_header = headers.get(b'authorization', b'').decode('latin-1').split()
+        if len(auth_header) == 2 and auth_header[0].lower() == 'token':
+            return auth_header[1]
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        return query.get('token', [None])[0]
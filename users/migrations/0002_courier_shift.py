@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courierprofile',
+            name='shift_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начало смены'),
+        ),
+        migrations.AddField(
+            model_name='courierprofile',
+            name='shift_status',
+            field=models.CharField(choices=[('offline', 'Не на смене'), ('online', 'На смене')], default='offline', max_length=10, verbose_name='Смена'),
+        ),
+    ]
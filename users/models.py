@@ -167,6 +167,13 @@ class Car(models.Model):
 
 # --- Профиль Курьера ---
 class CourierProfile(models.Model):
+    SHIFT_OFFLINE = 'offline'
+    SHIFT_ONLINE = 'online'
+    SHIFT_CHOICES = (
+        (SHIFT_OFFLINE, 'Не на смене'),
+        (SHIFT_ONLINE, 'На смене'),
+    )
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='courier_profile')
     full_name = models.CharField(max_length=255, verbose_name='ФИО')
     iin = models.CharField(max_length=12, verbose_name='ИИН', unique=True)
@@ -197,6 +204,12 @@ class CourierProfile(models.Model):
     car = models.OneToOneField(Car, on_delete=models.SET_NULL, null=True, blank=True,
                                verbose_name='Автомобиль')  # Ссылка на Car
 
+    # Смена, объявленная курьером; кто на связи прямо сейчас, знает индекс couriers/online_index.py
+    shift_status = models.CharField(
+        max_length=10, choices=SHIFT_CHOICES, default=SHIFT_OFFLINE, verbose_name='Смена'
+    )
+    shift_started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало смены')
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_user_tokens, token_cache_key
+from .models import User, ClientProfile, CourierProfile
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Выход из системы или отзыв токена
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token_cache(sender, instance, created, **kwargs):
+    # Смена пароля, роли, деактивация и любые другие изменения пользователя
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=ClientProfile)
+@receiver(post_delete, sender=ClientProfile)
+@receiver(post_save, sender=CourierProfile)
+@receiver(post_delete, sender=CourierProfile)
+def invalidate_profile_token_cache(sender, instance, **kwargs):
+    # В кэше хранится только наличие профиля: важны создание (created=True) и удаление (нет ключа created)
+    if kwargs.get('created', True):
+        invalidate_user_tokens(instance.user_id)
@@ -1,3 +1,78 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .actor import get_actor
+from .authentication import CachedTokenAuthentication
+from .models import User, ClientProfile
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('+77010000001', 'old-password', role=User.ROLE_CLIENT)
+        ClientProfile.objects.create(
+            user=cls.user, full_name='Клиент', iin='000000000001', date_of_birth=datetime.date(1990, 1, 1))
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.auth = CachedTokenAuthentication()
+
+    def test_cached_token_resolves_user_without_queries(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.role, User.ROLE_CLIENT)
+            self.assertFalse(hasattr(user, 'courier_profile'))
+            self.assertEqual(token.key, self.token.key)
+
+    def test_restored_user_does_not_carry_password(self):
+        self.auth.authenticate_credentials(self.token.key)
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertIn('password', user.get_deferred_fields())
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('old-password'))
+
+    def test_deactivation_invalidates_cache(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_logout_deletes_token_and_cache_entry(self):
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(api.get(reverse('users_api:user_detail')).status_code, 200)
+
+        self.assertEqual(api.post(reverse('users_api:api_token_logout')).status_code, 204)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(api.get(reverse('users_api:user_detail')).status_code, 401)
+
+    def test_actor_is_resolved_from_cache_without_queries(self):
+        self.auth.authenticate_credentials(self.token.key)
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            actor = get_actor(user)
+        self.assertTrue(actor.is_client)
+        self.assertFalse(actor.is_courier)
+        self.assertEqual(actor.client_id, self.user.pk)
+        self.assertIsNone(actor.courier_id)
+
+    def test_actor_fallback_uses_single_query(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(get_actor(user).is_client)
+            self.assertTrue(get_actor(user).is_client)
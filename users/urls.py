@@ -3,7 +3,8 @@ from .views import (
     ClientRegistrationAPIView,
     CustomAuthTokenLoginView,
     UserDetailAPIView,
-    CourierRegistrationAPIView # <--- Импортируем новое представление
+    CourierRegistrationAPIView, # <--- Импортируем новое представление
+    LogoutAPIView,
 )
 
 app_name = 'users_api' # Хорошая практика - задавать app_name
@@ -12,5 +13,6 @@ urlpatterns = [
     path('register/client/', ClientRegistrationAPIView.as_view(), name='client_register'),
     path('register/courier/', CourierRegistrationAPIView.as_view(), name='courier_register'), # <--- НОВЫЙ ПУТЬ
     path('login/', CustomAuthTokenLoginView.as_view(), name='api_token_auth'),
+    path('logout/', LogoutAPIView.as_view(), name='api_token_logout'),
     path('me/', UserDetailAPIView.as_view(), name='user_detail'),
 ]
\ No newline at end of file
@@ -50,6 +50,17 @@ class CustomAuthTokenLoginView(ObtainAuthToken):
             'user': user_serializer.data # Включаем информацию о пользователе
         })
 
+class LogoutAPIView(generics.GenericAPIView):
+    """
+    Выход пользователя: удаляет текущий токен (и его запись в кэше аутентификации).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.auth is not None:
+            request.auth.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserDetailAPIView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated] # Только аутентифицированные пользователи